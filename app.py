@@ -1,23 +1,24 @@
 import pandas as pd
 import streamlit as st
 
-from heatpro.check import ENERGY_FEATURE_NAME
-from heatpro.district_heating_load import DistrictHeatingLoad
-from heatpro.external_factors import ExternalFactors
-from heatpro.temporal_demand import MonthlyHeatDemand, YearlyHeatDemand
-
 from backend.external_factors import plot_external_factors, plot_induced_factors
 import backend.factors as fc
 import backend.industry as ind
 import backend.residential as res
 import backend.hot_water as hw
 import backend.soil as sl
-from backend.pipeline import calculate_induced_factors, process_hot_water_temporal_demand, process_residential_temporal_demand, process_industry_temporal_demand, process_loss_temporal_demand, ending_dataframe
+from backend.calendar_index import CalendarIndex
+from backend.comparison import ScenarioComparison, plot_comparison, plot_duration_comparison
+from backend.compact import memory_usage
+from backend.export import EXPORT_FORMATS, export_bytes
+from backend.ingestion import load_external_factors
+from backend.pipeline import INDUCED_FACTORS_CACHE, BackgroundPipeline, build_district_heating_graph
+from backend.profiling import profile_stage, start_profiling
+from backend.result_store import RESULT_STORE
+from backend.scenario import WATER_HEAT_CAPACITY, scenario_parameters
 from backend.visualisation import plot_generated_load, plot_monotone, plot_demand_vs_outside_temperature
 
 
-WATER_HEAT_CAPACITY = 1.162 # kWh/m^3/K
-
 st.set_page_config(
     page_title="HeatPro App",
     layout="wide",
@@ -37,6 +38,8 @@ with open('logo/heatpro_app_logo.txt', 'r') as f:
     heatpro_app_logo = f.read()
 st.markdown(heatpro_app_logo,unsafe_allow_html=True)
 st.markdown("<h3>Streamlit App based on <a href='https://github.com/CEA-Liten/HeatPro'>HeatPro</a></h3>", unsafe_allow_html=True)
+# the toggle is drawn in the Performance expander, its state is read before anything is computed
+profile = start_profiling(st.session_state.get("profiling", False))
 with st.expander("Description",expanded=True):
         st.markdown("""
                     The present application finds its roots in the need of using representative heating load curve for the simulation 
@@ -62,25 +65,30 @@ with st.sidebar:
         col1, col2 = st.columns((1.5,1))
         
         with col1:
-            external_factors_file = st.file_uploader("External Factors CSV")
+            external_factors_file = st.file_uploader("External Factors (CSV, Parquet or Feather)", type=["csv", "parquet", "feather", "arrow"])
             
         with col2:
             default_dataset = st.radio("Activate demo ?",["No demo","One year demo","Two year demo"])
          
+        # datasets are parsed once per content and shared by every session, the one year demo is a view of the two year one
         if default_dataset == "One year demo":
-            external_factors = ExternalFactors(pd.read_csv("./data/external_factors.csv",index_col=0,parse_dates=True).iloc[:8760])
-            month_index = external_factors.data.resample('MS').sum().index
-            year_index = external_factors.data.resample('YS').sum().index
+            external_factors, load_report = load_external_factors("./data/external_factors.csv", rows=8760)
                
         if default_dataset == "Two year demo":
-            external_factors = ExternalFactors(pd.read_csv("./data/external_factors.csv",index_col=0,parse_dates=True))
-            month_index = external_factors.data.resample('MS').sum().index
-            year_index = external_factors.data.resample('YS').sum().index
+            external_factors, load_report = load_external_factors("./data/external_factors.csv")
             
         if external_factors_file is not None:
-            external_factors = ExternalFactors(pd.read_csv(external_factors_file,index_col=0,parse_dates=True))
-            month_index = external_factors.data.resample('MS').sum().index
-            year_index = external_factors.data.resample('YS').sum().index
+            try:
+                external_factors, load_report = load_external_factors(external_factors_file)
+            except ValueError as error:
+                st.error(f"{external_factors_file.name} could not be read: {error}")
+                external_factors_file = None
+        
+        if default_dataset != "No demo" or external_factors_file is not None:
+            st.caption(str(load_report))
+            calendar = CalendarIndex.of(external_factors)
+            month_index = calendar.month_index
+            year_index = calendar.year_index
                
         st.subheader("Supply Temperature")
         T_departure = fc.set_temperature_departure_board()
@@ -143,72 +151,173 @@ with st.sidebar:
     with meta_tabs[3]: # 🌍 Ground
         soil = sl.set_soil_temperature_board()
         
-try:
-    induced_factors = calculate_induced_factors(external_factors,T_departure,T_return,soil)
-    
-    monthly_building_load = MonthlyHeatDemand("residential",monthly_building_load_df*(1-loss_percentage*loss_included))
-    
-    hourly_hot_water_load = process_hot_water_temporal_demand(monthly_building_load,monthly_hot_water_profile,weekly_hot_water_non_normalized,external_factors,hot_water)
-    
-    monthly_residential_load = MonthlyHeatDemand('building',(monthly_building_load.data - hourly_hot_water_load.data.resample('MS').sum()))
-    hourly_residential_load = process_residential_temporal_demand(external_factors,monthly_residential_load,non_heating_temperature,weekly_non_normalized_residential_profile)
-
-    yearly_industry_load = YearlyHeatDemand("industry",yearly_industry_consumption*(1-loss_percentage*loss_included))
-    hourly_industry_load = process_industry_temporal_demand(yearly_industry_load,external_factors,weekly_industry_profile,month_index)
+POLL_SECONDS = 0.1 # progress refresh period, a newer rerun interrupts the wait at the next refresh
 
-    yearly_heat_loss_load = YearlyHeatDemand(
-        'heat_loss',
-        (monthly_building_load_df[[ENERGY_FEATURE_NAME]].resample("YS").sum() + yearly_industry_consumption[[ENERGY_FEATURE_NAME]].resample("YS").sum())*loss_percentage)
-    
-    hourly_heat_loss_load = process_loss_temporal_demand(induced_factors,yearly_heat_loss_load)
+if "pipeline" not in st.session_state:
+    # runs in a worker thread, a run superseded by newer inputs stops before its next stage
+    # results already computed (by any session or a command line run) are loaded from the result store
+    st.session_state["pipeline"] = BackgroundPipeline(build_district_heating_graph(), RESULT_STORE)
 
-    district_heating = DistrictHeatingLoad(
-                                demands = [
-                                    hourly_hot_water_load,
-                                    hourly_industry_load,
-                                    hourly_heat_loss_load,
-                                    hourly_residential_load,
-                                ],
-                                external_factors=external_factors,
-                                district_network_temperature=induced_factors,
-                                delta_temperature=delta_temperature,
-                                cp=WATER_HEAT_CAPACITY,
-                            )
-    district_heating.fit()
+try:
+    pipeline_inputs = dict(
+        external_factors=external_factors,
+        T_departure=T_departure,
+        T_return=T_return,
+        soil=soil,
+        delta_temperature=delta_temperature,
+        water_heat_capacity=WATER_HEAT_CAPACITY,
+        loss_percentage=loss_percentage,
+        loss_included=loss_included,
+        monthly_building_load_df=monthly_building_load_df,
+        monthly_hot_water_profile=monthly_hot_water_profile,
+        weekly_hot_water_profile=weekly_hot_water_non_normalized,
+        config_hot_water=hot_water,
+        non_heating_temperature=non_heating_temperature,
+        weekly_residential_profile=weekly_non_normalized_residential_profile,
+        yearly_industry_consumption=yearly_industry_consumption,
+        weekly_industry_profile=weekly_industry_profile,
+        month_index=month_index,
+        compact=st.session_state.get("compact", False),
+    )
+    with profile_stage("pipeline"):
+        pipeline_status = st.session_state["pipeline"].submit(pipeline_inputs)
+        if not pipeline_status.finished:
+            progress = st.progress(0., text="Computing district heating load")
+            while not pipeline_status.finished:
+                pipeline_status = st.session_state["pipeline"].wait(POLL_SECONDS)
+                progress.progress(pipeline_status.progress, text=f"Computing {pipeline_status.running or 'district heating load'} "
+                                                                 f"({len(pipeline_status.reports)}/{pipeline_status.stages} stages)")
+            progress.empty()
+    if pipeline_status.cancelled:
+        # submitted again by the rerun, as a new run
+        st.rerun()
+    if pipeline_status.error is not None:
+        raise pipeline_status.error
+    pipeline_results, pipeline_report = pipeline_status.results, pipeline_status.reports
+    district_heating = pipeline_results["district_heating"]
     
     with st.sidebar:
         with meta_tabs[1]:
             with meta_tabs_res[0]:
-                st.plotly_chart(plot_demand_vs_outside_temperature(district_heating),use_container_width=True)
+                with profile_stage("plot_demand_vs_outside_temperature"):
+                    st.plotly_chart(plot_demand_vs_outside_temperature(district_heating),use_container_width=True)
     
 except NameError:
     district_heating = None
 
+display_window = None
+if district_heating:
+    hours = district_heating.external_factors.data.index
+    period = st.slider("Displayed period", min_value=hours[0].to_pydatetime(), max_value=hours[-1].to_pydatetime(),
+                       value=(hours[0].to_pydatetime(), hours[-1].to_pydatetime()), format="YYYY-MM-DD")
+    # charts are decimated to keep their peaks, a short enough period is plotted at full resolution
+    if period != (hours[0].to_pydatetime(), hours[-1].to_pydatetime()):
+        display_window = period
+
 with st.expander("External and Induced Factors",expanded=True):
     if district_heating:  
-        st.plotly_chart(plot_external_factors(district_heating),use_container_width=True)
+        with profile_stage("plot_external_factors"):
+            st.plotly_chart(plot_external_factors(district_heating, display_window),use_container_width=True)
         
-        st.plotly_chart(plot_induced_factors(district_heating),use_container_width=True)
+        with profile_stage("plot_induced_factors"):
+            st.plotly_chart(plot_induced_factors(district_heating, display_window),use_container_width=True)
+        cache_info = INDUCED_FACTORS_CACHE.info()
+        st.caption(f"Induced factors cache: {cache_info.hits} hits, {cache_info.misses} misses ({cache_info.currsize}/{cache_info.maxsize} entries)")
     else:
         st.write("☔ External Factors not received")
         
 with st.expander("Generated Load",expanded=True):
     if district_heating:  
         
-        st.plotly_chart(plot_generated_load(district_heating),use_container_width=True)
-        st.plotly_chart(plot_monotone(district_heating),use_container_width=True)
+        with profile_stage("plot_generated_load"):
+            st.plotly_chart(plot_generated_load(district_heating, display_window),use_container_width=True)
+        with profile_stage("plot_monotone"):
+            st.plotly_chart(plot_monotone(district_heating),use_container_width=True)
     else:
         st.write("☔ External Factors not received")
         
 
+with st.expander("Scenario Comparison",expanded=False):
+    if district_heating:
+        col1, col2 = st.columns(2)
+        if col1.button("Pin current result as baseline"):
+            # the result frames are kept, comparing never runs the pipeline again
+            st.session_state["baseline"] = (pipeline_results["ending"], scenario_parameters(pipeline_inputs))
+        if col2.button("Unpin baseline", disabled="baseline" not in st.session_state):
+            st.session_state.pop("baseline", None)
+            st.session_state.pop("comparison", None)
+        baseline = st.session_state.get("baseline")
+        if baseline is None:
+            st.write("📌 Pin a result, then change the inputs to compare the new result with it")
+        else:
+            # differences are only computed again when the baseline or the live result changes
+            comparison = st.session_state.get("comparison")
+            if comparison is None or comparison[0] is not baseline[0] or comparison[1] is not pipeline_results["ending"]:
+                try:
+                    with profile_stage("scenario_comparison"):
+                        comparison = (baseline[0], pipeline_results["ending"], ScenarioComparison(baseline[0], pipeline_results["ending"]))
+                except ValueError as error:
+                    comparison = (baseline[0], pipeline_results["ending"], error)
+                st.session_state["comparison"] = comparison
+            if isinstance(comparison[2], ValueError):
+                st.warning(str(comparison[2]))
+            else:
+                live_parameters = scenario_parameters(pipeline_inputs)
+                changed = {name: (baseline[1].get(name), value) for name, value in live_parameters.items() if baseline[1].get(name) != value}
+                if changed:
+                    st.dataframe(pd.DataFrame.from_dict(changed, orient="index", columns=["baseline", "live"]).astype(str))
+                else:
+                    st.caption("Same parameters as the baseline, tables or external factors may differ")
+                st.dataframe(comparison[2].summary())
+                comparison_tabs = st.tabs(["Hourly load", "Duration curve", "Flow rate", "Temperatures"])
+                with comparison_tabs[0], profile_stage("plot_comparison_load"):
+                    st.plotly_chart(plot_comparison(comparison[2], "load", display_window),use_container_width=True)
+                with comparison_tabs[1], profile_stage("plot_duration_comparison"):
+                    st.plotly_chart(plot_duration_comparison(comparison[2]),use_container_width=True)
+                with comparison_tabs[2], profile_stage("plot_comparison_flow_rate"):
+                    st.plotly_chart(plot_comparison(comparison[2], "flow_rate", display_window),use_container_width=True)
+                with comparison_tabs[3], profile_stage("plot_comparison_temperatures"):
+                    st.plotly_chart(plot_comparison(comparison[2], "temperatures", display_window),use_container_width=True)
+    else:
+        st.write("☔ External Factors not received")
 
 with st.expander("Data",expanded=True):
     if district_heating:
             # st.write(district_heating.data[["hot_water_thermal_energy_kWh","building_thermal_energy_kWh"]].sum(axis=1).resample("MS").sum())
             # st.write(district_heating.data[["heat_loss_thermal_energy_kWh"]].resample("MS").sum())
-            st.markdown("you can export as a CSV file using button on top right of the table") 
-            st.dataframe(ending_dataframe(district_heating,WATER_HEAT_CAPACITY))
+            export_format = st.radio("Export format", list(EXPORT_FORMATS), horizontal=True)
+            # the file is only written again when the result or the format changes
+            export = st.session_state.get("export")
+            if export is None or export[0] is not pipeline_results["ending"] or export[1] != export_format:
+                export = (pipeline_results["ending"], export_format, export_bytes(pipeline_results["ending"], export_format, scenario_parameters(pipeline_inputs)))
+                st.session_state["export"] = export
+            st.download_button(f"Download {export_format}", export[2], file_name="district_heating_load" + EXPORT_FORMATS[export_format][0], mime=EXPORT_FORMATS[export_format][1])
+            with profile_stage("dataframe"):
+                st.dataframe(pipeline_results["ending"])
+            if pipeline_status.stored:
+                store_info = RESULT_STORE.info()
+                st.caption(f"Results loaded from the result store ({store_info.entries} results, {store_info.bytes / 2**20:.1f} MiB)")
+            else:
+                st.caption("Pipeline stages recomputed: " + (", ".join(report.name for report in pipeline_report if report.computed) or "none") +
+                           " | skipped: " + (", ".join(report.name for report in pipeline_report if not report.computed) or "none"))
     else:
         st.write("☔ External Factors not received")
-        
 
+with st.expander("Performance",expanded=False):
+    st.toggle("Profile reruns", key="profiling", help="Record wall time, CPU time and peak memory of every stage on next reruns, memory tracing slows the app down")
+    st.toggle("Compact memory mode", key="compact", help="Keep demands, temperatures and the exported table as float32 on shared indexes, about half the memory (see backend.compact)")
+    if district_heating:
+        st.caption(f"Pipeline results hold {sum(memory_usage(pipeline_results).values()) / 2**20:.1f} MiB")
+    if profile is not None and profile.spans:
+        st.dataframe(pd.DataFrame({
+            "stage": ["\u2003" * span.depth + span.name for span in profile.spans],
+            "thread": [span.thread for span in profile.spans],
+            "wall (ms)": [span.wall * 1e3 for span in profile.spans],
+            "CPU (ms)": [span.cpu * 1e3 for span in profile.spans],
+            "peak memory (MiB)": [None if span.peak_memory is None else span.peak_memory / 2**20 for span in profile.spans],
+        }), hide_index=True)
+        col1, col2 = st.columns(2)
+        col1.download_button("Download JSON", profile.to_json(), file_name="profile.json", mime="application/json")
+        col2.download_button("Download Chrome trace", profile.to_chrome_trace(), file_name="profile.trace.json", mime="application/json")
+    elif profile is not None:
+        st.write("Profiling is on, stages are recorded from the next rerun")
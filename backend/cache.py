@@ -0,0 +1,95 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import asdict, is_dataclass
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+import pandas as pd
+
+from heatpro.external_factors import ExternalFactors
+
+def fingerprint(obj: Any) -> str:
+    """Return a content hash of obj, stable across reruns and sessions"""
+    digest = hashlib.blake2b(digest_size=16)
+    _update_digest(digest, obj)
+    return digest.hexdigest()
+
+def _update_digest(digest, obj: Any) -> None:
+    if isinstance(obj, ExternalFactors):
+        obj = obj.data
+    if isinstance(obj, (pd.DataFrame, pd.Series, pd.Index)):
+        digest.update(type(obj).__name__.encode())
+        if isinstance(obj, pd.DataFrame):
+            digest.update(repr(list(obj.columns)).encode())
+            digest.update(repr(list(obj.dtypes.astype(str))).encode())
+        else:
+            digest.update(repr((obj.name, str(obj.dtype))).encode())
+        digest.update(pd.util.hash_pandas_object(obj, index=not isinstance(obj, pd.Index)).to_numpy().tobytes())
+    elif is_dataclass(obj):
+        digest.update(f"{type(obj).__name__}{asdict(obj)!r}".encode())
+    elif isinstance(obj, (tuple, list)):
+        digest.update(f"{type(obj).__name__}{len(obj)}".encode())
+        for item in obj:
+            _update_digest(digest, item)
+    else:
+        digest.update(repr(obj).encode())
+
+_MISSING = object()
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    maxsize: int
+    currsize: int
+    ttl: Optional[float]
+
+class LRUCache:
+    def __init__(self, maxsize: int = 16, ttl: Optional[float] = None) -> None:
+        """Thread-safe least recently used cache, shared by every session of the process.
+
+        Parameters:
+            maxsize (int): Maximum number of entries, the least recently used one is evicted first.
+            ttl (float, optional): Lifetime of an entry in seconds. None keeps entries until evicted by size.
+        """
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Cached value of key, default if it is missing or expired (counted as a miss)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (self.ttl is None or time.monotonic() - entry[0] < self.ttl):
+                self._entries.move_to_end(key)
+                self._hits += 1
+                return entry[1]
+            self._misses += 1
+            return default
+
+    def set(self, key: Hashable, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        value = self.get(key, _MISSING)
+        if value is _MISSING:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self._hits, self._misses, self.maxsize, len(self._entries), self.ttl)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits = 0
+            self._misses = 0
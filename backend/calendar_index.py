@@ -0,0 +1,153 @@
+import threading
+import weakref
+from functools import cached_property
+
+import numpy as np
+import pandas as pd
+
+from heatpro.external_factors import ExternalFactors
+
+from backend.resolution import HOURS_PER_DAY, steps_per_hour
+
+_CALENDARS: "weakref.WeakKeyDictionary[ExternalFactors, CalendarIndex]" = weakref.WeakKeyDictionary()
+_CALENDARS_LOCK = threading.Lock()
+
+def _period_starts(starts: pd.Series, gaps: np.ndarray, freq: str) -> pd.DatetimeIndex:
+    if (gaps == 1).all():
+        return pd.date_range(starts.iloc[0], periods=len(starts), freq=freq)
+    return pd.DatetimeIndex(starts)
+
+class Groups:
+    def __init__(self, keys: np.ndarray) -> None:
+        """Groups of rows sharing the same key, reductions are done along the first axis of 1-D or 2-D arrays.
+
+        Attributes:
+            keys (np.ndarray): Sorted unique keys.
+            codes (np.ndarray): Position in keys of every row.
+            starts (np.ndarray): Start of every group in the rows sorted by key, group boundaries are starts and len(codes).
+            sizes (np.ndarray): Number of rows of every group.
+        """
+        self.keys, self.codes = np.unique(keys, return_inverse=True)
+        self._order = np.argsort(self.codes, kind='stable')
+        self.starts = np.searchsorted(self.codes[self._order], np.arange(len(self.keys)))
+        self.sizes = np.diff(np.append(self.starts, len(self.codes)))
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def reduce(self, values: np.ndarray, ufunc: np.ufunc = np.add) -> np.ndarray:
+        return ufunc.reduceat(np.asarray(values)[self._order], self.starts, axis=0)
+
+    def transform(self, values: np.ndarray, ufunc: np.ufunc = np.add) -> np.ndarray:
+        return self.reduce(values, ufunc)[self.codes]
+
+class CalendarIndex:
+    def __init__(self, index: pd.DatetimeIndex) -> None:
+        """Calendar of a datetime index, decoded once: integer codes of every row and groups by day, month and year.
+        Attributes are computed on first use. Use CalendarIndex.of to share the calendar of external factors.
+
+        Parameters:
+            index (pd.DatetimeIndex): Hourly index or with a time step dividing an hour.
+
+        Raises:
+            ValueError: If the time step does not divide an hour.
+        """
+        self.index = index
+        self.steps_per_hour = steps_per_hour(index)
+        self.steps_per_day = HOURS_PER_DAY * self.steps_per_hour
+
+    @classmethod
+    def of(cls, external_factors: ExternalFactors) -> "CalendarIndex":
+        """Calendar of external factors, cached as long as they are alive"""
+        with _CALENDARS_LOCK:
+            calendar = _CALENDARS.get(external_factors)
+            if calendar is None:
+                calendar = cls(external_factors.data.index)
+                _CALENDARS[external_factors] = calendar
+            return calendar
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @cached_property
+    def year(self) -> np.ndarray:
+        return self.index.year.to_numpy()
+
+    @cached_property
+    def month_id(self) -> np.ndarray:
+        """year * 12 + month - 1, increasing with time"""
+        return self.year * 12 + self.index.month.to_numpy() - 1
+
+    @cached_property
+    def weekday(self) -> np.ndarray:
+        """0 for monday to 6 for sunday"""
+        return self.index.dayofweek.to_numpy()
+
+    @cached_property
+    def hour(self) -> np.ndarray:
+        return self.index.hour.to_numpy()
+
+    @cached_property
+    def step_of_day(self) -> np.ndarray:
+        """Position of the time step in its day, the hour for hourly data"""
+        if self.steps_per_hour == 1:
+            return self.hour
+        return (self.hour * 60 + self.index.minute.to_numpy()) * self.steps_per_hour // 60
+
+    @cached_property
+    def week_positions(self) -> np.ndarray:
+        """Position of the time step in its week (weekday * steps_per_day + step_of_day)"""
+        return self.weekday * self.steps_per_day + self.step_of_day
+
+    @cached_property
+    def day_of_month(self) -> np.ndarray:
+        return self.index.day.to_numpy()
+
+    @cached_property
+    def day_of_year(self) -> np.ndarray:
+        return self.index.dayofyear.to_numpy()
+
+    @cached_property
+    def days_in_month(self) -> np.ndarray:
+        return self.index.daysinmonth.to_numpy()
+
+    @cached_property
+    def days(self) -> Groups:
+        return Groups(self.index.normalize().asi8)
+
+    @cached_property
+    def days_of_month(self) -> Groups:
+        """Rows grouped by day of month (1 to 31, whatever the month), as heatpro hot water hourly profile does"""
+        return Groups(self.day_of_month)
+
+    @cached_property
+    def months(self) -> Groups:
+        return Groups(self.month_id)
+
+    @cached_property
+    def years(self) -> Groups:
+        return Groups(self.year)
+
+    @cached_property
+    def month_index(self) -> pd.DatetimeIndex:
+        """First day of every month of the index, with "MS" frequency when months are consecutive (as resample('MS'))"""
+        keys = self.months.keys
+        return _period_starts(pd.to_datetime({"year": keys // 12, "month": keys % 12 + 1, "day": 1}), np.diff(keys), "MS")
+
+    @cached_property
+    def year_index(self) -> pd.DatetimeIndex:
+        """First day of every year of the index, with "YS" frequency when years are consecutive (as resample('YS'))"""
+        keys = self.years.keys
+        return _period_starts(pd.to_datetime({"year": keys, "month": 1, "day": 1}), np.diff(keys), "YS")
+
+    def monthly_sum(self, values: np.ndarray) -> np.ndarray:
+        """Sum of values over every month of month_index, accumulated in float64"""
+        return self.months.reduce(np.asarray(values, dtype=float))
+
+    def to_months(self, monthly: pd.Series) -> np.ndarray:
+        """Values of a monthly table (summed per month) aligned on month_index, NaN for missing months"""
+        return monthly.groupby(monthly.index.year * 12 + monthly.index.month - 1).sum().reindex(self.months.keys).to_numpy(dtype=float)
+
+    def to_years(self, yearly: pd.Series) -> np.ndarray:
+        """Values of a yearly table (summed per year) aligned on year_index, NaN for missing years"""
+        return yearly.groupby(yearly.index.year).sum().reindex(self.years.keys).to_numpy(dtype=float)
@@ -0,0 +1,131 @@
+import argparse
+import contextlib
+import time
+from pathlib import Path
+from typing import Optional
+
+import pandas as pd
+
+from backend.multi_network import run_networks
+from backend.pipeline import build_district_heating_graph, ending_dataframe
+from backend.profiling import profile_stage, profiling
+from backend.export import EXPORT_FORMATS
+from backend.result_store import RESULT_STORE, result_key
+from backend.scenario import read_scenario, scenario_parameters, write_result
+from backend.scenario_db import ScenarioDatabase, scenario_record
+from backend.service import HOST, PORT, make_server
+from backend.sweep import read_sweep, run_sweep
+
+def run(args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    with profiling() if args.profile is not None else contextlib.nullcontext() as profile:
+        inputs = read_scenario(args.scenario, verbose=True)
+        if args.compact:
+            inputs["compact"] = True
+        graph = build_district_heating_graph()
+        keys = graph.input_keys(inputs)
+        results = None if args.no_store else RESULT_STORE.load(result_key(keys), inputs, ["ending"])
+        stored = results is not None
+        if not stored:
+            results, _ = graph.run(inputs, keys)
+            if not args.no_store:
+                RESULT_STORE.save(result_key(keys), results)
+        with profile_stage("write_result"):
+            write_result(results["ending"], args.out, scenario_parameters(inputs), args.format)
+        if args.db is not None:
+            with ScenarioDatabase(args.db) as database:
+                database.insert([scenario_record(results["ending"], scenario_parameters(inputs), args.out, result_key=None if args.no_store else result_key(keys))])
+    if args.profile is not None:
+        Path(args.profile).write_text(profile.to_chrome_trace() if args.profile.endswith(".trace.json") else profile.to_json())
+    print(f"{args.scenario}: {len(results['ending'])} rows {'loaded from the result store and ' if stored else ''}written to {args.out} in {time.perf_counter() - start:.1f} s")
+
+def sweep(args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    scenarios = read_sweep(args.sweep)
+    with ScenarioDatabase(args.db) if args.db is not None else contextlib.nullcontext() as database:
+        written = run_sweep(read_scenario(args.scenario, verbose=True), scenarios, args.out, args.processes, None if args.no_store else RESULT_STORE, database)
+    print(f"{written} scenarios written to {args.out} in {time.perf_counter() - start:.1f} s")
+
+def networks(args: argparse.Namespace) -> None:
+    start = time.perf_counter()
+    first = read_scenario(args.scenarios[0], verbose=True)
+    inputs = {Path(args.scenarios[0]).stem: first}
+    for scenario in args.scenarios[1:]:
+        inputs[Path(scenario).stem] = read_scenario(scenario, external_factors=first["external_factors"])
+        if inputs[Path(scenario).stem]["soil"] != first["soil"]:
+            raise ValueError(f"Networks should share the same ground, [soil] of {scenario} differs from {args.scenarios[0]}")
+    result = run_networks(first["external_factors"], first["soil"], inputs, args.compact)
+    write_result(pd.concat(
+        (ending_dataframe(result.district_heating(name), result.water_heat_capacity[position], args.compact).assign(network=name)
+         for position, name in enumerate(result.names))), args.out, {name: scenario_parameters(inputs[name]) for name in result.names}, args.format)
+    print(f"{len(result.names)} networks written to {args.out} in {time.perf_counter() - start:.1f} s")
+
+def query(args: argparse.Namespace) -> None:
+    with ScenarioDatabase(args.db) as database:
+        start = time.perf_counter()
+        scenarios = database.query(args.where, order_by=args.order_by, descending=args.descending, limit=args.limit,
+                                   columns=None if args.columns is None else args.columns.split(","))
+        seconds = time.perf_counter() - start
+        total = len(database)
+    with pd.option_context("display.max_columns", None, "display.width", None):
+        print(scenarios)
+    print(f"{len(scenarios)} of {total} scenarios in {seconds * 1e3:.1f} ms")
+
+def serve(args: argparse.Namespace) -> None:
+    server = make_server(args.host, args.port, args.processes)
+    print(f"Serving on http://{args.host}:{server.server_port} with {server.service.processes} processes, stop with Ctrl+C")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.service.shutdown()
+
+def main(argv: Optional[list[str]] = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m backend", description="Generate district heating load profiles without the Streamlit app")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the pipeline on a scenario file")
+    run_parser.add_argument("scenario", help="Scenario TOML file (see backend.scenario.read_scenario)")
+    run_parser.add_argument("--out", required=True, help="Output file (.parquet, .feather, .csv.gz or .csv)")
+    run_parser.add_argument("--format", choices=list(EXPORT_FORMATS), default=None, help="Output format, defaults to the --out extension")
+    run_parser.add_argument("--profile", default=None, help="Write per-stage timings and memory to this JSON file, in Chrome trace format if it ends with .trace.json")
+    run_parser.add_argument("--compact", action="store_true", help="Run in compact memory mode, float32 results (see backend.compact)")
+    run_parser.add_argument("--no-store", action="store_true", help="Always compute and do not save the results in the result store (see backend.result_store)")
+    run_parser.add_argument("--db", default=None, help="Add the scenario parameters and summary metrics to this SQLite scenario database (see backend.scenario_db)")
+    run_parser.set_defaults(func=run)
+
+    sweep_parser = commands.add_parser("sweep", help="Run parameter variations of a scenario over a process pool")
+    sweep_parser.add_argument("scenario", help="Base scenario TOML file")
+    sweep_parser.add_argument("sweep", help="Sweep TOML file with a [grid] table of parameter lists and/or [[scenarios]] tables (see backend.sweep.read_sweep)")
+    sweep_parser.add_argument("--out", required=True, help="Output Parquet file, keyed by scenario_id")
+    sweep_parser.add_argument("--processes", type=int, default=None, help="Number of worker processes, defaults to the number of cores")
+    sweep_parser.add_argument("--no-store", action="store_true", help="Always compute and do not save the results in the result store (see backend.result_store)")
+    sweep_parser.add_argument("--db", default=None, help="Add the parameters and summary metrics of every scenario to this SQLite scenario database (see backend.scenario_db)")
+    sweep_parser.set_defaults(func=sweep)
+
+    networks_parser = commands.add_parser("networks", help="Run several networks sharing the external factors of the first scenario")
+    networks_parser.add_argument("scenarios", nargs="+", help="One scenario TOML file per network, named after the file")
+    networks_parser.add_argument("--out", required=True, help="Output file (.parquet, .feather, .csv.gz or .csv) with a network column")
+    networks_parser.add_argument("--format", choices=list(EXPORT_FORMATS), default=None, help="Output format, defaults to the --out extension")
+    networks_parser.add_argument("--compact", action="store_true", help="Run in compact memory mode and write float32 columns instead of float64")
+    networks_parser.set_defaults(func=networks)
+
+    query_parser = commands.add_parser("query", help="Query the scenarios of a scenario database by their parameters and summary metrics")
+    query_parser.add_argument("db", help="SQLite scenario database written by run or sweep --db")
+    query_parser.add_argument("where", nargs="?", default="1", help='SQL condition, e.g. "peak_power_kW > 45000", quote parameters as "T_departure.max_HS"')
+    query_parser.add_argument("--order-by", default=None, help="Column to sort by, e.g. winter_DHW_share")
+    query_parser.add_argument("--descending", action="store_true", help="Sort in decreasing order")
+    query_parser.add_argument("--limit", type=int, default=None, help="Maximum number of scenarios")
+    query_parser.add_argument("--columns", default=None, help="Comma separated columns to show, all by default")
+    query_parser.set_defaults(func=query)
+
+    serve_parser = commands.add_parser("serve", help="Serve the pipeline over HTTP on localhost (see backend.service)")
+    serve_parser.add_argument("--host", default=HOST, help="Address to listen on")
+    serve_parser.add_argument("--port", type=int, default=PORT, help="Port to listen on, 0 for any free port")
+    serve_parser.add_argument("--processes", type=int, default=None, help="Maximum number of concurrent pipeline runs, defaults to the number of cores")
+    serve_parser.set_defaults(func=serve)
+
+    args = parser.parse_args(argv)
+    args.func(args)
@@ -0,0 +1,65 @@
+from typing import Any, Optional
+
+import numpy as np
+import pandas as pd
+
+from heatpro.district_heating_load import DistrictHeatingLoad
+from heatpro.temporal_demand import TemporalHeatDemand
+
+COMPACT_FLOAT = np.float32
+# Sector demands are computed in float64 and rounded once to float32 (24 significant bits) when a stage returns.
+# Rounding the demands and the network temperatures read by the next stages moves an energy total (of a sector
+# or of the whole district, over any month, year or the whole run) by less than ENERGY_RELATIVE_BOUND times
+# the energy of all sectors over the same period, as long as totals are accumulated in float64 (ending_dataframe,
+# CalendarIndex.monthly_sum and pandas sums do).
+ENERGY_RELATIVE_BOUND = 4 * 2. ** -24
+
+def compact_frame(frame: pd.DataFrame, index: Optional[pd.Index] = None) -> pd.DataFrame:
+    """Copy of frame with float columns as float32 and integer flags as int8, bool columns are kept.
+
+    Parameters:
+        frame (pd.DataFrame): Table to compact.
+        index (pd.Index, optional): Index equal to frame index, shared instead of copied (e.g. external factors index).
+
+    Returns:
+        pd.DataFrame: Compact table.
+    """
+    columns = {}
+    for name, column in frame.items():
+        values = column.to_numpy()
+        if values.dtype.kind == "f":
+            values = values.astype(COMPACT_FLOAT, copy=False)
+        elif values.dtype.kind in "iu" and len(values) and np.iinfo(np.int8).min <= values.min() and values.max() <= np.iinfo(np.int8).max:
+            values = values.astype(np.int8)
+        columns[name] = values
+    return pd.DataFrame(columns, index=frame.index if index is None else index)
+
+def compact_demand(demand: TemporalHeatDemand, index: Optional[pd.Index] = None) -> TemporalHeatDemand:
+    """Demand of the same class with compact data, see compact_frame"""
+    return type(demand)(demand.name, compact_frame(demand.data, index))
+
+def _frames(value: Any) -> list[pd.DataFrame]:
+    if isinstance(value, pd.DataFrame):
+        return [value]
+    if isinstance(value, TemporalHeatDemand):
+        return [value.data]
+    if isinstance(value, DistrictHeatingLoad):
+        return [value.district_network_temperature, *value.demands.values()] + ([value.data] if hasattr(value, "data") else [])
+    return []
+
+def memory_usage(values: dict[str, Any]) -> dict[str, int]:
+    """Bytes held by the tables of every value (DataFrame, heat demand or district heating load), e.g. pipeline results.
+    A table or an index object held by several values is counted once, for the first value holding it."""
+    seen: set[int] = set()
+    usage = {}
+    for name, value in values.items():
+        usage[name] = 0
+        for frame in _frames(value):
+            if id(frame) in seen:
+                continue
+            seen.add(id(frame))
+            usage[name] += int(frame.memory_usage(index=False, deep=True).sum())
+            if id(frame.index) not in seen:
+                seen.add(id(frame.index))
+                usage[name] += int(frame.index.memory_usage(deep=True))
+    return usage
@@ -0,0 +1,129 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from backend.downsampling import MAX_POINTS, Window, downsample
+from backend.duration_curve import SAMPLE_POINTS
+from backend.resolution import step_hours
+
+# compared quantity: (ending columns, title, unit)
+COMPARED_QUANTITIES = {
+    "load": (["total_thermal_energy_kWh"], "Hourly Heat Demand", "kW"),
+    "flow_rate": (["flow_rate_m3_h"], "Flow Rate", "m3/h"),
+    "temperatures": (["supply_temperature_C", "return_temperature_C"], "Supply and Return Temperatures", "°C"),
+}
+COLUMN_NAMES = {"total_thermal_energy_kWh": "Heat Demand", "flow_rate_m3_h": "Flow Rate", "supply_temperature_C": "Supply Temperature", "return_temperature_C": "Return Temperature"}
+COLORS = {"total_thermal_energy_kWh": "#FF8C42", "flow_rate_m3_h": "#2CA58D", "supply_temperature_C": "#FF4343", "return_temperature_C": "#435AFF"}
+
+class ScenarioComparison:
+    def __init__(self, baseline: pd.DataFrame, live: pd.DataFrame) -> None:
+        """Pinned baseline and live ending tables (see backend.pipeline.ending_dataframe) decoded once into float64 arrays,
+        with the live - baseline differences and the sorted total powers of the duration curves.
+        The demand is compared as power (kW), energy per time step divided by the time step.
+
+        Parameters:
+            baseline (pd.DataFrame): Ending table of the pinned result.
+            live (pd.DataFrame): Ending table of the current result.
+
+        Raises:
+            ValueError: If the tables do not have the same time steps, e.g. they were computed on other external factors.
+        """
+        if not baseline.index.equals(live.index):
+            raise ValueError("Baseline and live results should have the same time steps, the baseline was computed on other external factors")
+        self.index = live.index
+        self.columns = [column for columns, _, _ in COMPARED_QUANTITIES.values() for column in columns]
+        scale = np.array([1 / step_hours(live.index) if column == "total_thermal_energy_kWh" else 1. for column in self.columns])
+        self.baseline = baseline[self.columns].to_numpy(dtype=np.float64) * scale
+        self.live = live[self.columns].to_numpy(dtype=np.float64) * scale
+        self.difference = self.live - self.baseline
+        power = self.columns.index("total_thermal_energy_kWh")
+        self.sorted_baseline_power = -np.sort(-self.baseline[:, power])
+        self.sorted_live_power = -np.sort(-self.live[:, power])
+
+    def frame(self, quantity: str) -> pd.DataFrame:
+        """Baseline, live and difference columns of a quantity of COMPARED_QUANTITIES, indexed by time step"""
+        positions = [self.columns.index(column) for column in COMPARED_QUANTITIES[quantity][0]]
+        return pd.concat({
+            "baseline": pd.DataFrame(self.baseline[:, positions], index=self.index, columns=COMPARED_QUANTITIES[quantity][0]),
+            "live": pd.DataFrame(self.live[:, positions], index=self.index, columns=COMPARED_QUANTITIES[quantity][0]),
+            "difference": pd.DataFrame(self.difference[:, positions], index=self.index, columns=COMPARED_QUANTITIES[quantity][0]),
+        }, axis=1)
+
+    def duration_curves(self, points: int = SAMPLE_POINTS) -> pd.DataFrame:
+        """Baseline and live total power (kW) and their difference at points evenly spaced durations, peak and base included.
+
+        Returns:
+            pd.DataFrame: Indexed by the duration in % of the time steps.
+        """
+        n = len(self.sorted_live_power)
+        positions = np.unique(np.linspace(0, n - 1, min(points, n)).round().astype(int))
+        return pd.DataFrame({
+            "baseline": self.sorted_baseline_power[positions],
+            "live": self.sorted_live_power[positions],
+            "difference": self.sorted_live_power[positions] - self.sorted_baseline_power[positions],
+        }, index=pd.Index(positions / n * 100, name="duration_%"))
+
+    def summary(self) -> pd.DataFrame:
+        """Peak and mean of every compared column and total energy, for the baseline, the live result and their difference"""
+        hours = step_hours(self.index)
+        units = {column: unit for columns, _, unit in COMPARED_QUANTITIES.values() for column in columns}
+        rows = {}
+        for position, column in enumerate(self.columns):
+            name = f"{COLUMN_NAMES[column]} ({units[column]})"
+            rows[f"Peak {name}"] = (self.baseline[:, position].max(), self.live[:, position].max())
+            rows[f"Mean {name}"] = (self.baseline[:, position].mean(), self.live[:, position].mean())
+        power = self.columns.index("total_thermal_energy_kWh")
+        rows["Heat Demand Energy (kWh)"] = (self.baseline[:, power].sum() * hours, self.live[:, power].sum() * hours)
+        summary = pd.DataFrame.from_dict(rows, orient="index", columns=["baseline", "live"])
+        summary["difference"] = summary["live"] - summary["baseline"]
+        summary["difference_%"] = summary["difference"] / summary["baseline"].abs() * 100
+        return summary
+
+def _comparison_figure(title: str, unit: str, x_title: Optional[str] = None) -> go.Figure:
+    fig = make_subplots(rows=2, cols=1, shared_xaxes=True, row_heights=[0.7, 0.3], vertical_spacing=0.05)
+    fig.update_layout(
+        title_text=title,
+        legend=dict(
+            orientation="h",
+            yanchor="top",
+            xanchor="left",
+            y=-0.15,
+        ),
+        hovermode="x unified",
+    )
+    fig.update_yaxes(title_text=f"<b>{unit}</b>", row=1, col=1)
+    fig.update_yaxes(title_text=f"<b>Δ {unit}</b>", row=2, col=1)
+    if x_title is not None:
+        fig.update_xaxes(title_text=x_title, row=2, col=1)
+    return fig
+
+def plot_comparison(comparison: ScenarioComparison, quantity: str, window: Window = None, max_points: Optional[int] = MAX_POINTS) -> go.Figure:
+    """Plot the baseline (dashed) and live values of a quantity of COMPARED_QUANTITIES over their difference (live - baseline).
+    Only the window is plotted, min-max decimated to max_points buckets on every series at once so that the peaks
+    of the baseline, of the live result and of the difference are all kept."""
+    columns, title, unit = COMPARED_QUANTITIES[quantity]
+    scatter = go.Scatter if max_points is None else go.Scattergl
+    values = downsample(comparison.frame(quantity), window, max_points)
+    fig = _comparison_figure(f"{title}: live vs baseline", unit)
+    for column in columns:
+        fig.add_trace(scatter(x=values.index, y=values[("baseline", column)], name=f"Baseline {COLUMN_NAMES[column]}",
+                              line=dict(color=COLORS[column], dash="dash"), opacity=0.6), row=1, col=1)
+        fig.add_trace(scatter(x=values.index, y=values[("live", column)], name=COLUMN_NAMES[column], line_color=COLORS[column]), row=1, col=1)
+        fig.add_trace(scatter(x=values.index, y=values[("difference", column)], name=f"Δ {COLUMN_NAMES[column]}", line_color=COLORS[column],
+                              showlegend=len(columns) > 1), row=2, col=1)
+    if window is not None:
+        fig.update_xaxes(range=window)
+    return fig
+
+def plot_duration_comparison(comparison: ScenarioComparison, points: int = SAMPLE_POINTS) -> go.Figure:
+    """Plot the baseline (dashed) and live load-duration curves over their difference at the same duration"""
+    curves = comparison.duration_curves(points)
+    fig = _comparison_figure("Ordered Heat Demand: live vs baseline", "kW", "<b>Ordered Hours (%)</b>")
+    color = COLORS["total_thermal_energy_kWh"]
+    fig.add_trace(go.Scatter(x=curves.index, y=curves["baseline"], name="Baseline", line=dict(color=color, dash="dash"), opacity=0.6), row=1, col=1)
+    fig.add_trace(go.Scatter(x=curves.index, y=curves["live"], name="Live", line_color=color), row=1, col=1)
+    fig.add_trace(go.Scatter(x=curves.index, y=curves["difference"], name="Δ", line_color=color, showlegend=False), row=2, col=1)
+    return fig
@@ -0,0 +1,65 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+MAX_POINTS = 1000 # buckets sent to the browser per chart, about one per pixel column, each keeps up to 4 points
+
+Window = Optional[tuple[pd.Timestamp, pd.Timestamp]]
+
+def minmax_positions(values: np.ndarray, buckets: int) -> np.ndarray:
+    """Positions of the first, last, minimum and maximum values of every bucket of rows.
+    With several columns the positions of every column are merged, so that all traces share the same x
+    and every local extremum, hence the peaks, is kept exactly.
+
+    Parameters:
+        values (np.ndarray): (n,) or (n, columns) array.
+        buckets (int): Number of buckets the rows are split into.
+
+    Returns:
+        np.ndarray: Sorted unique row positions.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    values = values.reshape(len(values), -1)
+    n = len(values)
+    if n <= 4 * buckets:
+        return np.arange(n)
+    size = -(-n // buckets)
+    # edge padding keeps the last bucket full without changing its extrema
+    padded = np.pad(values, ((0, size * buckets - n), (0, 0)), mode="edge").reshape(buckets, size, -1)
+    starts = np.arange(buckets)[:, None] * size
+    positions = np.concatenate((
+        starts.ravel(),
+        np.minimum(starts.ravel() + size - 1, n - 1),
+        (starts + padded.argmin(axis=1)).ravel(),
+        (starts + padded.argmax(axis=1)).ravel(),
+    ))
+    return np.unique(np.minimum(positions, n - 1))
+
+def window_slice(index: pd.DatetimeIndex, window: Window) -> slice:
+    """Row slice of a sorted index inside window (both ends included), every row if window is None"""
+    if window is None:
+        return slice(None)
+    start, end = index.searchsorted(pd.Timestamp(window[0]), side="left"), index.searchsorted(pd.Timestamp(window[1]), side="right")
+    return slice(start, end)
+
+def downsample(frame: pd.DataFrame, window: Window = None, max_points: Optional[int] = MAX_POINTS, stacked: bool = False) -> pd.DataFrame:
+    """Rows of frame to plot: the rows inside window, min-max decimated to about max_points buckets.
+    The window is sent at full resolution when it holds few enough rows.
+
+    Parameters:
+        frame (pd.DataFrame): One column per trace, sorted datetime index.
+        window (tuple[pd.Timestamp, pd.Timestamp], optional): Displayed period, the whole frame if None.
+        max_points (int, optional): Number of buckets, no decimation if None.
+        stacked (bool): Also keep the extrema of the row sum, i.e. the top of a stacked area chart.
+
+    Returns:
+        pd.DataFrame: Selected rows of frame.
+    """
+    frame = frame.iloc[window_slice(frame.index, window)]
+    if max_points is None:
+        return frame
+    values = frame.to_numpy(dtype=np.float64)
+    if stacked:
+        values = np.column_stack((values, values.sum(axis=1)))
+    return frame.iloc[minmax_positions(values, max_points)]
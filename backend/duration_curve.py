@@ -0,0 +1,78 @@
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+from heatpro.check import ENERGY_FEATURE_NAME
+from heatpro.district_heating_load import DistrictHeatingLoad
+
+from backend.resolution import step_hours
+
+SAMPLE_POINTS = 1000
+
+_CURVES: "weakref.WeakKeyDictionary[DistrictHeatingLoad, DurationCurve]" = weakref.WeakKeyDictionary()
+_CURVES_LOCK = threading.Lock()
+
+class DurationCurve:
+    def __init__(self, sectors: pd.DataFrame) -> None:
+        """Load-duration curve of the total demand, sorted once.
+
+        Parameters:
+            sectors (pd.DataFrame): Energy per time step (kWh) of every sector, one column per sector.
+                The time step is read from the index, hourly if it has less than two rows.
+        """
+        self.sectors = sectors.columns
+        self.step_hours = step_hours(sectors.index)
+        values = sectors.to_numpy(dtype=np.float64)
+        total = values.sum(axis=1)
+        # decreasing total power, stable so that equal powers keep their time order
+        self.order = np.argsort(-total, kind="stable")
+        self.sorted_sectors = values[self.order] / self.step_hours
+        self.sorted_total = total[self.order] / self.step_hours
+        self._cumulative_total = np.cumsum(self.sorted_total)
+
+    @classmethod
+    def of(cls, district_heating: DistrictHeatingLoad) -> "DurationCurve":
+        """Duration curve of a fitted district heating load, cached as long as the load is alive"""
+        with _CURVES_LOCK:
+            curve = _CURVES.get(district_heating)
+            if curve is None:
+                curve = cls(pd.concat({sector: demand[ENERGY_FEATURE_NAME] for sector, demand in district_heating.demands.items()}, axis=1))
+                _CURVES[district_heating] = curve
+            return curve
+
+    def __len__(self) -> int:
+        return len(self.sorted_total)
+
+    def sample(self, points: int = SAMPLE_POINTS) -> pd.DataFrame:
+        """Sector powers (kW) at points evenly spaced durations, first and last (peak and base) included.
+
+        Returns:
+            pd.DataFrame: Indexed by the duration in % of the time steps, one column per sector.
+        """
+        positions = np.unique(np.linspace(0, len(self) - 1, min(points, len(self))).round().astype(int))
+        return pd.DataFrame(self.sorted_sectors[positions], index=pd.Index(positions / len(self) * 100, name="duration_%"), columns=self.sectors)
+
+    def percentile(self, q: float) -> float:
+        """Total power (kW) exceeded during (100 - q) % of the time steps"""
+        return float(np.percentile(self.sorted_total, q))
+
+    def hours_above(self, power: float) -> float:
+        """Hours during which the total demand is strictly above power (kW)"""
+        return self._steps_above(power) * self.step_hours
+
+    def energy_above(self, power: float) -> float:
+        """Energy (kWh) of the total demand above power (kW), e.g. supplied by peak units sized from power"""
+        steps = self._steps_above(power)
+        if steps == 0:
+            return 0.
+        return float(self._cumulative_total[steps - 1] - steps * power) * self.step_hours
+
+    def energy_above_percentile(self, q: float) -> float:
+        """Energy (kWh) of the total demand above its q-th percentile power"""
+        return self.energy_above(self.percentile(q))
+
+    def _steps_above(self, power: float) -> int:
+        # sorted_total is decreasing, count values > power
+        return int(len(self) - np.searchsorted(self.sorted_total[::-1], power, side="right"))
@@ -0,0 +1,57 @@
+from dataclasses import dataclass
+
+import numpy as np
+
+BASE_TEMPERATURE_STEP = 0.5 # °C between tried base temperatures
+
+@dataclass(frozen=True)
+class EnergySignature:
+    """Piecewise demand-temperature law: demand = base_load + slope * max(base_temperature - temperature, 0)"""
+    base_temperature: float
+    base_load: float
+    slope: float
+
+    def __call__(self, temperature: np.ndarray) -> np.ndarray:
+        return self.base_load + self.slope * np.maximum(self.base_temperature - np.asarray(temperature, dtype=np.float64), 0.)
+
+def _prefix_sums(values: np.ndarray) -> np.ndarray:
+    return np.concatenate(([0.], np.cumsum(values)))
+
+def fit_energy_signature(temperature: np.ndarray, demand: np.ndarray, step: float = BASE_TEMPERATURE_STEP) -> EnergySignature:
+    """Least squares energy signature, the base temperature is searched every step °C over the temperature range.
+    For every base temperature the line is solved in closed form from running sums over the sorted temperatures.
+
+    Parameters:
+        temperature (np.ndarray): Outside temperature (°C).
+        demand (np.ndarray): Power demand (kW) at the same time steps.
+        step (float): Base temperature resolution (°C).
+
+    Returns:
+        EnergySignature: Fitted law with the smallest squared error.
+    """
+    temperature = np.asarray(temperature, dtype=np.float64)
+    demand = np.asarray(demand, dtype=np.float64)
+    order = np.argsort(temperature)
+    temperature, demand = temperature[order], demand[order]
+    n = len(temperature)
+    bases = np.arange(temperature[0] + step, temperature[-1], step)
+    if len(bases) == 0:
+        return EnergySignature(float(temperature[-1]), float(demand.mean()), 0.)
+
+    # sums over the points colder than each base: x = base - temperature, x = 0 elsewhere
+    cold = np.searchsorted(temperature, bases)
+    count, sum_t, sum_t2 = cold, _prefix_sums(temperature)[cold], _prefix_sums(temperature ** 2)[cold]
+    sum_dt = _prefix_sums(demand * temperature)[cold]
+    sum_d_cold = _prefix_sums(demand)[cold]
+    sum_x = count * bases - sum_t
+    sum_x2 = count * bases ** 2 - 2 * bases * sum_t + sum_t2
+    sum_xd = bases * sum_d_cold - sum_dt
+    sum_d, sum_d2 = demand.sum(), (demand ** 2).sum()
+
+    variance = n * sum_x2 - sum_x ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        slope = np.where(variance > 0, (n * sum_xd - sum_x * sum_d) / variance, 0.)
+    base_load = (sum_d - slope * sum_x) / n
+    errors = sum_d2 + n * base_load ** 2 + slope ** 2 * sum_x2 - 2 * base_load * sum_d - 2 * slope * sum_xd + 2 * base_load * slope * sum_x
+    best = int(np.argmin(errors))
+    return EnergySignature(float(bases[best]), float(base_load[best]), float(slope[best]))
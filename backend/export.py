@@ -0,0 +1,104 @@
+import gzip
+import io
+import json
+from pathlib import Path
+from typing import Any, BinaryIO, Iterator, Optional, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from backend.profiling import profiled
+
+BATCH_ROWS = 1 << 16 # rows converted and written at once
+UNITS = {"_C": "°C", "_kWh": "kWh", "_m3_h": "m3/h"} # column name suffix: unit
+UNITS_KEY = b"heatpro_app.units"
+PARAMETERS_KEY = b"heatpro_app.parameters"
+# format: (file extension, mime type)
+EXPORT_FORMATS = {
+    "parquet": (".parquet", "application/vnd.apache.parquet"),
+    "feather": (".feather", "application/vnd.apache.arrow.file"),
+    "csv.gz": (".csv.gz", "application/gzip"),
+    "csv": (".csv", "text/csv"),
+}
+
+def column_units(columns: list[str]) -> dict[str, str]:
+    """Units of the result columns, read from their name suffix"""
+    return {column: unit for column in columns for suffix, unit in UNITS.items() if str(column).endswith(suffix)}
+
+def export_schema(result: pd.DataFrame, parameters: Optional[dict[str, Any]] = None) -> pa.Schema:
+    """Arrow schema of a result table, with the units of every field and the scenario parameters as JSON metadata"""
+    schema = pa.Schema.from_pandas(result.iloc[:1]) # object columns are typed from a value
+    units = column_units(list(result.columns))
+    schema = pa.schema(
+        [field.with_metadata({"unit": units[field.name]}) if field.name in units else field for field in schema],
+        metadata=schema.metadata,
+    )
+    metadata = dict(schema.metadata or {})
+    metadata[UNITS_KEY] = json.dumps(units).encode()
+    if parameters is not None:
+        metadata[PARAMETERS_KEY] = json.dumps(parameters, default=str).encode()
+    return schema.with_metadata(metadata)
+
+def read_export_metadata(path: Union[str, Path]) -> tuple[dict[str, str], dict[str, Any]]:
+    """Units and scenario parameters stored in a Parquet or Feather export"""
+    path = Path(path)
+    schema = pq.read_schema(path) if path.suffix == ".parquet" else pa.ipc.open_file(pa.memory_map(str(path))).schema
+    metadata = schema.metadata or {}
+    return json.loads(metadata.get(UNITS_KEY, b"{}")), json.loads(metadata.get(PARAMETERS_KEY, b"{}"))
+
+def _batches(result: pd.DataFrame, schema: pa.Schema, batch_rows: int) -> Iterator[pa.RecordBatch]:
+    for start in range(0, len(result), batch_rows):
+        yield pa.RecordBatch.from_pandas(result.iloc[start:start + batch_rows], schema=schema)
+
+def write_export(result: pd.DataFrame, sink: Union[str, Path, BinaryIO], file_format: str, parameters: Optional[dict[str, Any]] = None, batch_rows: int = BATCH_ROWS) -> None:
+    """Write a result table batch by batch, only one batch is converted to Arrow at a time.
+
+    Parameters:
+        result (pd.DataFrame): Result table, e.g. the "ending" stage of the pipeline.
+        sink (str | Path | BinaryIO): Output path or writable binary file.
+        file_format (str): "parquet" (zstd), "feather" (zstd), "csv.gz" or "csv".
+        parameters (dict, optional): Scenario parameters stored with the units in the file metadata.
+            CSV files have no metadata, both are written as "# " comment lines before the header.
+        batch_rows (int): Rows per Parquet row group / Feather record batch / CSV chunk.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format {file_format}, use one of {', '.join(EXPORT_FORMATS)}")
+    if isinstance(sink, (str, Path)):
+        with open(sink, "wb") as f:
+            return write_export(result, f, file_format, parameters, batch_rows)
+
+    if file_format in ("parquet", "feather"):
+        schema = export_schema(result, parameters)
+        writer = pq.ParquetWriter(sink, schema, compression="zstd") if file_format == "parquet" else \
+            pa.ipc.new_file(sink, schema, options=pa.ipc.IpcWriteOptions(compression="zstd"))
+        with writer:
+            for batch in _batches(result, schema, batch_rows):
+                writer.write_batch(batch)
+        return
+
+    # Index as first column with whole seconds timestamps, as read by backend.ingestion
+    result = result.rename_axis(result.index.name or "datetime").reset_index()
+    schema = export_schema(result, parameters)
+    schema = schema.set(0, schema.field(0).with_type(pa.timestamp("s"))) if pa.types.is_timestamp(schema.field(0).type) else schema
+    stream = gzip.GzipFile(fileobj=sink, mode="wb", compresslevel=6) if file_format == "csv.gz" else sink
+    stream.write(f"# units: {schema.metadata[UNITS_KEY].decode()}\n".encode())
+    if parameters is not None:
+        stream.write(f"# parameters: {schema.metadata[PARAMETERS_KEY].decode()}\n".encode())
+    writer = pa_csv.CSVWriter(stream, schema, write_options=pa_csv.WriteOptions(quoting_style="none"))
+    for batch in _batches(result, schema, batch_rows):
+        writer.write_batch(batch)
+    writer.close()
+    if file_format == "csv.gz":
+        stream.close()
+
+@profiled()
+def export_bytes(result: pd.DataFrame, file_format: str, parameters: Optional[dict[str, Any]] = None) -> bytes:
+    """Result table exported in memory, e.g. for a download button"""
+    buffer = io.BytesIO()
+    write_export(result, buffer, file_format, parameters)
+    return buffer.getvalue()
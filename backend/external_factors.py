@@ -1,14 +1,21 @@
-import pandas as pd
+from typing import Optional
+
 import plotly.graph_objects as go
 
-from heatpro.external_factors import EXTERNAL_TEMPERATURE_NAME, HEATING_SEASON_NAME
+from heatpro.external_factors import EXTERNAL_TEMPERATURE_NAME
 from heatpro.district_heating_load import DistrictHeatingLoad
 
-def plot_external_factors(district_heating: DistrictHeatingLoad) -> go.Figure:
+from backend.downsampling import MAX_POINTS, Window, downsample
+from backend.heating_season import add_heating_season
+
+def plot_external_factors(district_heating: DistrictHeatingLoad, window: Window = None, max_points: Optional[int] = MAX_POINTS) -> go.Figure:
+    """Plot the outside temperature, only the window min-max decimated to max_points buckets, with WebGL when decimated"""
+    scatter = go.Scatter if max_points is None else go.Scattergl
+    temperature = downsample(district_heating.external_factors.data[[EXTERNAL_TEMPERATURE_NAME]], window, max_points)
     fig = go.Figure([
-            go.Scatter(
-                x = district_heating.external_factors.data.index,
-                y = district_heating.external_factors.data[EXTERNAL_TEMPERATURE_NAME],
+            scatter(
+                x = temperature.index,
+                y = temperature[EXTERNAL_TEMPERATURE_NAME],
                 name = 'Outside Temperature',
                 # marker_color="#5C5C5C ",
                 showlegend=True,
@@ -24,52 +31,38 @@ def plot_external_factors(district_heating: DistrictHeatingLoad) -> go.Figure:
                             ),
             layout_hovermode='x unified',
                 )
-    changes = district_heating.external_factors.data[HEATING_SEASON_NAME].diff().astype(bool)
-    changing_date = pd.concat((changes[changes == True],changes.tail(1)))
-    for start, end in zip(changing_date[::2].index,changing_date[1::2].index):
-        fig.add_annotation(
-                text="Heating Season",
-                x=start,
-                y=district_heating.external_factors.data[EXTERNAL_TEMPERATURE_NAME].min(),
-                font = dict(size=14, color='green'),
-                showarrow=False,
-                xanchor="left",
-            )
-        fig.add_vrect(
-            x0=start, 
-            x1=end,
-            line_width=0,
-            fillcolor="rgb(108, 150, 116)",
-            opacity=0.5,
-            layer="below",
-            )
-    
+    add_heating_season(fig, district_heating.external_factors, district_heating.external_factors.data[EXTERNAL_TEMPERATURE_NAME].min(), window)
+    if window is not None:
+        fig.update_xaxes(range=window)
     return fig
 
-def plot_induced_factors(district_heating: DistrictHeatingLoad) -> go.Figure:
+def plot_induced_factors(district_heating: DistrictHeatingLoad, window: Window = None, max_points: Optional[int] = MAX_POINTS) -> go.Figure:
+    """Plot the network temperatures, only the window min-max decimated to max_points buckets, with WebGL when decimated"""
+    scatter = go.Scatter if max_points is None else go.Scattergl
+    temperatures = downsample(district_heating.district_network_temperature[["departure_temperature","return_temperature","cold_water_temperature","soil_temperature"]], window, max_points)
     fig = go.Figure(
                 data=[
-                    go.Scatter(
-                        x = district_heating.district_network_temperature.index,
-                        y = district_heating.district_network_temperature["departure_temperature"],
+                    scatter(
+                        x = temperatures.index,
+                        y = temperatures["departure_temperature"],
                         name="Supply Temperature",
                         marker_color = "#FF4343",
                     ),
-                    go.Scatter(
-                        x = district_heating.district_network_temperature.index,
-                        y = district_heating.district_network_temperature["return_temperature"],
+                    scatter(
+                        x = temperatures.index,
+                        y = temperatures["return_temperature"],
                         name="Return Temperature",
                         marker_color = "#435AFF",
                     ),
-                    go.Scatter(
-                        x = district_heating.district_network_temperature.index,
-                        y = district_heating.district_network_temperature["cold_water_temperature"],
+                    scatter(
+                        x = temperatures.index,
+                        y = temperatures["cold_water_temperature"],
                         name="Cold Water Temperature",
                         marker_color="#43F6FF",
                     ),
-                    go.Scatter(
-                        x = district_heating.district_network_temperature.index,
-                        y = district_heating.district_network_temperature["soil_temperature"],
+                    scatter(
+                        x = temperatures.index,
+                        y = temperatures["soil_temperature"],
                         name="Ground Temperature",
                         marker_color="#A52A2A",
                     ),
@@ -85,25 +78,8 @@ def plot_induced_factors(district_heating: DistrictHeatingLoad) -> go.Figure:
                 layout_hovermode='x unified',
             )
         
-    changes = district_heating.external_factors.data[HEATING_SEASON_NAME].diff().astype(bool)
-    changing_date = pd.concat((changes[changes == True],changes.tail(1)))
-    for start, end in zip(changing_date[::2].index,changing_date[1::2].index):
-        fig.add_annotation(
-                text="Heating Season",
-                x=start,
-                y=district_heating.external_factors.data[EXTERNAL_TEMPERATURE_NAME].min(),
-                font = dict(size=14, color='green'),
-                showarrow=False,
-                xanchor="left",
-            )
-        fig.add_vrect(
-            x0=start, 
-            x1=end,
-            line_width=0,
-            fillcolor="rgb(108, 150, 116)",
-            opacity=0.5,
-            layer="below",
-            )
-    
+    add_heating_season(fig, district_heating.external_factors, district_heating.external_factors.data[EXTERNAL_TEMPERATURE_NAME].min(), window)
+    if window is not None:
+        fig.update_xaxes(range=window)
     return fig
     
\ No newline at end of file
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from heatpro.external_factors import ExternalFactors, HEATING_SEASON_NAME
+
+from backend.downsampling import Window
+
+HEATING_SEASON_COLOR = "rgb(108, 150, 116)"
+
+def heating_season_intervals(external_factors: ExternalFactors) -> pd.DataFrame:
+    """Heating season periods, one row per run of heating hours, found in one pass over the flags (faster than hashing them for a cache).
+    A period ends on the first hour out of the heating season, or on the last hour of the data.
+
+    Returns:
+        pd.DataFrame: start and end columns of timestamps.
+    """
+    heating_season = external_factors.data[HEATING_SEASON_NAME]
+    flags = np.concatenate(([False], heating_season.to_numpy(dtype=bool), [False]))
+    changes = np.flatnonzero(flags[1:] != flags[:-1])
+    starts, ends = changes[::2], np.minimum(changes[1::2], len(heating_season) - 1)
+    return pd.DataFrame({"start": heating_season.index[starts], "end": heating_season.index[ends]})
+
+def add_heating_season(fig: go.Figure, external_factors: ExternalFactors, label_y: float, window: Window = None) -> go.Figure:
+    """Shade the heating season periods of fig and label them at label_y, in a single layout update.
+    Only the periods overlapping window are drawn."""
+    intervals = heating_season_intervals(external_factors)
+    if window is not None:
+        intervals = intervals[(intervals["end"] >= pd.Timestamp(window[0])) & (intervals["start"] <= pd.Timestamp(window[1]))]
+    shapes = [
+        dict(type="rect", xref="x", yref="paper", x0=start, x1=end, y0=0, y1=1,
+             line_width=0, fillcolor=HEATING_SEASON_COLOR, opacity=0.5, layer="below")
+        for start, end in zip(intervals["start"], intervals["end"])
+    ]
+    annotations = [
+        dict(text="Heating Season", x=start, y=label_y, font=dict(size=14, color='green'), showarrow=False, xanchor="left")
+        for start in intervals["start"]
+    ]
+    fig.update_layout(shapes=list(fig.layout.shapes) + shapes, annotations=list(fig.layout.annotations) + annotations)
+    return fig
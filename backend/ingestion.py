@@ -0,0 +1,270 @@
+import contextlib
+import hashlib
+import os
+import time
+import warnings
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+
+from heatpro.external_factors import ExternalFactors, EXTERNAL_TEMPERATURE_NAME, HEATING_SEASON_NAME
+
+from backend.cache import LRUCache, fingerprint
+from backend.profiling import measure_stage, profiled
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S" # tried first, then pandas parsing (ISO 8601 among others, see _parse_timestamps)
+CSV_BLOCK_SIZE = 1 << 22 # bytes read per chunk
+FORMATS = {".csv": "csv", ".parquet": "parquet", ".feather": "arrow", ".arrow": "arrow", ".ipc": "arrow"}
+# parsed datasets shared by every session, and their Arrow copies on disk, both keyed on the file content
+DATASET_CACHE = LRUCache(maxsize=8)
+DATASET_SLICE_CACHE = LRUCache(maxsize=8) # first rows of cached datasets, kept apart so that they do not evict whole datasets
+DATASET_DIRECTORY = Path(os.environ.get("HEATPRO_APP_CACHE", ".cache")) / "datasets"
+DATASET_DIRECTORY_BYTES = 1 << 30 # size of the Arrow copies above which the least recently used ones are deleted
+
+@dataclass(frozen=True)
+class LoadReport:
+    source: str
+    rows: int
+    seconds: float
+    peak_memory: int # bytes allocated by Arrow, and by Python if measured
+    cached: bool = False
+
+    def __str__(self) -> str:
+        if self.cached:
+            return f"{self.rows} rows of {self.source} found in cache in {self.seconds * 1e3:.1f} ms"
+        return f"{self.rows} rows loaded from {self.source} in {self.seconds:.2f} s (peak memory {self.peak_memory / 2**20:.1f} MiB)"
+
+def _format_of(source: Union[str, Path, BinaryIO], file_format: Optional[str]) -> str:
+    if file_format is not None:
+        return file_format
+    suffix = Path(getattr(source, "name", str(source))).suffix.lower()
+    if suffix not in FORMATS:
+        raise ValueError(f"Unknown external factors format {suffix or 'without extension'}, use one of {', '.join(FORMATS)} or set file_format")
+    return FORMATS[suffix]
+
+def _read_table(source: Union[str, Path, BinaryIO], file_format: str, timestamp_format: str, compact: bool) -> pa.Table:
+    if file_format == "csv":
+        # Streaming reader: the file is parsed block by block, timestamps with an explicit format. Arrow ISO 8601 parsing
+        # is left to _parse_timestamps, it would convert timestamps with a UTC offset to UTC instead of keeping their local time
+        try:
+            reader = pa_csv.open_csv(
+                source,
+                read_options=pa_csv.ReadOptions(block_size=CSV_BLOCK_SIZE),
+                convert_options=pa_csv.ConvertOptions(
+                    column_types={EXTERNAL_TEMPERATURE_NAME: pa.float32() if compact else pa.float64(), HEATING_SEASON_NAME: pa.bool_()},
+                    timestamp_parsers=[timestamp_format],
+                ),
+            )
+            return reader.read_all()
+        except pa.ArrowInvalid as error:
+            raise ValueError(f"Invalid external factors CSV, {EXTERNAL_TEMPERATURE_NAME} should be numbers and {HEATING_SEASON_NAME} "
+                             f"true/false or 1/0: {error}") from error
+    if file_format == "parquet":
+        return pq.read_table(source, memory_map=True)
+    if file_format == "arrow":
+        # Memory-mapped file, columns are not read before being converted
+        stream = pa.memory_map(str(source)) if isinstance(source, (str, Path)) else pa.BufferReader(source.read())
+        try:
+            return pa.ipc.open_file(stream).read_all()
+        except pa.ArrowInvalid:
+            stream.seek(0)
+            return pa.ipc.open_stream(stream).read_all()
+    raise ValueError(f"Unknown external factors format {file_format}, use csv, parquet or arrow")
+
+def _parse_timestamps(values: pa.ChunkedArray, name: str, timestamp_format: str) -> pa.ChunkedArray:
+    """Timestamps of a column that CSV reading left as strings: timestamp_format, else pandas inference (e.g. ISO 8601
+    or "01/31/2020 00:00"), else day first (e.g. "31/01/2020 00:00"). Timestamps with a UTC offset keep their local time.
+
+    Raises:
+        ValueError: If no parser reads every value, or the values have different UTC offsets (e.g. daylight saving time).
+    """
+    strings = values.cast(pa.string())
+    try:
+        return pc.strptime(strings, format=timestamp_format, unit="ns")
+    except pa.ArrowInvalid:
+        pass
+    for dayfirst in (False, True):
+        with warnings.catch_warnings():
+            # mixed offsets are parsed as objects with a warning, rejected below
+            warnings.simplefilter("ignore", FutureWarning)
+            try:
+                parsed = pd.to_datetime(strings.to_numpy(zero_copy_only=False), dayfirst=dayfirst)
+            except (ValueError, TypeError):
+                continue
+        if not isinstance(parsed, pd.DatetimeIndex):
+            raise ValueError(f"Column {name} should hold timestamps with a single UTC offset or none, got several offsets (e.g. daylight saving time)")
+        # local time: months, years, days and hours of the profiles are those of the wall clock
+        return pa.chunked_array([pa.array(parsed.tz_localize(None).to_numpy(), pa.timestamp("ns"))])
+    raise ValueError(f"Column {name} should hold timestamps as {timestamp_format.replace('%', '')}, ISO 8601 or day/month/year, got {strings[0]}")
+
+def _index_column(table: pa.Table) -> str:
+    """Name of the datetime column: pandas index if stored, else first timestamp column, else first column"""
+    pandas_index = [column for column in (table.schema.pandas_metadata or {}).get("index_columns", []) if isinstance(column, str)]
+    if pandas_index:
+        return pandas_index[0]
+    return next((field.name for field in table.schema if pa.types.is_timestamp(field.type)), table.column_names[0])
+
+@profiled()
+def read_external_factors(source: Union[str, Path, BinaryIO], file_format: Optional[str] = None,
+                          timestamp_format: str = TIMESTAMP_FORMAT, compact: bool = True, measure_memory: bool = False) -> tuple[ExternalFactors, LoadReport]:
+    """Load external factors from a CSV, Parquet or Arrow IPC/Feather file (path or file-like object such as a Streamlit upload).
+
+    Only the datetime index and the required features are kept. If compact, external temperature is stored as float32,
+    heating season is always stored as bool. Columns are converted once from Arrow buffers, without intermediate DataFrame.
+
+    Parameters:
+        source (str | Path | BinaryIO): File to read.
+        file_format (str, optional): "csv", "parquet" or "arrow", guessed from the file extension if None.
+        timestamp_format (str): strptime format of CSV (or string) timestamps, tried before ISO 8601 and pandas parsing.
+            Timestamps with a UTC offset or time zone keep their local time.
+        compact (bool): Downcast external temperature to float32.
+        measure_memory (bool): Trace Python allocations (tracemalloc) for the peak memory, which slows them down.
+            They are also measured when a profile traces memory (see backend.profiling), only Arrow allocations otherwise.
+
+    Raises:
+        ValueError: If the format is unknown or a required feature is missing.
+
+    Returns:
+        tuple[ExternalFactors, LoadReport]: External factors and load time and peak memory summary.
+    """
+    file_format = _format_of(source, file_format)
+    arrow_memory = pa.total_allocated_bytes()
+    start = time.perf_counter()
+
+    # span of the active profile, or measured on its own if measure_memory
+    with measure_stage("convert_external_factors", measure_memory) as span:
+        table = _read_table(source, file_format, timestamp_format, compact)
+        missing = {EXTERNAL_TEMPERATURE_NAME, HEATING_SEASON_NAME} - set(table.column_names)
+        if missing:
+            raise ValueError(f"Missing required features, external factors must contain columns: {', '.join(sorted(missing))}")
+        index_column = _index_column(table)
+        timestamps = table[index_column]
+        if not pa.types.is_timestamp(timestamps.type):
+            timestamps = _parse_timestamps(timestamps, index_column, timestamp_format)
+        elif timestamps.type.tz is not None:
+            # local time of zoned Parquet or Arrow timestamps, a cast would give UTC
+            timestamps = pc.local_timestamp(timestamps)
+        arrow_peak = pa.total_allocated_bytes() - arrow_memory
+
+        external_temperature = table[EXTERNAL_TEMPERATURE_NAME].cast(pa.float32() if compact else pa.float64())
+        heating_season = table[HEATING_SEASON_NAME].cast(pa.bool_())
+        data = pd.DataFrame(
+            {
+                EXTERNAL_TEMPERATURE_NAME: external_temperature.to_numpy(),
+                HEATING_SEASON_NAME: heating_season.to_numpy(),
+            },
+            index=pd.DatetimeIndex(timestamps.cast(pa.timestamp("ns")).to_numpy(), name=None if index_column.startswith("__index_level_") else index_column or None),
+            copy=False,
+        )
+        del table, timestamps, external_temperature, heating_season
+
+    seconds = time.perf_counter() - start
+    python_peak = 0 if span is None or span.peak_memory is None else span.peak_memory
+    peak_memory = python_peak + max(arrow_peak, 0)
+    return ExternalFactors(data), LoadReport(getattr(source, "name", str(source)), len(data), seconds, peak_memory)
+
+def content_hash(source: Union[str, Path, BinaryIO]) -> str:
+    """Hash of the bytes of a file (path or file-like object, read from its start and rewound)"""
+    digest = hashlib.blake2b(digest_size=16)
+    if isinstance(source, (str, Path)):
+        with open(source, "rb") as file:
+            for chunk in iter(lambda: file.read(CSV_BLOCK_SIZE), b""):
+                digest.update(chunk)
+    else:
+        source.seek(0)
+        for chunk in iter(lambda: source.read(CSV_BLOCK_SIZE), b""):
+            digest.update(chunk)
+        source.seek(0)
+    return digest.hexdigest()
+
+def _write_dataset(external_factors: ExternalFactors, path: Path) -> None:
+    """Uncompressed Arrow IPC file, so that later reads are memory-mapped without decoding"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(external_factors.data, preserve_index=True)
+    temporary = path.with_suffix(f".{os.getpid()}.tmp")
+    with pa.OSFile(str(temporary), "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    # atomic, another session or process may be writing the same dataset
+    os.replace(temporary, path)
+
+def _evict_datasets(directory: Path, max_bytes: int, keep: Path) -> None:
+    """Delete the least recently used Arrow copies of directory (by modification time, updated on use) above max_bytes, except keep"""
+    stored = []
+    for path in directory.glob("*.arrow"):
+        try:
+            stat = path.stat()
+        except FileNotFoundError: # deleted by another process
+            continue
+        stored.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in stored)
+    for _, size, path in sorted(stored):
+        if total <= max_bytes:
+            break
+        if path == keep:
+            continue
+        # a memory-mapped copy stays readable until unmapped, where it cannot be deleted (Windows) it is kept
+        with contextlib.suppress(OSError):
+            path.unlink()
+            total -= size
+
+@profiled()
+def load_external_factors(source: Union[str, Path, BinaryIO], file_format: Optional[str] = None, timestamp_format: str = TIMESTAMP_FORMAT,
+                          compact: bool = True, rows: Optional[int] = None, directory: Optional[Path] = DATASET_DIRECTORY) -> tuple[ExternalFactors, LoadReport]:
+    """read_external_factors cached on the content of the file.
+
+    Parsed datasets are kept in DATASET_CACHE, shared by every session, and stored in directory as Arrow IPC files
+    named after the content hash, which are memory-mapped instead of parsing the source again (e.g. after a restart).
+    The returned external factors are shared and must not be modified in place.
+
+    Parameters:
+        source (str | Path | BinaryIO): File to read.
+        file_format (str, optional): "csv", "parquet" or "arrow", guessed from the file extension if None.
+        timestamp_format (str): strptime format of CSV (or string) timestamps, tried before ISO 8601 and pandas parsing.
+            Timestamps with a UTC offset or time zone keep their local time.
+        compact (bool): Downcast external temperature to float32.
+        rows (int, optional): Keep the first rows only, as a zero-copy slice of the cached dataset (cached in DATASET_SLICE_CACHE).
+        directory (Path, optional): Directory of the Arrow copies, None to cache in memory only.
+            Once they exceed DATASET_DIRECTORY_BYTES, the least recently used copies are deleted.
+
+    Raises:
+        ValueError: If the format is unknown or a required feature is missing.
+
+    Returns:
+        tuple[ExternalFactors, LoadReport]: External factors and load summary, flagged cached unless the source was parsed.
+    """
+    start = time.perf_counter()
+    file_format = _format_of(source, file_format)
+    key = (content_hash(source), file_format, timestamp_format, compact)
+    parsed = []
+
+    def load() -> tuple[ExternalFactors, LoadReport]:
+        stored = None if directory is None else Path(directory) / f"{fingerprint(key)}.arrow"
+        external_factors = None
+        if stored is not None:
+            try:
+                os.utime(stored) # marked as used for eviction
+                external_factors, report = read_external_factors(stored, "arrow", compact=compact)
+            except FileNotFoundError: # not stored, or evicted by another process meanwhile
+                pass
+        if external_factors is None:
+            external_factors, report = read_external_factors(source, file_format, timestamp_format, compact)
+            if stored is not None:
+                _write_dataset(external_factors, stored)
+                _evict_datasets(stored.parent, DATASET_DIRECTORY_BYTES, stored)
+        parsed.append(report)
+        return external_factors, report
+
+    external_factors, report = DATASET_CACHE.get_or_compute(key, load)
+    if rows is not None:
+        external_factors = DATASET_SLICE_CACHE.get_or_compute(key + (rows,), lambda: ExternalFactors(external_factors.data.iloc[:rows]))
+    source_name = getattr(source, "name", str(source))
+    if parsed:
+        return external_factors, LoadReport(source_name, len(external_factors.data), parsed[0].seconds, parsed[0].peak_memory)
+    return external_factors, LoadReport(source_name, len(external_factors.data), time.perf_counter() - start, 0, cached=True)
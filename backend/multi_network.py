@@ -0,0 +1,190 @@
+from dataclasses import dataclass
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from heatpro.check import ENERGY_FEATURE_NAME
+from heatpro.district_heating_load import DistrictHeatingLoad
+from heatpro.external_factors import (ExternalFactors, EXTERNAL_TEMPERATURE_NAME, CLOSED_HEATING_SEASON_NAME,
+                                      COLD_WATER_TEMPERATURE_NAME, DEPARTURE_TEMPERATURE_NAME, RETURN_TEMPERATURE_NAME, SOIL_TEMPERATURE_NAME,
+                                      closed_heating_season, burch_cold_water, kasuda_soil_temperature)
+from heatpro.temporal_demand import HourlyHeatDemand, TemporalHeatDemand
+
+from backend.calendar_index import CalendarIndex, Groups
+from backend.compact import COMPACT_FLOAT, compact_frame
+from backend.pipeline.induced_kernels import departure_temperature_kernel, return_temperature_kernel, soil_diffusivity
+from backend.resolution import felt_temperature
+from backend.weekly_pattern import weekly_weight_array
+import config
+
+SECTORS = ["hot_water", "industry", "heat_loss", "building"]
+
+@dataclass
+class _SharedFactors:
+    """Everything that does not depend on the network, computed once"""
+    external_factors: ExternalFactors
+    calendar: CalendarIndex
+    closed_heating_season: pd.DataFrame
+    felt_temperature: np.ndarray
+    cold_water_temperature: pd.DataFrame
+    soil_temperature: pd.DataFrame
+
+def _shared_factors(external_factors: ExternalFactors, soil: config.Soil) -> _SharedFactors:
+    return _SharedFactors(
+        external_factors=external_factors,
+        calendar=CalendarIndex.of(external_factors),
+        closed_heating_season=closed_heating_season(external_factors),
+        felt_temperature=felt_temperature(external_factors.data[EXTERNAL_TEMPERATURE_NAME]).to_numpy(),
+        cold_water_temperature=burch_cold_water(external_factors),
+        soil_temperature=kasuda_soil_temperature(external_factors,
+                                                 d=soil.depth,
+                                                 alpha=soil_diffusivity(soil.conductivity, soil.capacity, soil.density)),
+    )
+
+def _parameter(networks: list[dict[str, Any]], name: str, field: str = None) -> np.ndarray:
+    """Row vector of one parameter of every network"""
+    return np.array([float(getattr(network[name], field) if field else network[name]) for network in networks])
+
+def _monthly(networks: list[dict[str, Any]], name: str, calendar: CalendarIndex) -> np.ndarray:
+    """(months x networks) array of a monthly table of every network, aligned on the months of the data"""
+    return np.column_stack([calendar.to_months(network[name].iloc[:, 0]) for network in networks])
+
+def _yearly(networks: list[dict[str, Any]], name: str, calendar: CalendarIndex) -> np.ndarray:
+    return np.column_stack([calendar.to_years(network[name][ENERGY_FEATURE_NAME]) for network in networks])
+
+def _weekly(networks: list[dict[str, Any]], name: str, normalize: bool, steps_per_hour: int = 1) -> np.ndarray:
+    """(168*steps_per_hour x networks) array of a weekly profile of every network"""
+    return np.column_stack([weekly_weight_array(network[name], normalize, steps_per_hour).ravel() for network in networks])
+
+class MultiNetworkResult:
+    def __init__(self, names: list[str], shared: _SharedFactors, demands: dict[str, np.ndarray],
+                 departure_temperature: np.ndarray, return_temperature: np.ndarray,
+                 delta_temperature: np.ndarray, water_heat_capacity: np.ndarray) -> None:
+        """Results of several networks, every array has shape (time steps x networks)"""
+        self.names = names
+        self.index = shared.external_factors.data.index
+        self.demands = demands
+        self.departure_temperature = departure_temperature
+        self.return_temperature = return_temperature
+        self.delta_temperature = delta_temperature
+        self.water_heat_capacity = water_heat_capacity
+        self._shared = shared
+
+    def district_heating(self, name: str) -> DistrictHeatingLoad:
+        """DistrictHeatingLoad of one network, as built by the app pipeline (already fitted)"""
+        position = self.names.index(name)
+        network_temperature = pd.concat((
+            self._shared.closed_heating_season,
+            self._shared.cold_water_temperature,
+            pd.DataFrame({DEPARTURE_TEMPERATURE_NAME: self.departure_temperature[:, position],
+                          RETURN_TEMPERATURE_NAME: self.return_temperature[:, position]}, index=self.index),
+            self._shared.soil_temperature,
+        ), axis=1)
+        demand_class = HourlyHeatDemand if self._shared.calendar.steps_per_hour == 1 else TemporalHeatDemand
+        district_heating = DistrictHeatingLoad(
+            demands=[demand_class(sector, pd.DataFrame({ENERGY_FEATURE_NAME: self.demands[sector][:, position]}, index=self.index))
+                     for sector in SECTORS],
+            external_factors=self._shared.external_factors,
+            district_network_temperature=network_temperature,
+            delta_temperature=self.delta_temperature[position],
+            cp=self.water_heat_capacity[position],
+        )
+        district_heating.data = pd.concat(
+            [district_heating.external_factors.data, district_heating.district_network_temperature] +
+            [demand.rename(lambda x: f"{name}_{x}", axis=1) for name, demand in district_heating.demands.items()],
+            axis=1
+        )
+        return district_heating
+
+def run_networks(external_factors: ExternalFactors, soil: config.Soil, networks: dict[str, dict[str, Any]], compact: bool = False) -> MultiNetworkResult:
+    """Run the app pipeline for several district heating networks sharing the same external factors and ground.
+
+    Calendar, heating season, felt temperature, cold water and soil temperatures are computed once.
+    Disaggregation of every network is done at once on (time steps x networks) arrays, hourly or finer (see backend.resolution).
+
+    Parameters:
+        external_factors (ExternalFactors): Shared external factors.
+        soil (config.Soil): Shared ground properties.
+        networks (dict[str, dict[str, Any]]): Pipeline inputs of each network (see backend.pipeline.DISTRICT_HEATING_STAGES),
+            external_factors, soil, month_index and compact entries are ignored.
+        compact (bool): Keep demands and temperatures as float32 (computed in float64), see backend.compact.
+
+    Returns:
+        MultiNetworkResult: Demands per time step and temperatures of every network.
+    """
+    shared = _shared_factors(external_factors, soil)
+    names = list(networks)
+    inputs = list(networks.values())
+    calendar = shared.calendar
+    months, years, days = calendar.months, calendar.years, calendar.days
+    steps_per_day = calendar.steps_per_day
+
+    # Network temperatures
+    departure_temperature = departure_temperature_kernel(
+        external_factors, *(_parameter(inputs, "T_departure", field) for field in ("max_HS", "max_NHS", "min_HS", "min_NHS", "ext_mid", "ext_min")))
+    return_temperature = return_temperature_kernel(external_factors, _parameter(inputs, "T_return", "HS"), _parameter(inputs, "T_return", "NHS"))
+
+    loss_share = _parameter(inputs, "loss_percentage")
+    demand_share = 1 - loss_share * _parameter(inputs, "loss_included")
+    monthly_building_load_df = _monthly(inputs, "monthly_building_load_df", calendar)
+    monthly_building_load = monthly_building_load_df * demand_share
+    yearly_industry_consumption = _yearly(inputs, "yearly_industry_consumption", calendar)
+
+    # Domestic hot water (heatpro basic_hot_water_hourly_profile and special_hot_water)
+    raw_hot_water_profile = _weekly(inputs, "weekly_hot_water_profile", normalize=True, steps_per_hour=calendar.steps_per_hour)[calendar.week_positions]
+    simultaneity = _parameter(inputs, "config_hot_water", "simultaneity")
+    sanitary_loop_coef = _parameter(inputs, "config_hot_water", "sanitary_loop_coef")
+    hot_water_day_profile = np.minimum(raw_hot_water_profile, simultaneity * calendar.days_of_month.transform(raw_hot_water_profile, np.maximum))
+    hot_water_day_profile = hot_water_day_profile + 1/steps_per_day - calendar.days_of_month.transform(hot_water_day_profile) / calendar.days_of_month.sizes[calendar.days_of_month.codes, None]
+    hot_water_day_profile = sanitary_loop_coef/steps_per_day + (1-sanitary_loop_coef)*hot_water_day_profile
+
+    closed_heating_season_hours = shared.closed_heating_season[CLOSED_HEATING_SEASON_NAME].to_numpy(dtype=bool)
+    weighted_delta_temperature = (_monthly(inputs, "monthly_hot_water_profile", calendar) / 24)[months.codes] *\
+        (_parameter(inputs, "config_hot_water", "temperature") - shared.cold_water_temperature[COLD_WATER_TEMPERATURE_NAME].to_numpy()[:, None])
+    daily_weighted_delta_temperature = days.transform(weighted_delta_temperature)
+    non_heating_month = ~months.reduce(closed_heating_season_hours[:, None], np.logical_or)[:, 0]
+    non_heating_season_consumption = monthly_building_load[non_heating_month].sum(axis=0)
+    daily_hot_water = np.where(
+        non_heating_month[months.codes][:, None],
+        (monthly_building_load / months.reduce(weighted_delta_temperature))[months.codes] * daily_weighted_delta_temperature,
+        non_heating_season_consumption * daily_weighted_delta_temperature / weighted_delta_temperature[~closed_heating_season_hours].sum(axis=0),
+    )
+    hot_water = daily_hot_water * hot_water_day_profile
+
+    # Space heating (heatpro basic_building_heating_profile and weekly_weighted_disaggregate)
+    monthly_residential_load = monthly_building_load - months.reduce(hot_water)
+    weighted_delta_felt_temperature = np.clip(_parameter(inputs, "non_heating_temperature") - shared.felt_temperature[:, None], 0, None) *\
+        _weekly(inputs, "weekly_residential_profile", normalize=False, steps_per_hour=calendar.steps_per_hour)[calendar.week_positions]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        residential_weight = np.nan_to_num(weighted_delta_felt_temperature / months.transform(weighted_delta_felt_temperature), nan=0.)
+    building = monthly_residential_load[months.codes] * residential_weight
+
+    # Industry (month then day length proportionnal weights, weekly pattern)
+    month_start = calendar.month_index
+    monthly_industry_load = (yearly_industry_consumption * demand_share)[np.searchsorted(years.keys, month_start.year)] *\
+        (month_start.daysinmonth / (365 + month_start.is_leap_year)).to_numpy()[:, None]
+    industry = monthly_industry_load[months.codes] * _weekly(inputs, "weekly_industry_profile", normalize=True, steps_per_hour=calendar.steps_per_hour)[calendar.week_positions] / calendar.days_in_month[:, None]
+
+    # Heat loss, proportionnal to network to ground temperature difference, app uses the first year demand for every year
+    yearly_heat_loss = (Groups(months.keys // 12).reduce(monthly_building_load_df) + yearly_industry_consumption) * loss_share
+    loss_delta_temperature = (departure_temperature + return_temperature) / 2 - shared.soil_temperature[SOIL_TEMPERATURE_NAME].to_numpy()[:, None]
+    heat_loss = loss_delta_temperature / years.transform(loss_delta_temperature) * yearly_heat_loss[0]
+
+    # Return temperature correction of DistrictHeatingLoad.fit
+    delta_temperature = _parameter(inputs, "delta_temperature")
+    water_heat_capacity = _parameter(inputs, "water_heat_capacity")
+    demands = dict(zip(SECTORS, (hot_water, industry, heat_loss, building)))
+    total_demand = hot_water + industry + heat_loss + building
+    with np.errstate(invalid='ignore', divide='ignore'):
+        flow_rate = total_demand / (water_heat_capacity * (departure_temperature - return_temperature))
+        min_flow_rate = np.nanmin(total_demand / (water_heat_capacity * (departure_temperature - (return_temperature + delta_temperature))), axis=0)
+        max_flow_rate = np.nanmax(total_demand / (water_heat_capacity * (departure_temperature - (return_temperature - delta_temperature))), axis=0)
+        corrected_return_temperature = departure_temperature - total_demand / water_heat_capacity / np.clip(flow_rate, min_flow_rate, max_flow_rate)
+
+    if compact:
+        demands = {sector: demand.astype(COMPACT_FLOAT) for sector, demand in demands.items()}
+        departure_temperature, corrected_return_temperature = departure_temperature.astype(COMPACT_FLOAT), corrected_return_temperature.astype(COMPACT_FLOAT)
+        shared.cold_water_temperature = compact_frame(shared.cold_water_temperature, external_factors.data.index)
+        shared.soil_temperature = compact_frame(shared.soil_temperature, external_factors.data.index)
+    return MultiNetworkResult(names, shared, demands, departure_temperature, corrected_return_temperature, delta_temperature, water_heat_capacity)
@@ -1,6 +1,11 @@
 from .end import *
 from .induced_factors import *
+from .induced_kernels import *
 from .process_hot_water import *
 from .process_residential import *
 from .process_industry import *
 from .process_loss import *
+from .sub_hourly import *
+from .graph import *
+from .background import *
+from .district_heating_graph import *
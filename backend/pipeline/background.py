@@ -0,0 +1,123 @@
+import contextvars
+import dataclasses
+import threading
+from dataclasses import dataclass
+from typing import Any, Optional
+
+from backend.cache import fingerprint
+from backend.result_store import ResultStore, result_key
+from .graph import PipelineCancelled, PipelineGraph, StageReport
+
+@dataclass(frozen=True)
+class RunStatus:
+    """Snapshot of the latest submitted run"""
+    key: str # fingerprint of the run inputs
+    stages: int
+    running: Optional[str] = None # stage being computed
+    reports: tuple[StageReport, ...] = ()
+    finished: bool = False
+    results: Optional[dict[str, Any]] = None
+    error: Optional[Exception] = None
+    stored: bool = False # results loaded from the result store instead of computed
+    cancelled: bool = False # stopped by cancel before finishing, without results
+
+    @property
+    def progress(self) -> float:
+        return len(self.reports) / self.stages if self.stages else 1.
+
+class BackgroundPipeline:
+    def __init__(self, graph: PipelineGraph, store: Optional[ResultStore] = None) -> None:
+        """Run a pipeline graph in a worker thread, only the latest submitted inputs are computed to completion.
+
+        A submission with new inputs cancels the run in progress, which stops before its next stage
+        (the stages it completed stay cached in the graph). Runs are serialized on the graph.
+
+        Parameters:
+            graph (PipelineGraph): Graph shared by the runs.
+            store (ResultStore, optional): Results of inputs found in the store are loaded instead of computed,
+                computed results are saved to it.
+        """
+        self.graph = graph
+        self.store = store
+        self._changed = threading.Condition()
+        self._graph_lock = threading.Lock()
+        self._status: Optional[RunStatus] = None
+        self._cancel: Optional[threading.Event] = None
+
+    def submit(self, inputs: dict[str, Any]) -> RunStatus:
+        """Start a run on inputs unless the latest run already has the same inputs and was not cancelled.
+
+        Raises:
+            ValueError: If a pipeline input is missing.
+
+        Returns:
+            RunStatus: Status of the run of inputs.
+        """
+        keys = self.graph.input_keys(inputs)
+        key = fingerprint(tuple(sorted(keys.items())))
+        with self._changed:
+            if self._status is not None and self._status.key == key and not self._cancel.is_set():
+                return self._status
+            if self._cancel is not None:
+                self._cancel.set()
+            self._cancel = threading.Event()
+            stored = None if self.store is None else self.store.load(result_key(keys), inputs)
+            if stored is not None:
+                self._status = RunStatus(key, len(self.graph.stages), finished=True, results=stored, stored=True)
+                self._changed.notify_all()
+                return self._status
+            self._status = RunStatus(key, len(self.graph.stages))
+            # the worker sees the context of the caller, e.g. the active profile
+            worker = threading.Thread(target=contextvars.copy_context().run, args=(self._run, inputs, keys, self._cancel),
+                                      name=f"pipeline-{key[:8]}", daemon=True)
+            worker.start()
+            return self._status
+
+    def status(self) -> Optional[RunStatus]:
+        with self._changed:
+            return self._status
+
+    def wait(self, timeout: Optional[float] = None) -> Optional[RunStatus]:
+        """Status of the latest run once it made progress or finished, or after timeout seconds"""
+        with self._changed:
+            status = self._status
+            if status is not None and not status.finished:
+                self._changed.wait_for(lambda: self._status is not status, timeout)
+            return self._status
+
+    def cancel(self) -> None:
+        """Stop the run in progress before its next stage"""
+        with self._changed:
+            if self._cancel is not None:
+                self._cancel.set()
+
+    def _update(self, cancel: threading.Event, **changes: Any) -> None:
+        """Change the status if the run of cancel is still the latest, a run submitted again after a cancel has the same key"""
+        with self._changed:
+            if self._status is not None and self._cancel is cancel:
+                self._status = dataclasses.replace(self._status, **changes)
+                self._changed.notify_all()
+
+    def _run(self, inputs: dict[str, Any], keys: dict[str, str], cancel: threading.Event) -> None:
+        with self._graph_lock:
+            if cancel.is_set():
+                self._update(cancel, finished=True, cancelled=True)
+                return
+            names = [stage.name for stage in self.graph.stages]
+            self._update(cancel, running=names[0])
+            reports: list[StageReport] = []
+            def on_stage(report: StageReport) -> None:
+                reports.append(report)
+                self._update(cancel, running=names[len(reports)] if len(reports) < len(names) else None, reports=tuple(reports))
+            try:
+                results, _ = self.graph.run(inputs, keys, cancel, on_stage)
+            except PipelineCancelled:
+                # waiters are woken up, a later submit of the same inputs starts a new run
+                self._update(cancel, running=None, finished=True, cancelled=True)
+                return
+            except Exception as error:
+                self._update(cancel, running=None, finished=True, error=error)
+                return
+            self._update(cancel, running=None, finished=True, results=results)
+            if self.store is not None:
+                self.store.save(result_key(keys), results)
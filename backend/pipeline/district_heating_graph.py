@@ -0,0 +1,90 @@
+from typing import Any
+
+import pandas as pd
+
+from heatpro.check import ENERGY_FEATURE_NAME
+from heatpro.district_heating_load import DistrictHeatingLoad
+from heatpro.external_factors import ExternalFactors
+from heatpro.temporal_demand import MonthlyHeatDemand, TemporalHeatDemand, YearlyHeatDemand
+
+from backend.calendar_index import CalendarIndex
+from backend.compact import compact_demand, compact_frame
+
+from .end import ending_dataframe
+from .graph import PipelineGraph, Stage
+from .induced_factors import calculate_induced_factors
+from .process_hot_water import process_hot_water_temporal_demand
+from .process_industry import process_industry_temporal_demand
+from .process_loss import process_loss_temporal_demand
+from .process_residential import process_residential_temporal_demand
+import config
+
+def _induced_factors(external_factors: ExternalFactors, T_departure: config.TemperatureDeparture, T_return: config.TemperatureReturn, soil: config.Soil, compact: bool) -> pd.DataFrame:
+    induced_factors = calculate_induced_factors(external_factors,T_departure,T_return,soil)
+    return compact_frame(induced_factors, external_factors.data.index) if compact else induced_factors
+
+def _compact(demand: TemporalHeatDemand, external_factors: ExternalFactors, compact: bool) -> TemporalHeatDemand:
+    return compact_demand(demand, external_factors.data.index) if compact else demand
+
+def _monthly_building_load(monthly_building_load_df: pd.DataFrame, loss_percentage: float, loss_included: bool) -> MonthlyHeatDemand:
+    return MonthlyHeatDemand("residential",monthly_building_load_df*(1-loss_percentage*loss_included))
+
+def _hot_water(monthly_building_load: MonthlyHeatDemand, monthly_hot_water_profile: pd.DataFrame, weekly_hot_water_profile: pd.DataFrame, external_factors: ExternalFactors, config_hot_water: config.HotWater, compact: bool) -> TemporalHeatDemand:
+    return _compact(process_hot_water_temporal_demand(monthly_building_load,monthly_hot_water_profile,weekly_hot_water_profile,external_factors,config_hot_water), external_factors, compact)
+
+def _residential(external_factors: ExternalFactors, monthly_building_load: MonthlyHeatDemand, hot_water: TemporalHeatDemand, non_heating_temperature: float, weekly_residential_profile: pd.DataFrame, compact: bool) -> TemporalHeatDemand:
+    calendar = CalendarIndex.of(external_factors)
+    monthly_hot_water = pd.DataFrame({ENERGY_FEATURE_NAME: calendar.monthly_sum(hot_water.data[ENERGY_FEATURE_NAME].to_numpy())}, index=calendar.month_index)
+    monthly_residential_load = MonthlyHeatDemand('building',(monthly_building_load.data - monthly_hot_water))
+    return _compact(process_residential_temporal_demand(external_factors,monthly_residential_load,non_heating_temperature,weekly_residential_profile), external_factors, compact)
+
+def _industry(yearly_industry_consumption: pd.DataFrame, loss_percentage: float, loss_included: bool, external_factors: ExternalFactors, weekly_industry_profile: pd.DataFrame, month_index: pd.DatetimeIndex, compact: bool) -> TemporalHeatDemand:
+    yearly_industry_load = YearlyHeatDemand("industry",yearly_industry_consumption*(1-loss_percentage*loss_included))
+    return _compact(process_industry_temporal_demand(yearly_industry_load,external_factors,weekly_industry_profile,month_index), external_factors, compact)
+
+def _heat_loss(induced_factors: pd.DataFrame, monthly_building_load_df: pd.DataFrame, yearly_industry_consumption: pd.DataFrame, loss_percentage: float, external_factors: ExternalFactors, compact: bool) -> TemporalHeatDemand:
+    yearly_heat_loss_load = YearlyHeatDemand(
+        'heat_loss',
+        (monthly_building_load_df[[ENERGY_FEATURE_NAME]].resample("YS").sum() + yearly_industry_consumption[[ENERGY_FEATURE_NAME]].resample("YS").sum())*loss_percentage)
+    return _compact(process_loss_temporal_demand(induced_factors,yearly_heat_loss_load), external_factors, compact)
+
+def _district_heating(hot_water: TemporalHeatDemand, industry: TemporalHeatDemand, heat_loss: TemporalHeatDemand, residential: TemporalHeatDemand, external_factors: ExternalFactors, induced_factors: pd.DataFrame, delta_temperature: float, water_heat_capacity: float, compact: bool) -> DistrictHeatingLoad:
+    district_heating = DistrictHeatingLoad(
+                                demands = [
+                                    hot_water,
+                                    industry,
+                                    heat_loss,
+                                    residential,
+                                ],
+                                external_factors=external_factors,
+                                # fit() corrects the return temperature in place, the induced factors stage result is kept intact
+                                district_network_temperature=induced_factors.copy(),
+                                delta_temperature=delta_temperature,
+                                cp=water_heat_capacity,
+                            )
+    district_heating.fit()
+    if compact:
+        # fit concatenates every table on a new index, equal to the external factors one
+        district_heating.data.index = external_factors.data.index
+    return district_heating
+
+def _ending(district_heating: DistrictHeatingLoad, water_heat_capacity: float, compact: bool) -> pd.DataFrame:
+    return ending_dataframe(district_heating,water_heat_capacity,compact)
+
+DISTRICT_HEATING_STAGES = [
+    Stage("induced_factors", _induced_factors, ("external_factors", "T_departure", "T_return", "soil", "compact")),
+    Stage("monthly_building_load", _monthly_building_load, ("monthly_building_load_df", "loss_percentage", "loss_included")),
+    Stage("hot_water", _hot_water, ("monthly_building_load", "monthly_hot_water_profile", "weekly_hot_water_profile", "external_factors", "config_hot_water", "compact")),
+    Stage("residential", _residential, ("external_factors", "monthly_building_load", "hot_water", "non_heating_temperature", "weekly_residential_profile", "compact")),
+    Stage("industry", _industry, ("yearly_industry_consumption", "loss_percentage", "loss_included", "external_factors", "weekly_industry_profile", "month_index", "compact")),
+    Stage("heat_loss", _heat_loss, ("induced_factors", "monthly_building_load_df", "yearly_industry_consumption", "loss_percentage", "external_factors", "compact")),
+    Stage("district_heating", _district_heating, ("hot_water", "industry", "heat_loss", "residential", "external_factors", "induced_factors", "delta_temperature", "water_heat_capacity", "compact")),
+    Stage("ending", _ending, ("district_heating", "water_heat_capacity", "compact")),
+]
+
+def build_district_heating_graph() -> PipelineGraph:
+    return PipelineGraph(DISTRICT_HEATING_STAGES)
+
+def run_district_heating(inputs: dict[str, Any]) -> dict[str, Any]:
+    """Run every stage once on inputs (no Streamlit needed) and return the result of each stage"""
+    return build_district_heating_graph().run(inputs)[0]
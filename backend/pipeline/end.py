@@ -1,23 +1,54 @@
+import numpy as np
 import pandas as pd
 
 from heatpro.district_heating_load import DistrictHeatingLoad
 
-def ending_dataframe(district_heating: DistrictHeatingLoad, water_heat_capacity: float) -> pd.DataFrame:
-    
-    features_to_keep = ["external_temperature","heating_season","cold_water_temperature","departure_temperature","return_temperature","soil_temperature","industry_thermal_energy_kWh","hot_water_thermal_energy_kWh","heat_loss_thermal_energy_kWh","building_thermal_energy_kWh"]
-    columns_in_order = ["outside_temperature_C","supply_temperature_C","return_temperature_C","flow_rate_m3_h","total_thermal_energy_kWh","heating_season","cold_water_temperature_C","ground_temperature_C","building_thermal_energy_kWh","DHW_thermal_energy_kWh","industry_thermal_energy_kWh","heat_loss_thermal_energy_kWh"]
-    return pd.concat(
-        (
-            district_heating.data[features_to_keep].rename(columns={
-                "external_temperature":"outside_temperature_C",
-                "cold_water_temperature":"cold_water_temperature_C",
-                "departure_temperature":"supply_temperature_C",
-                "return_temperature":"return_temperature_C",
-                "soil_temperature":"ground_temperature_C",
-                "hot_water_thermal_energy_kWh":"DHW_thermal_energy_kWh"
-                }),
-            district_heating.data[["industry_thermal_energy_kWh","hot_water_thermal_energy_kWh","industry_thermal_energy_kWh","building_thermal_energy_kWh"]].sum(axis=1).rename("total_thermal_energy_kWh"),
-            (district_heating.data[["industry_thermal_energy_kWh","hot_water_thermal_energy_kWh","industry_thermal_energy_kWh","building_thermal_energy_kWh"]].sum(axis=1)/water_heat_capacity/(district_heating.data["departure_temperature"]-district_heating.data["return_temperature"])).rename("flow_rate_m3_h")
-        ),
-        axis=1
-    )[columns_in_order]
\ No newline at end of file
+from backend.resolution import step_hours
+
+SECTOR_COLUMNS = ["hot_water_thermal_energy_kWh","industry_thermal_energy_kWh","heat_loss_thermal_energy_kWh","building_thermal_energy_kWh"]
+# ending column: district heating data column, None for derived columns
+ENDING_COLUMNS = {
+    "outside_temperature_C": "external_temperature",
+    "supply_temperature_C": "departure_temperature",
+    "return_temperature_C": "return_temperature",
+    "flow_rate_m3_h": None,
+    "total_thermal_energy_kWh": None,
+    "heating_season": "heating_season",
+    "cold_water_temperature_C": "cold_water_temperature",
+    "ground_temperature_C": "soil_temperature",
+    "building_thermal_energy_kWh": "building_thermal_energy_kWh",
+    "DHW_thermal_energy_kWh": "hot_water_thermal_energy_kWh",
+    "industry_thermal_energy_kWh": "industry_thermal_energy_kWh",
+    "heat_loss_thermal_energy_kWh": "heat_loss_thermal_energy_kWh",
+}
+
+def ending_dataframe(district_heating: DistrictHeatingLoad, water_heat_capacity: float, compact: bool = False) -> pd.DataFrame:
+    """Exported table of a fitted district heating load, built in one preallocated block.
+    The total is the sum of the four sectors (kWh per time step), the flow rate is total power / (cp * (supply - return)).
+
+    Parameters:
+        district_heating (DistrictHeatingLoad): Fitted district heating load.
+        water_heat_capacity (float): Water heat capacity (kWh/m^3/K).
+        compact (bool): float32 columns instead of float64, halving the table size.
+
+    Returns:
+        pd.DataFrame: One row per time step, columns of ENDING_COLUMNS.
+    """
+    data = district_heating.data
+    float_columns = [column for column in ENDING_COLUMNS if column != "heating_season"]
+    values = np.empty((len(data), len(float_columns)), dtype=np.float32 if compact else np.float64, order="F")
+    for position, column in enumerate(float_columns):
+        if ENDING_COLUMNS[column] is not None:
+            values[:, position] = data[ENDING_COLUMNS[column]].to_numpy()
+
+    # total and flow are computed in float64 and written once
+    total = data[SECTOR_COLUMNS[0]].to_numpy(dtype=np.float64, copy=True)
+    for column in SECTOR_COLUMNS[1:]:
+        total += data[column].to_numpy()
+    values[:, float_columns.index("total_thermal_energy_kWh")] = total
+    total /= step_hours(data.index) * water_heat_capacity * (data["departure_temperature"].to_numpy() - data["return_temperature"].to_numpy())
+    values[:, float_columns.index("flow_rate_m3_h")] = total
+
+    ending = pd.DataFrame(values, index=data.index, columns=float_columns, copy=False)
+    ending.insert(list(ENDING_COLUMNS).index("heating_season"), "heating_season", data["heating_season"].to_numpy())
+    return ending
@@ -0,0 +1,103 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from backend.cache import fingerprint
+from backend.profiling import profile_stage
+
+@dataclass(frozen=True)
+class Stage:
+    """A pipeline step, func is called with the keyword arguments named in inputs.
+    An input is either the name of a pipeline input or the name of an upstream stage."""
+    name: str
+    func: Callable[..., Any]
+    inputs: tuple[str, ...]
+
+@dataclass(frozen=True)
+class StageReport:
+    name: str
+    computed: bool
+    seconds: float
+
+class PipelineCancelled(Exception):
+    """Raised by PipelineGraph.run when its cancel event is set, the stages completed before are kept"""
+
+class PipelineGraph:
+    def __init__(self, stages: list[Stage]) -> None:
+        """Dependency graph of stages, recomputing a stage only when one of its inputs changed.
+
+        Parameters:
+            stages (list[Stage]): Stages in topological order.
+
+        Raises:
+            ValueError: If a stage is declared twice or depends on a stage declared after it.
+        """
+        names = [stage.name for stage in stages]
+        if len(set(names)) != len(names):
+            raise ValueError("Stage names should be unique")
+        for position, stage in enumerate(stages):
+            downstream = set(stage.inputs) & set(names[position:])
+            if downstream:
+                raise ValueError(f"Stage {stage.name} depends on {', '.join(sorted(downstream))} which is not declared before it")
+        self.stages = stages
+        self._keys: dict[str, str] = {}
+        self._results: dict[str, Any] = {}
+
+    @property
+    def required_inputs(self) -> set[str]:
+        stage_names = {stage.name for stage in self.stages}
+        return {name for stage in self.stages for name in stage.inputs} - stage_names
+
+    def input_keys(self, inputs: dict[str, Any]) -> dict[str, str]:
+        """Content fingerprint of every pipeline input
+
+        Raises:
+            ValueError: If a pipeline input is missing.
+        """
+        missing = self.required_inputs - set(inputs)
+        if missing:
+            raise ValueError(f"Missing pipeline inputs: {', '.join(sorted(missing))}")
+        with profile_stage("fingerprint_inputs"):
+            return {name: fingerprint(inputs[name]) for name in self.required_inputs}
+
+    def run(self, inputs: dict[str, Any], keys: Optional[dict[str, str]] = None, cancel: Optional[threading.Event] = None,
+            on_stage: Optional[Callable[[StageReport], None]] = None) -> tuple[dict[str, Any], list[StageReport]]:
+        """Run the stages whose inputs changed since the previous run and reuse the others.
+
+        Parameters:
+            inputs (dict[str, Any]): Value of every pipeline input.
+            keys (dict[str, str], optional): input_keys(inputs) if already computed.
+            cancel (threading.Event, optional): Checked before every stage, the run stops once it is set.
+            on_stage (Callable[[StageReport], None], optional): Called after every stage, e.g. to report progress.
+
+        Raises:
+            ValueError: If a pipeline input is missing.
+            PipelineCancelled: If cancel was set before the last stage.
+
+        Returns:
+            tuple[dict[str, Any], list[StageReport]]: Result of every stage and what was recomputed or skipped.
+        """
+        if keys is None:
+            keys = self.input_keys(inputs)
+        keys = dict(keys)
+        values = dict(inputs)
+        reports = []
+        for stage in self.stages:
+            if cancel is not None and cancel.is_set():
+                raise PipelineCancelled(f"Run cancelled before stage {stage.name}")
+            key = fingerprint((stage.name,) + tuple(keys[name] for name in stage.inputs))
+            start = time.perf_counter()
+            computed = self._keys.get(stage.name) != key
+            if computed:
+                # Forget the previous key first so that a failing stage is retried on next run
+                self._keys.pop(stage.name, None)
+                with profile_stage(stage.name):
+                    self._results[stage.name] = stage.func(**{name: values[name] for name in stage.inputs})
+                self._keys[stage.name] = key
+            keys[stage.name] = key
+            values[stage.name] = self._results[stage.name]
+            reports.append(StageReport(stage.name, computed, time.perf_counter() - start))
+            if on_stage is not None:
+                on_stage(reports[-1])
+        return {stage.name: values[stage.name] for stage in self.stages}, reports
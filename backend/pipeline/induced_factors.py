@@ -3,9 +3,21 @@ import pandas as pd
 from heatpro.external_factors import ExternalFactors
 from heatpro.external_factors import closed_heating_season, burch_cold_water, basic_temperature_departure, basic_temperature_return, kasuda_soil_temperature
 
+from backend.cache import LRUCache, fingerprint
+from .induced_kernels import soil_diffusivity
 import config
 
+INDUCED_FACTORS_CACHE = LRUCache(maxsize=8, ttl=3600)
+
 def calculate_induced_factors(external_factors: ExternalFactors, T_departure: config.TemperatureDeparture, T_return: config.TemperatureReturn, soil:config.Soil) -> pd.DataFrame:
+    """Induced factors memoized on the content of external factors and on the configs.
+    A copy is returned because DistrictHeatingLoad.fit updates the return temperature in place."""
+    return INDUCED_FACTORS_CACHE.get_or_compute(
+                    (fingerprint(external_factors), T_departure, T_return, soil),
+                    lambda: _calculate_induced_factors(external_factors, T_departure, T_return, soil),
+                        ).copy()
+
+def _calculate_induced_factors(external_factors: ExternalFactors, T_departure: config.TemperatureDeparture, T_return: config.TemperatureReturn, soil:config.Soil) -> pd.DataFrame:
     return pd.concat((
                     closed_heating_season(external_factors),
                     burch_cold_water(external_factors),
@@ -23,7 +35,7 @@ def calculate_induced_factors(external_factors: ExternalFactors, T_departure: co
                                                 ),
                     kasuda_soil_temperature(external_factors,
                                             d=soil.depth,
-                                            alpha=soil.conductivity*24*3600/(soil.capacity*soil.density)
+                                            alpha=soil_diffusivity(soil.conductivity, soil.capacity, soil.density),
                                             ),
                         )
-                        ,axis=1)
\ No newline at end of file
+                        ,axis=1)
@@ -0,0 +1,115 @@
+import numpy as np
+import numpy.typing as npt
+import pandas as pd
+
+from heatpro.external_factors import (ExternalFactors, DEPARTURE_TEMPERATURE_NAME, EXTERNAL_TEMPERATURE_NAME, HEATING_SEASON_NAME,
+                                      RETURN_TEMPERATURE_NAME, SOIL_TEMPERATURE_NAME)
+
+from backend.calendar_index import CalendarIndex, Groups
+import config
+
+# Equivalents of the heatpro induced factors used by calculate_induced_factors for many parameter sets at once.
+# Parameters are scalars or 1-D arrays broadcast together into scenarios, kernels return (time steps x scenarios) arrays.
+
+def _scenarios(*parameters: npt.ArrayLike) -> list[np.ndarray]:
+    """Parameters broadcast to (1 x scenarios) row vectors"""
+    return [row[None, :] for row in np.broadcast_arrays(*(np.atleast_1d(np.asarray(parameter, dtype=float)) for parameter in parameters))]
+
+def _columns(external_factors: ExternalFactors) -> tuple[np.ndarray, np.ndarray]:
+    """(time steps x 1) external temperature and heating season"""
+    data = external_factors.data
+    return data[EXTERNAL_TEMPERATURE_NAME].to_numpy(dtype=float)[:, None], data[HEATING_SEASON_NAME].to_numpy(dtype=bool)[:, None]
+
+def _coldest_dayofyear(external_temperature: np.ndarray, calendar: CalendarIndex) -> int:
+    """heatpro get_coldest_dayofyear: day of year of the coldest daily mean"""
+    daily_mean = calendar.days.reduce(external_temperature) / calendar.days.sizes
+    return pd.Timestamp(calendar.days.keys[np.argmin(daily_mean)]).dayofyear
+
+def soil_diffusivity(conductivity: npt.ArrayLike, capacity: npt.ArrayLike, density: npt.ArrayLike) -> np.ndarray:
+    """Thermal diffusivity of the soil (m²/day) from its conductivity (W/m/K), capacity (J/kg/K) and density (kg/m3)"""
+    return np.asarray(conductivity, dtype=float) * 24 * 3600 / (np.asarray(capacity, dtype=float) * np.asarray(density, dtype=float))
+
+def departure_temperature_kernel(external_factors: ExternalFactors, T_max_HS: npt.ArrayLike, T_max_NHS: npt.ArrayLike,
+                                 T_min_HS: npt.ArrayLike, T_min_NHS: npt.ArrayLike, T_ext_mid: npt.ArrayLike,
+                                 T_ext_min: npt.ArrayLike) -> np.ndarray:
+    """heatpro basic_temperature_departure for every supply temperature law (see its parameters).
+
+    Returns:
+        np.ndarray: (time steps x scenarios) departure temperature.
+    """
+    external_temperature, heating_season = _columns(external_factors)
+    T_max_HS, T_max_NHS, T_min_HS, T_min_NHS, T_ext_mid, T_ext_min = _scenarios(T_max_HS, T_max_NHS, T_min_HS, T_min_NHS, T_ext_mid, T_ext_min)
+    return (external_temperature < T_ext_mid) *\
+        (external_temperature - T_ext_mid) / (T_ext_min - T_ext_mid) *\
+        np.where(heating_season, T_max_HS - T_min_HS, T_max_NHS - T_min_NHS) +\
+        np.where(heating_season, T_min_HS, T_min_NHS)
+
+def return_temperature_kernel(external_factors: ExternalFactors, T_HS: npt.ArrayLike, T_NHS: npt.ArrayLike) -> np.ndarray:
+    """heatpro basic_temperature_return for every pair of heating and non-heating season return temperatures.
+
+    Returns:
+        np.ndarray: (time steps x scenarios) return temperature.
+    """
+    _, heating_season = _columns(external_factors)
+    T_HS, T_NHS = _scenarios(T_HS, T_NHS)
+    return np.where(heating_season, T_HS, T_NHS)
+
+def soil_temperature_kernel(external_factors: ExternalFactors, d: npt.ArrayLike, alpha: npt.ArrayLike) -> np.ndarray:
+    """heatpro kasuda_soil_temperature for every pipe depth d (m) and soil diffusivity alpha (m²/day, see soil_diffusivity).
+    Weather statistics (mean, monthly amplitude, coldest day) are computed once for every scenario.
+
+    Returns:
+        np.ndarray: (time steps x scenarios) soil temperature.
+    """
+    external_temperature, _ = _columns(external_factors)
+    external_temperature = external_temperature[:, 0]
+    calendar = CalendarIndex.of(external_factors)
+    d, alpha = _scenarios(d, alpha)
+    monthly_mean = calendar.monthly_sum(external_temperature) / calendar.months.sizes
+    years = Groups(calendar.months.keys // 12)
+    average_monthly_amplitude = 0.5 * (years.reduce(monthly_mean, np.maximum) - years.reduce(monthly_mean, np.minimum)).mean()
+    day_of_year = calendar.day_of_year[:, None]
+    return external_temperature.mean() - average_monthly_amplitude * np.exp(-d * (np.pi / (365 * alpha)) ** 0.5) *\
+        np.cos(2 * np.pi / 365 * (day_of_year - _coldest_dayofyear(external_temperature, calendar) - d / 2 * (365 / (np.pi * alpha)) ** 0.5))
+
+def cold_water_temperature_kernel(external_factors: ExternalFactors) -> np.ndarray:
+    """heatpro burch_cold_water, which only depends on the weather: one column shared by every scenario.
+
+    Returns:
+        np.ndarray: (time steps x 1) cold water temperature.
+    """
+    external_temperature, _ = _columns(external_factors)
+    external_temperature = external_temperature[:, 0]
+    calendar = CalendarIndex.of(external_factors)
+    external_temperature_F = external_temperature * 9 / 5 + 32
+    mean_F = external_temperature_F.mean()
+    daily_amplitude_F = (calendar.days.reduce(external_temperature_F, np.maximum) - calendar.days.reduce(external_temperature_F, np.minimum)).max()
+    cold_water_temperature_F = mean_F + 3 + (0.4 + 0.01 * (mean_F - 44)) / 2 * daily_amplitude_F *\
+        np.sin(0.01745 * (0.986 * (calendar.day_of_year - _coldest_dayofyear(external_temperature, calendar) - (35 - (mean_F - 44))) - 90))
+    return ((cold_water_temperature_F - 32) * 5 / 9)[:, None]
+
+def network_temperature_kernels(external_factors: ExternalFactors, T_departure: list[config.TemperatureDeparture],
+                                T_return: list[config.TemperatureReturn], soil: list[config.Soil]) -> dict[str, np.ndarray]:
+    """Departure, return and soil temperatures of calculate_induced_factors for scenarios given as app configs
+    (lists of equal length, or of length 1 to share a config).
+
+    Returns:
+        dict[str, np.ndarray]: (time steps x scenarios) arrays named after the heatpro induced factor columns.
+    """
+    return {
+        DEPARTURE_TEMPERATURE_NAME: departure_temperature_kernel(
+            external_factors,
+            T_max_HS=[law.max_HS for law in T_departure],
+            T_max_NHS=[law.max_NHS for law in T_departure],
+            T_min_HS=[law.min_HS for law in T_departure],
+            T_min_NHS=[law.min_NHS for law in T_departure],
+            T_ext_mid=[law.ext_mid for law in T_departure],
+            T_ext_min=[law.ext_min for law in T_departure],
+        ),
+        RETURN_TEMPERATURE_NAME: return_temperature_kernel(external_factors, T_HS=[law.HS for law in T_return], T_NHS=[law.NHS for law in T_return]),
+        SOIL_TEMPERATURE_NAME: soil_temperature_kernel(
+            external_factors,
+            d=[ground.depth for ground in soil],
+            alpha=soil_diffusivity([ground.conductivity for ground in soil], [ground.capacity for ground in soil], [ground.density for ground in soil]),
+        ),
+    }
@@ -1,25 +1,31 @@
+from functools import partial
+
 import pandas as pd
 
 from heatpro.check import WEIGHT_NAME_REQUIRED
-from heatpro.demand_profile import apply_weekly_hourly_pattern,month_length_proportionnal_weight, day_length_proportionnal_weight
+from heatpro.demand_profile import month_length_proportionnal_weight
 from heatpro.disaggregation import weekly_weighted_disaggregate, monthly_weighted_disaggregate
 from heatpro.external_factors import ExternalFactors
-from heatpro.temporal_demand import YearlyHeatDemand, HourlyHeatDemand
+from heatpro.temporal_demand import YearlyHeatDemand, TemporalHeatDemand
 
-from backend import DAY_NUMBERS
+from backend.calendar_index import CalendarIndex
+from backend.weekly_pattern import apply_weekly_pattern
+from .sub_hourly import monthly_weighted_disaggregate_steps
 
-def process_industry_temporal_demand(yearly_industry_load: YearlyHeatDemand, external_factors: ExternalFactors, weekly_industry_profile:pd.DataFrame, month_index: pd.DatetimeIndex) -> HourlyHeatDemand:
+def process_industry_temporal_demand(yearly_industry_load: YearlyHeatDemand, external_factors: ExternalFactors, weekly_industry_profile:pd.DataFrame, month_index: pd.DatetimeIndex) -> TemporalHeatDemand:
     monthly_industry_load = monthly_weighted_disaggregate(
                                                                     yearly_demand=yearly_industry_load,
                                                                     weights = month_length_proportionnal_weight(month_index)
                                                                 )
 
-    return weekly_weighted_disaggregate(
+    calendar = CalendarIndex.of(external_factors)
+    # each day of the weekly pattern sums to 1 whatever the time step, a day weighs 1/days in its month (heatpro day_length_proportionnal_weight)
+    weights = apply_weekly_pattern(
+                    calendar=calendar,
+                    weekly_profile=weekly_industry_profile,
+                    )
+    weights[WEIGHT_NAME_REQUIRED] /= calendar.days_in_month
+    return (weekly_weighted_disaggregate if calendar.steps_per_hour == 1 else partial(monthly_weighted_disaggregate_steps, calendar=calendar))(
                                     monthly_demand=monthly_industry_load,
-                                    weights=apply_weekly_hourly_pattern(
-                                        hourly_index=external_factors.data.index,
-                                        hourly_mapping={(DAY_NUMBERS[row['day']],row['hour']):row[WEIGHT_NAME_REQUIRED]/weekly_industry_profile.query(f"day=='{row['day']}'")[WEIGHT_NAME_REQUIRED].sum()
-                                                        for _, row in weekly_industry_profile.iterrows()}
-                                        )*\
-                                        day_length_proportionnal_weight(dates=external_factors.data.index),
-                                )
\ No newline at end of file
+                                    weights=weights,
+                                )
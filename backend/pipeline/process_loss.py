@@ -2,10 +2,14 @@ import pandas as pd
 
 from heatpro.check import ENERGY_FEATURE_NAME
 from heatpro.demand_profile import Y_to_H_thermal_loss_profile
-from heatpro.temporal_demand import HourlyHeatDemand, YearlyHeatDemand
+from heatpro.temporal_demand import HourlyHeatDemand, TemporalHeatDemand, YearlyHeatDemand
 
-def process_loss_temporal_demand(induced_factors: pd.DataFrame, yearly_heat_loss_load: YearlyHeatDemand) -> HourlyHeatDemand:
-    return HourlyHeatDemand(
+from backend.resolution import steps_per_hour
+from .sub_hourly import thermal_loss_profile_steps
+
+def process_loss_temporal_demand(induced_factors: pd.DataFrame, yearly_heat_loss_load: YearlyHeatDemand) -> TemporalHeatDemand:
+    hourly = steps_per_hour(induced_factors.index) == 1
+    return (HourlyHeatDemand if hourly else TemporalHeatDemand)(
                                 'heat_loss',
-                                (Y_to_H_thermal_loss_profile(induced_factors) * yearly_heat_loss_load.data[ENERGY_FEATURE_NAME].iloc[0]).rename(columns={'weight':ENERGY_FEATURE_NAME})
-                            )
\ No newline at end of file
+                                ((Y_to_H_thermal_loss_profile if hourly else thermal_loss_profile_steps)(induced_factors) * yearly_heat_loss_load.data[ENERGY_FEATURE_NAME].iloc[0]).rename(columns={'weight':ENERGY_FEATURE_NAME})
+                            )
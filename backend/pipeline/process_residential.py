@@ -1,25 +1,31 @@
+from functools import partial
+
 import pandas as pd
 
-from heatpro.check import WEIGHT_NAME_REQUIRED
 from heatpro.external_factors import ExternalFactors, EXTERNAL_TEMPERATURE_NAME
-from heatpro.demand_profile import apply_weekly_hourly_pattern, basic_building_heating_profile, BUILDING_FELT_TEMPERATURE_NAME
+from heatpro.demand_profile import basic_building_heating_profile, BUILDING_FELT_TEMPERATURE_NAME
 from heatpro.disaggregation import weekly_weighted_disaggregate
-from heatpro.temporal_demand import HourlyHeatDemand, MonthlyHeatDemand
+from heatpro.temporal_demand import MonthlyHeatDemand, TemporalHeatDemand
 
-from backend import DAY_NUMBERS
+from backend.calendar_index import CalendarIndex
+from backend.resolution import felt_temperature
+from backend.weekly_pattern import apply_weekly_pattern
+from .sub_hourly import building_heating_profile_steps, monthly_weighted_disaggregate_steps
 
-def process_residential_temporal_demand(external_factors: ExternalFactors, monthly_residential_load: MonthlyHeatDemand,non_heating_temperature: float, weekly_non_normalized_residential_profile: pd.DataFrame) -> HourlyHeatDemand:
-    hourly_residential_profile = basic_building_heating_profile(
-                    felt_temperature=pd.DataFrame(external_factors.data[EXTERNAL_TEMPERATURE_NAME].ewm(24).mean().rename(BUILDING_FELT_TEMPERATURE_NAME)),
+def process_residential_temporal_demand(external_factors: ExternalFactors, monthly_residential_load: MonthlyHeatDemand,non_heating_temperature: float, weekly_non_normalized_residential_profile: pd.DataFrame) -> TemporalHeatDemand:
+    calendar = CalendarIndex.of(external_factors)
+    hourly = calendar.steps_per_hour == 1
+    residential_profile = (basic_building_heating_profile if hourly else partial(building_heating_profile_steps, calendar=calendar))(
+                    felt_temperature=pd.DataFrame(felt_temperature(external_factors.data[EXTERNAL_TEMPERATURE_NAME]).rename(BUILDING_FELT_TEMPERATURE_NAME)),
                     non_heating_temperature=non_heating_temperature,
-                    hourly_weight=apply_weekly_hourly_pattern(
-                        hourly_index=external_factors.data.index,
-                        hourly_mapping={(DAY_NUMBERS[row['day']],row['hour']):row[WEIGHT_NAME_REQUIRED]
-                                        for _, row in weekly_non_normalized_residential_profile.iterrows()}
+                    hourly_weight=apply_weekly_pattern(
+                        calendar=calendar,
+                        weekly_profile=weekly_non_normalized_residential_profile,
+                        normalize=False,
                     )
                 )
 
-    return weekly_weighted_disaggregate(
+    return (weekly_weighted_disaggregate if hourly else partial(monthly_weighted_disaggregate_steps, calendar=calendar))(
                                     monthly_demand=monthly_residential_load,
-                                    weights=hourly_residential_profile,
-                                )
\ No newline at end of file
+                                    weights=residential_profile,
+                                )
@@ -0,0 +1,80 @@
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+
+from heatpro.check import ENERGY_FEATURE_NAME, WEIGHT_NAME_REQUIRED, check_weight_format, find_xor_months
+from heatpro.demand_profile import BUILDING_FELT_TEMPERATURE_NAME
+from heatpro.external_factors import (ExternalFactors, CLOSED_HEATING_SEASON_NAME, COLD_WATER_TEMPERATURE_NAME,
+                                      DEPARTURE_TEMPERATURE_NAME, RETURN_TEMPERATURE_NAME, SOIL_TEMPERATURE_NAME,
+                                      burch_cold_water, closed_heating_season)
+from heatpro.temporal_demand import MonthlyHeatDemand, TemporalHeatDemand
+
+from backend.calendar_index import CalendarIndex
+
+# Equivalents of the heatpro functions used by the pipeline for any time step dividing an hour.
+# heatpro returns HourlyHeatDemand, which rejects several rows per hour, and some of its profiles resample or group by hour.
+
+def _calendar(index: pd.DatetimeIndex, calendar: Optional[CalendarIndex]) -> CalendarIndex:
+    return CalendarIndex(index) if calendar is None else calendar
+
+def monthly_weighted_disaggregate_steps(monthly_demand: MonthlyHeatDemand, weights: pd.DataFrame,
+                                        calendar: Optional[CalendarIndex] = None) -> TemporalHeatDemand:
+    """heatpro weekly_weighted_disaggregate (monthly demand times weights, monthly columns kept) on any time step.
+
+    Raises:
+        ValueError: If the weight format is not valid or weights and monthly_demand months do not match.
+    """
+    check_weight_format(weights)
+    xor_months = find_xor_months(monthly_demand.data, weights)
+    if not xor_months.empty:
+        raise ValueError(f"weights and monthly_demand are not matching the same month\n Difference :\n {xor_months}")
+    calendar = _calendar(weights.index, calendar)
+    month_codes = calendar.months.codes
+    demand = weights.copy()
+    for feature in monthly_demand.data.columns:
+        demand[feature if feature.startswith('yearly_') else f'monthly_{feature}'] = calendar.to_months(monthly_demand.data[feature])[month_codes]
+    demand[ENERGY_FEATURE_NAME] = calendar.to_months(monthly_demand.data[ENERGY_FEATURE_NAME])[month_codes] * weights[WEIGHT_NAME_REQUIRED].to_numpy()
+    return TemporalHeatDemand(monthly_demand.name, demand)
+
+def building_heating_profile_steps(felt_temperature: pd.DataFrame, non_heating_temperature: float, hourly_weight: pd.DataFrame,
+                                   calendar: Optional[CalendarIndex] = None) -> pd.DataFrame:
+    """heatpro basic_building_heating_profile on any time step: weights times the felt temperature deficit, each month sums to 1"""
+    months = _calendar(hourly_weight.index, calendar).months
+    weighted_deficit = np.clip(non_heating_temperature - felt_temperature[BUILDING_FELT_TEMPERATURE_NAME].to_numpy(dtype=float), 0, None) *\
+        hourly_weight[WEIGHT_NAME_REQUIRED].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        profile = weighted_deficit / months.transform(weighted_deficit)
+    return pd.DataFrame({WEIGHT_NAME_REQUIRED: np.nan_to_num(profile, nan=0.)}, index=hourly_weight.index)
+
+def thermal_loss_profile_steps(temperatures: pd.DataFrame, calendar: Optional[CalendarIndex] = None) -> pd.DataFrame:
+    """heatpro Y_to_H_thermal_loss_profile without resampling to hours: network to soil temperature difference, each year sums to 1"""
+    temperature_delta = ((temperatures[DEPARTURE_TEMPERATURE_NAME] + temperatures[RETURN_TEMPERATURE_NAME]) / 2 - temperatures[SOIL_TEMPERATURE_NAME]).to_numpy(dtype=float)
+    years = _calendar(temperatures.index, calendar).years
+    return pd.DataFrame({WEIGHT_NAME_REQUIRED: temperature_delta / years.transform(temperature_delta)}, index=temperatures.index)
+
+def special_hot_water_steps(external_factors: ExternalFactors, total_heating_including_hotwater: MonthlyHeatDemand,
+                            monthly_hot_water_profile: pd.DataFrame, temperature_hot_water: float,
+                            hot_water_day_profile: pd.DataFrame, name: str = "hot_water") -> TemporalHeatDemand:
+    """heatpro special_hot_water on any time step, without its loop over months.
+
+    Every day gets the demand of its month shared in proportion to the daily hot water heating need
+    (monthly profile times hot water minus cold water temperature). Months in a closed heating season share
+    the demand of the other months instead. The day is then split with hot_water_day_profile (each day sums to 1).
+    """
+    index = external_factors.data.index
+    calendar = CalendarIndex.of(external_factors)
+    months, month_codes = calendar.months, calendar.months.codes
+    closed = closed_heating_season(external_factors)[CLOSED_HEATING_SEASON_NAME].to_numpy(dtype=bool)
+    weighted_delta_temperature = calendar.to_months(monthly_hot_water_profile[WEIGHT_NAME_REQUIRED])[month_codes] *\
+        (temperature_hot_water - burch_cold_water(external_factors)[COLD_WATER_TEMPERATURE_NAME].to_numpy(dtype=float))
+    daily_weighted_delta_temperature = calendar.days.transform(weighted_delta_temperature)
+
+    monthly_load = calendar.to_months(total_heating_including_hotwater.data[ENERGY_FEATURE_NAME])
+    non_heating_month = ~months.reduce(closed, np.logical_or)
+    daily_hot_water = np.where(
+        non_heating_month[month_codes],
+        (monthly_load / months.reduce(weighted_delta_temperature))[month_codes] * daily_weighted_delta_temperature,
+        monthly_load[non_heating_month].sum() * daily_weighted_delta_temperature / weighted_delta_temperature[~closed].sum(),
+    )
+    return TemporalHeatDemand(name, pd.DataFrame({ENERGY_FEATURE_NAME: daily_hot_water * hot_water_day_profile[WEIGHT_NAME_REQUIRED].to_numpy()}, index=index))
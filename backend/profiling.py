@@ -0,0 +1,199 @@
+import contextlib
+import contextvars
+import functools
+import json
+import threading
+import time
+import tracemalloc
+import weakref
+from dataclasses import asdict, dataclass, field
+from typing import Any, Callable, Iterator, Optional, TypeVar
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+_TRACEMALLOC_LOCK = threading.Lock()
+_tracemalloc_users = 0 # profiles tracing memory, tracemalloc is stopped with the last one
+_tracemalloc_started = False # tracemalloc was started here, not by the caller (e.g. python -X tracemalloc)
+
+def _acquire_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_started
+    with _TRACEMALLOC_LOCK:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+def _release_tracemalloc() -> None:
+    global _tracemalloc_users, _tracemalloc_started
+    with _TRACEMALLOC_LOCK:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()
+            _tracemalloc_started = False
+
+@dataclass
+class Span:
+    name: str
+    depth: int
+    start: float # s since the profile start
+    wall: float = 0. # s
+    cpu: float = 0. # s of CPU time of the running thread
+    # bytes allocated above the span start at its peak, None without memory tracing or if another profile traced memory meanwhile
+    peak_memory: Optional[int] = None
+    thread: str = field(default_factory=lambda: threading.current_thread().name)
+
+@dataclass
+class _Frame:
+    span: Span
+    cpu_start: float
+    memory_start: Optional[int] # None if memory was not traced at the span start
+    peak: int = 0 # highest traced memory seen by the span children
+
+@dataclass
+class Profile:
+    """Spans recorded while the profile is active, in start order.
+    Spans are nested per thread, e.g. pipeline stages run by a background worker have their own stack.
+
+    If memory, tracemalloc runs until the profile is closed or garbage collected, and until every other profile tracing memory ends.
+    Its peak is process-wide, so peak memory is only recorded while a single profile traces memory
+    (e.g. not while two app sessions profile their reruns at the same time)."""
+    memory: bool = True
+    spans: list[Span] = field(default_factory=list)
+    origin: float = field(default_factory=time.perf_counter)
+    _stacks: dict[int, list[_Frame]] = field(default_factory=dict, repr=False)
+    _release: Optional[weakref.finalize] = field(default=None, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.memory:
+            _acquire_tracemalloc()
+            self._release = weakref.finalize(self, _release_tracemalloc)
+
+    def close(self) -> None:
+        """Stop tracing memory for this profile, spans recorded afterwards have no peak memory"""
+        if self._release is not None:
+            self._release()
+
+    @property
+    def _stack(self) -> list[_Frame]:
+        return self._stacks.setdefault(threading.get_ident(), [])
+
+    def to_json(self) -> str:
+        return json.dumps([asdict(span) for span in self.spans], indent=2)
+
+    def to_chrome_trace(self) -> str:
+        """Trace Event Format, opens in chrome://tracing or https://ui.perfetto.dev"""
+        threads = {thread: position for position, thread in enumerate(dict.fromkeys(span.thread for span in self.spans), 1)}
+        return json.dumps({"traceEvents": [
+            {"name": span.name, "ph": "X", "pid": 1, "tid": threads[span.thread], "ts": span.start * 1e6, "dur": span.wall * 1e6,
+             "args": {"cpu_ms": span.cpu * 1e3, "peak_memory": span.peak_memory}}
+            for span in self.spans
+        ] + [
+            {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": thread}}
+            for thread, tid in threads.items()
+        ], "displayTimeUnit": "ms"})
+
+PROFILE: contextvars.ContextVar[Optional[Profile]] = contextvars.ContextVar("profile", default=None)
+
+class _Stage:
+    __slots__ = ("profile", "name")
+
+    def __init__(self, profile: Profile, name: str) -> None:
+        self.profile = profile
+        self.name = name
+
+    def _tracing(self) -> bool:
+        # other profiles would reset the peak in the middle of the span
+        return self.profile.memory and self.profile._release.alive and _tracemalloc_users == 1 and tracemalloc.is_tracing()
+
+    def __enter__(self) -> Span:
+        stack = self.profile._stack
+        memory_start = None
+        if self._tracing():
+            memory_start, peak = tracemalloc.get_traced_memory()
+            # the peak is reset for this span, the enclosing span keeps the peak reached so far
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+            tracemalloc.reset_peak()
+        span = Span(self.name, len(stack), time.perf_counter() - self.profile.origin)
+        self.profile.spans.append(span)
+        stack.append(_Frame(span, time.thread_time(), memory_start))
+        return span
+
+    def __exit__(self, *exc_info: Any) -> None:
+        stack = self.profile._stack
+        frame = stack.pop()
+        frame.span.wall = time.perf_counter() - self.profile.origin - frame.span.start
+        frame.span.cpu = time.thread_time() - frame.cpu_start
+        if frame.memory_start is not None and self._tracing():
+            peak = max(tracemalloc.get_traced_memory()[1], frame.peak)
+            frame.span.peak_memory = peak - frame.memory_start
+            if stack:
+                stack[-1].peak = max(stack[-1].peak, peak)
+
+_DISABLED = contextlib.nullcontext()
+
+def profile_stage(name: str) -> contextlib.AbstractContextManager:
+    """Record wall time, CPU time and peak allocated memory of the block under name in the active profile.
+    Without an active profile this returns a shared no-op context manager."""
+    profile = PROFILE.get()
+    if profile is None:
+        return _DISABLED
+    return _Stage(profile, name)
+
+def profiled(name: Optional[str] = None) -> Callable[[F], F]:
+    """Decorator recording every call of a function as a stage, named after the function by default"""
+    def decorator(func: F) -> F:
+        stage_name = name or func.__name__
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            profile = PROFILE.get()
+            if profile is None:
+                return func(*args, **kwargs)
+            with _Stage(profile, stage_name):
+                return func(*args, **kwargs)
+        return wrapper # type: ignore[return-value]
+    return decorator
+
+def start_profiling(enabled: bool, memory: bool = True) -> Optional[Profile]:
+    """Activate a new profile in the current context, or deactivate profiling.
+    Memory tracing (tracemalloc) slows allocations down, the previous profile of the context stops tracing
+    and tracemalloc stops once no profile traces memory anymore (see Profile).
+
+    Returns:
+        Optional[Profile]: The active profile, None if disabled.
+    """
+    previous = PROFILE.get()
+    if previous is not None:
+        previous.close()
+    profile = Profile(memory) if enabled else None
+    PROFILE.set(profile)
+    return profile
+
+@contextlib.contextmanager
+def profiling(memory: bool = True):
+    """Profile the block, e.g. a batch run: with profiling() as profile: ..."""
+    profile = Profile(memory)
+    token = PROFILE.set(profile)
+    try:
+        yield profile
+    finally:
+        profile.close()
+        PROFILE.reset(token)
+
+@contextlib.contextmanager
+def measure_stage(name: str, memory: bool = False) -> Iterator[Optional[Span]]:
+    """profile_stage yielding the span of the block, whose peak_memory is set once the block exits.
+    Without an active profile, the block is measured in a profile of its own if memory, else the span is None."""
+    profile = PROFILE.get()
+    own = profile is None and memory
+    if own:
+        profile = Profile()
+    try:
+        if profile is None:
+            yield None
+        else:
+            with _Stage(profile, name) as span:
+                yield span
+    finally:
+        if own:
+            profile.close()
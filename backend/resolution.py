@@ -0,0 +1,32 @@
+from typing import Union
+
+import numpy as np
+import pandas as pd
+
+HOURS_PER_DAY = 24
+FELT_TEMPERATURE_INERTIA = 24 # h, center of mass of the felt temperature moving average (heatpro app ewm(24) on hourly data)
+
+def step_hours(index: pd.DatetimeIndex) -> float:
+    """Time step of a regular index in hours, 1 if it has less than two rows"""
+    return (index[1] - index[0]) / pd.Timedelta(hours=1) if len(index) > 1 else 1.
+
+def steps_per_hour(index: pd.DatetimeIndex) -> int:
+    """Number of time steps per hour of a regular index: 1 for hourly data, 4 for 15 minutes, 6 for 10 minutes...
+
+    Raises:
+        ValueError: If the time step is longer than an hour or does not divide an hour.
+    """
+    steps = 1 / step_hours(index)
+    if steps < 1 or not np.isclose(steps, round(steps)):
+        raise ValueError(f"Time step should divide an hour, got {index[1] - index[0]}")
+    return int(round(steps))
+
+def to_power(energy: Union[pd.Series, pd.DataFrame]) -> Union[pd.Series, pd.DataFrame]:
+    """Power (kW) of an energy per time step (kWh) indexed by datetime"""
+    return energy / step_hours(energy.index)
+
+def felt_temperature(external_temperature: pd.Series, inertia: float = FELT_TEMPERATURE_INERTIA) -> pd.Series:
+    """Exponential moving average of the external temperature with a center of mass of inertia hours, whatever the time step.
+    The smoothing factor per step is such that steps_per_hour steps decay as much as one hourly step."""
+    alpha = 1 - (inertia / (1 + inertia)) ** step_hours(external_temperature.index)
+    return external_temperature.ewm(alpha=alpha).mean()
@@ -0,0 +1,257 @@
+import contextlib
+import json
+import os
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Any, Iterator, NamedTuple, Optional, Union
+
+try:
+    import fcntl
+except ModuleNotFoundError: # windows
+    fcntl = None
+    import msvcrt
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from heatpro.district_heating_load import DistrictHeatingLoad
+from heatpro.external_factors import ExternalFactors
+
+from backend.cache import fingerprint
+
+STORE_VERSION = 1 # part of every key, bump it when the pipeline output changes for the same inputs
+RESULT_DIRECTORY = Path(os.environ.get("HEATPRO_APP_CACHE", ".cache")) / "results"
+RESULT_STORE_BYTES = 2 << 30 # size of the stored files above which the least recently used results are evicted
+INDEX_FILE = "index.json"
+LOCK_FILE = "index.lock" # locked by the process changing the index
+ENTRY_FILE = "entry.json" # index entry of a result, kept in its directory to rebuild the index
+TEMPORARY_SECONDS = 3600 # age above which a temporary directory is left over by a stopped writer
+# stored stage result: file in the result directory
+STORED_TABLES = {"district_heating": "district_heating.parquet", "induced_factors": "induced_factors.parquet", "ending": "ending.parquet"}
+
+class StoreInfo(NamedTuple):
+    hits: int
+    misses: int
+    entries: int
+    bytes: int
+    max_bytes: int
+
+def result_key(input_keys: dict[str, str]) -> str:
+    """Key of a stored result, from the fingerprint of every pipeline input (see PipelineGraph.input_keys)"""
+    return fingerprint((STORE_VERSION, tuple(sorted(input_keys.items()))))
+
+@contextlib.contextmanager
+def _file_lock(path: Path) -> Iterator[None]:
+    """Exclusive lock on path between processes (and threads, every call opens the file again)"""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a+b") as file:
+        if fcntl is not None:
+            fcntl.flock(file, fcntl.LOCK_EX)
+        else:
+            file.seek(0)
+            msvcrt.locking(file.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(file, fcntl.LOCK_UN)
+            else:
+                file.seek(0)
+                msvcrt.locking(file.fileno(), msvcrt.LK_UNLCK, 1)
+
+def _write_table(table: pd.DataFrame, path: Path) -> None:
+    pq.write_table(pa.Table.from_pandas(table, preserve_index=True), path, compression="zstd")
+
+def stored_district_heating(data: pd.DataFrame, induced_factors: pd.DataFrame, demands: dict[str, list[str]],
+                            external_factors: ExternalFactors, delta_temperature: float, water_heat_capacity: float) -> DistrictHeatingLoad:
+    """Fitted district heating load rebuilt from its data table, without fitting it again.
+
+    Parameters:
+        data (pd.DataFrame): District heating data, as set by DistrictHeatingLoad.fit.
+        induced_factors (pd.DataFrame): Induced factors stage result, only its columns are used.
+        demands (dict[str, list[str]]): Columns of every demand, as named before fit prefixed them with the demand name.
+        external_factors (ExternalFactors): External factors of the run.
+        delta_temperature (float): Temperature difference in the district heating network.
+        water_heat_capacity (float): Water heat capacity (kWh/m^3/K).
+
+    Returns:
+        DistrictHeatingLoad: Load with the demands, corrected network temperatures and data of the stored run.
+    """
+    district_heating = DistrictHeatingLoad.__new__(DistrictHeatingLoad)
+    district_heating.demands = {name: data[[f"{name}_{column}" for column in columns]].set_axis(columns, axis=1) for name, columns in demands.items()}
+    district_heating.external_factors = external_factors
+    district_heating.delta_temperature = delta_temperature
+    district_heating.cp = water_heat_capacity
+    district_heating.district_network_temperature = data[list(induced_factors.columns)]
+    district_heating.data = data
+    return district_heating
+
+class ResultStore:
+    def __init__(self, directory: Union[str, Path] = RESULT_DIRECTORY, max_bytes: int = RESULT_STORE_BYTES) -> None:
+        """Pipeline results stored on disk by content: one directory per key (see result_key) holding the
+        district heating data, the induced factors and the ending table as Parquet files.
+
+        index.json lists the stored keys with their size and last use. Every change of the index holds a lock file shared by
+        every process using the directory (e.g. the app and command line runs), and the index is replaced atomically so that
+        readers never see a partial file. The files of a result can be written without the lock (see write_entry) and registered
+        afterwards. Results missing from the index are added back from their directory before eviction, so that every stored
+        file counts towards max_bytes. Once the stored files exceed max_bytes, the least recently used results are deleted.
+
+        Parameters:
+            directory (str | Path): Root directory of the store, created on first save.
+            max_bytes (int): Maximum size of the stored files.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def _read_index(self) -> dict[str, dict[str, Any]]:
+        try:
+            return json.loads((self.directory / INDEX_FILE).read_text())
+        except (FileNotFoundError, json.JSONDecodeError):
+            return {}
+
+    def _write_index(self, index: dict[str, dict[str, Any]]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        temporary = self.directory / f"{INDEX_FILE}.{os.getpid()}.{threading.get_ident()}.tmp"
+        temporary.write_text(json.dumps(index))
+        os.replace(temporary, self.directory / INDEX_FILE)
+
+    @contextlib.contextmanager
+    def _index_lock(self) -> Iterator[None]:
+        with self._lock, _file_lock(self.directory / LOCK_FILE):
+            yield
+
+    def _scan(self, index: dict[str, dict[str, Any]]) -> None:
+        """Add the results stored on disk but missing from index, drop the entries whose files were deleted
+        and delete the temporary directories of stopped writers"""
+        if not self.directory.is_dir():
+            return
+        for key in [key for key in index if not (self.directory / key).is_dir()]:
+            del index[key]
+        for path in self.directory.iterdir():
+            if not path.is_dir() or path.name in index:
+                continue
+            if path.suffix == ".tmp":
+                if time.time() - path.stat().st_mtime > TEMPORARY_SECONDS:
+                    shutil.rmtree(path, ignore_errors=True)
+                continue
+            try:
+                index[path.name] = {**json.loads((path / ENTRY_FILE).read_text()), "used": path.stat().st_mtime}
+            except (FileNotFoundError, json.JSONDecodeError):
+                # not a complete result, it could not be loaded
+                shutil.rmtree(path, ignore_errors=True)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._read_index()
+
+    def write_entry(self, key: str, results: dict[str, Any]) -> dict[str, Any]:
+        """Write the files of a result without touching the index, safe in worker processes.
+
+        Parameters:
+            key (str): Result key.
+            results (dict[str, Any]): Pipeline results, with at least the stages of STORED_TABLES.
+
+        Returns:
+            dict[str, Any]: Index entry of the result, to pass to register.
+        """
+        district_heating: DistrictHeatingLoad = results["district_heating"]
+        entry_directory = self.directory / key
+        temporary = self.directory / f"{key}.{os.getpid()}.{threading.get_ident()}.tmp"
+        temporary.mkdir(parents=True, exist_ok=True)
+        tables = {"district_heating": district_heating.data, "induced_factors": results["induced_factors"], "ending": results["ending"]}
+        for name, file in STORED_TABLES.items():
+            _write_table(tables[name], temporary / file)
+        entry = {
+            "bytes": sum(file.stat().st_size for file in temporary.iterdir()),
+            "created": time.time(),
+            "demands": {name: [str(column) for column in demand.columns] for name, demand in district_heating.demands.items()},
+        }
+        (temporary / ENTRY_FILE).write_text(json.dumps(entry))
+        # another process may have stored the same result meanwhile, its files are equal
+        try:
+            temporary.rename(entry_directory)
+        except OSError:
+            shutil.rmtree(temporary, ignore_errors=True)
+        return entry
+
+    def register(self, key: str, entry: dict[str, Any]) -> None:
+        """Add a result written by write_entry to the index and evict the least recently used results above max_bytes"""
+        with self._index_lock():
+            index = self._read_index()
+            index[key] = {**entry, "used": time.time()}
+            self._scan(index)
+            total = sum(stored["bytes"] for stored in index.values())
+            for evicted in sorted(index, key=lambda stored: index[stored]["used"]):
+                if total <= self.max_bytes:
+                    break
+                if evicted == key:
+                    continue
+                total -= index.pop(evicted)["bytes"]
+                shutil.rmtree(self.directory / evicted, ignore_errors=True)
+            self._write_index(index)
+
+    def save(self, key: str, results: dict[str, Any]) -> None:
+        """Store pipeline results under key, see write_entry"""
+        self.register(key, self.write_entry(key, results))
+
+    def load(self, key: str, inputs: dict[str, Any], tables: Optional[list[str]] = None) -> Optional[dict[str, Any]]:
+        """Stored results of key, None if they are not stored.
+
+        Parameters:
+            key (str): Result key of inputs.
+            inputs (dict[str, Any]): Pipeline inputs, whose external factors index is shared by the loaded tables.
+            tables (list[str], optional): Stages to load among STORED_TABLES, all by default.
+                The district heating load needs the induced factors.
+
+        Returns:
+            dict[str, Any], optional: Loaded stage results, DistrictHeatingLoad for district_heating and DataFrame for the others.
+        """
+        tables = list(STORED_TABLES) if tables is None else tables
+        with self._index_lock():
+            index = self._read_index()
+            entry = index.get(key)
+            if entry is None or not (self.directory / key).is_dir():
+                self._misses += 1
+                return None
+            entry["used"] = time.time()
+            self._write_index(index)
+        external_factors: ExternalFactors = inputs["external_factors"]
+        loaded = {}
+        try:
+            # the district heating load is rebuilt with the columns of the induced factors
+            for name in set(tables) | ({"induced_factors"} if "district_heating" in tables else set()):
+                table = pq.read_table(self.directory / key / STORED_TABLES[name]).to_pandas()
+                table.index = external_factors.data.index # equal by key, shared as in compact mode
+                loaded[name] = table
+        except (OSError, pa.ArrowInvalid):
+            # evicted by another process meanwhile
+            with self._lock:
+                self._misses += 1
+            return None
+        with self._lock:
+            self._hits += 1
+        if "district_heating" in tables:
+            loaded["district_heating"] = stored_district_heating(loaded["district_heating"], loaded["induced_factors"], entry["demands"],
+                                                                 external_factors, inputs["delta_temperature"], inputs["water_heat_capacity"])
+        return {name: loaded[name] for name in tables}
+
+    def info(self) -> StoreInfo:
+        with self._lock:
+            index = self._read_index()
+            return StoreInfo(self._hits, self._misses, len(index), sum(entry["bytes"] for entry in index.values()), self.max_bytes)
+
+    def clear(self) -> None:
+        with self._index_lock():
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self._hits = 0
+            self._misses = 0
+
+# shared by every session of the app and the command line runs
+RESULT_STORE = ResultStore()
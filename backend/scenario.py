@@ -0,0 +1,212 @@
+from dataclasses import fields, replace
+from pathlib import Path
+from typing import Any, Optional, Union
+
+import pandas as pd
+
+try:
+    import tomllib
+except ModuleNotFoundError: # python < 3.11, toml is installed with streamlit
+    import toml as tomllib
+
+from heatpro.check import WEIGHT_NAME_REQUIRED
+from heatpro.external_factors import ExternalFactors
+
+from backend.calendar_index import CalendarIndex
+from backend.export import EXPORT_FORMATS, write_export
+from backend.ingestion import read_external_factors
+import config
+
+WATER_HEAT_CAPACITY = 1.162 # kWh/m^3/K
+
+# scenario section: (pipeline input, config dataclass)
+CONFIG_SECTIONS = {
+    "T_departure": ("T_departure", config.TemperatureDeparture),
+    "T_return": ("T_return", config.TemperatureReturn),
+    "hot_water": ("config_hot_water", config.HotWater),
+    "soil": ("soil", config.Soil),
+}
+# scenario parameter: pipeline input
+SCALAR_PARAMETERS = {
+    "delta_temperature": "delta_temperature",
+    "non_heating_temperature": "non_heating_temperature",
+    "water_heat_capacity": "water_heat_capacity",
+    "heat_loss.share": "loss_percentage",
+    "heat_loss.included": "loss_included",
+    "compact": "compact",
+}
+# scenario parameter: type of its values, as read by scenario_inputs, so that equal values give equal result keys (7 and 7.0)
+SCALAR_TYPES = {
+    "delta_temperature": float,
+    "non_heating_temperature": float,
+    "water_heat_capacity": float,
+    "heat_loss.share": float,
+    "heat_loss.included": bool,
+    "compact": bool,
+}
+MONTHLY_OR_YEARLY_TABLES = ["monthly_building_load_df", "monthly_hot_water_profile", "yearly_industry_consumption"]
+WEEKLY_TABLES = ["weekly_hot_water_profile", "weekly_residential_profile", "weekly_industry_profile"]
+# pipeline input: scenario table name, when they differ
+TABLE_NAMES = {"monthly_building_load_df": "monthly_building_load"}
+
+def read_toml(path: Union[str, Path]) -> dict[str, Any]:
+    if tomllib.__name__ == "toml":
+        return tomllib.load(str(path))
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+def read_table(path: Union[str, Path], datetime_index: bool) -> pd.DataFrame:
+    """Read a CSV or Parquet table, the first CSV column is the index if datetime_index"""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    if datetime_index:
+        return pd.read_csv(path, index_col=0, parse_dates=True)
+    return pd.read_csv(path)
+
+def read_scenario(path: Union[str, Path], external_factors: Optional[ExternalFactors] = None, verbose: bool = False) -> dict[str, Any]:
+    """Read a scenario TOML file into the inputs of the district heating pipeline.
+    If external_factors is given, it is used instead of reading the [external_factors] file.
+    If verbose, the load time and peak memory of the external factors are printed.
+
+    Relative paths are resolved from the scenario file directory. Expected content:
+
+        delta_temperature = 7.0            # °C, maximum return temperature variation
+        non_heating_temperature = 18.0     # optional, defaults to T_departure.ext_mid
+        water_heat_capacity = 1.162        # optional, kWh/m^3/K
+        compact = false                    # optional, float32 results (see backend.compact)
+
+        [external_factors]
+        path = "external_factors.csv"      # CSV, Parquet or Arrow IPC/Feather
+        rows = 8760                        # optional, keep only the first rows
+
+        [heat_loss]
+        share = 0.06                       # share of all sectors demand
+        included = false                   # heat loss already included in demands
+
+        [T_departure]  # fields of config.TemperatureDeparture, same for
+        [T_return]     # config.TemperatureReturn,
+        [hot_water]    # config.HotWater
+        [soil]         # and config.Soil
+
+        [tables]       # CSV or Parquet files edited in the app
+        monthly_building_load = "monthly_building_load.csv"
+        monthly_hot_water_profile = "monthly_hot_water_profile.csv"
+        yearly_industry_consumption = "yearly_industry_consumption.csv"
+        weekly_hot_water_profile = "weekly_hot_water_profile.csv"
+        weekly_residential_profile = "weekly_residential_profile.csv"
+        weekly_industry_profile = "weekly_industry_profile.csv"
+
+    Raises:
+        ValueError: If a section or a table is missing or invalid.
+    """
+    path = Path(path)
+    scenario = read_toml(path)
+    root = path.parent
+    for section in ("external_factors", "tables"):
+        if section not in scenario:
+            raise ValueError(f"Scenario {path} has no {section} entry")
+
+    if external_factors is None:
+        external_factors_section = scenario["external_factors"]
+        external_factors, load_report = read_external_factors(root / external_factors_section["path"])
+        if verbose:
+            print(load_report)
+        if "rows" in external_factors_section:
+            external_factors = ExternalFactors(external_factors.data.iloc[:external_factors_section["rows"]])
+
+    tables = {}
+    for name in MONTHLY_OR_YEARLY_TABLES + WEEKLY_TABLES:
+        table_name = TABLE_NAMES.get(name, name)
+        if table_name not in scenario["tables"]:
+            raise ValueError(f"[tables] section of scenario {path} has no {table_name} file")
+        tables[table_name] = read_table(root / scenario["tables"][table_name], datetime_index=name in MONTHLY_OR_YEARLY_TABLES)
+    return scenario_inputs(scenario, external_factors, tables, str(path))
+
+def scenario_inputs(scenario: dict[str, Any], external_factors: ExternalFactors, tables: dict[str, pd.DataFrame], source: str = "scenario") -> dict[str, Any]:
+    """Inputs of the district heating pipeline from the content of a scenario (see read_scenario), its external factors
+    and its tables, named as in the [tables] section. Monthly and yearly tables have a datetime index.
+
+    Raises:
+        ValueError: If a section or a table is missing or invalid, source names the scenario in the message.
+    """
+    try:
+        heat_loss = scenario["heat_loss"]
+        delta_temperature = float(scenario["delta_temperature"])
+    except KeyError as error:
+        raise ValueError(f"Scenario {source} has no {error.args[0]} entry") from error
+
+    inputs = dict(
+        external_factors=external_factors,
+        delta_temperature=delta_temperature,
+        water_heat_capacity=float(scenario.get("water_heat_capacity", WATER_HEAT_CAPACITY)),
+        loss_percentage=float(heat_loss.get("share", 0.)),
+        loss_included=bool(heat_loss.get("included", False)),
+        compact=bool(scenario.get("compact", False)),
+        month_index=CalendarIndex.of(external_factors).month_index,
+    )
+
+    for section, (name, config_class) in CONFIG_SECTIONS.items():
+        if section not in scenario:
+            raise ValueError(f"Scenario {source} has no [{section}] section")
+        try:
+            inputs[name] = config_class(**{field.name: float(scenario[section][field.name]) for field in fields(config_class)})
+        except KeyError as error:
+            raise ValueError(f"[{section}] section of scenario {source} has no {error.args[0]} value") from error
+    inputs["non_heating_temperature"] = float(scenario.get("non_heating_temperature", inputs["T_departure"].ext_mid))
+
+    for name in MONTHLY_OR_YEARLY_TABLES + WEEKLY_TABLES:
+        table_name = TABLE_NAMES.get(name, name)
+        if table_name not in tables:
+            raise ValueError(f"Scenario {source} has no {table_name} table")
+        inputs[name] = tables[table_name]
+    for name in WEEKLY_TABLES:
+        try:
+            inputs[name] = inputs[name][['day', 'hour', WEIGHT_NAME_REQUIRED]]
+        except KeyError as error:
+            raise ValueError(f"{TABLE_NAMES.get(name, name)} table of scenario {source} should have columns day, hour and {WEIGHT_NAME_REQUIRED}") from error
+    inputs["monthly_hot_water_profile"] = inputs["monthly_hot_water_profile"] / inputs["monthly_hot_water_profile"].sum()
+
+    return inputs
+
+def write_result(result: pd.DataFrame, path: Union[str, Path], parameters: Optional[dict[str, Any]] = None, file_format: Optional[str] = None) -> None:
+    """Write a result table with its units and scenario parameters (see backend.export.write_export).
+    The format is chosen from the file extension (.parquet, .feather, .csv.gz or .csv) if file_format is not given.
+
+    Raises:
+        ValueError: If the format is unknown.
+    """
+    if file_format is None:
+        file_format = next((name for name, (extension, _) in EXPORT_FORMATS.items() if str(path).endswith(extension)), None)
+        if file_format is None:
+            raise ValueError(f"Unsupported output format {Path(path).suffix}, use {', '.join(extension for extension, _ in EXPORT_FORMATS.values())}")
+    write_export(result, path, file_format, parameters)
+
+def scenario_parameters(inputs: dict[str, Any]) -> dict[str, Any]:
+    """Scenario parameters of pipeline inputs, named as in apply_overrides"""
+    parameters = {parameter: inputs[name] for parameter, name in SCALAR_PARAMETERS.items() if name in inputs}
+    for section, (name, config_class) in CONFIG_SECTIONS.items():
+        if name in inputs:
+            parameters.update({f"{section}.{field.name}": getattr(inputs[name], field.name) for field in fields(config_class)})
+    return parameters
+
+def apply_overrides(inputs: dict[str, Any], overrides: dict[str, Any]) -> dict[str, Any]:
+    """Return a copy of pipeline inputs with scenario parameters replaced.
+    Parameters are named as in the scenario file, e.g. "T_departure.max_HS", "hot_water.simultaneity" or "heat_loss.share".
+    Values are cast to the type of the parameter (see SCALAR_TYPES, config fields are floats).
+    non_heating_temperature is an input of its own, it does not follow "T_departure.ext_mid".
+
+    Raises:
+        ValueError: If a parameter is unknown.
+    """
+    inputs = dict(inputs)
+    for parameter, value in overrides.items():
+        section, _, field = parameter.partition(".")
+        if parameter in SCALAR_PARAMETERS:
+            inputs[SCALAR_PARAMETERS[parameter]] = SCALAR_TYPES[parameter](value)
+        elif section in CONFIG_SECTIONS and field in {f.name for f in fields(CONFIG_SECTIONS[section][1])}:
+            name = CONFIG_SECTIONS[section][0]
+            inputs[name] = replace(inputs[name], **{field: float(value)})
+        else:
+            raise ValueError(f"Unknown scenario parameter {parameter}")
+    return inputs
@@ -0,0 +1,168 @@
+import sqlite3
+import time
+from dataclasses import fields
+from pathlib import Path
+from typing import Any, Iterable, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+from backend.pipeline import ENDING_COLUMNS, SECTOR_COLUMNS
+from backend.resolution import step_hours
+from backend.scenario import CONFIG_SECTIONS, SCALAR_PARAMETERS
+
+SCENARIO_ID_NAME = "scenario_id"
+EXCEEDANCE_HOURS = [100, 200, 500, 1000, 2000] # durations of the power and flow rate exceeded during them
+POWER_THRESHOLDS_KW = [10_000, 25_000, 45_000, 100_000, 200_000] # thresholds of the hours above them, new ones are added to existing databases
+WINTER_MONTHS = [12, 1, 2]
+PARAMETER_COLUMNS = list(SCALAR_PARAMETERS) + [f"{section}.{field.name}" for section, (_, config_class) in CONFIG_SECTIONS.items() for field in fields(config_class)]
+ENERGY_COLUMNS = [column for column, source in ENDING_COLUMNS.items() if source in SECTOR_COLUMNS] + ["total_thermal_energy_kWh"]
+METRIC_COLUMNS = (
+    ["peak_power_kW", "max_flow_rate_m3_h"] +
+    ENERGY_COLUMNS +
+    ["winter_DHW_share"] +
+    [f"power_exceeded_{hours}h_kW" for hours in EXCEEDANCE_HOURS] +
+    [f"flow_rate_exceeded_{hours}h_m3_h" for hours in EXCEEDANCE_HOURS] +
+    [f"hours_above_{threshold}kW" for threshold in POWER_THRESHOLDS_KW]
+)
+# column: SQL declaration, pointers to the hourly result come first
+COLUMNS = {
+    "id": "INTEGER PRIMARY KEY",
+    "result_path": "TEXT NOT NULL", # hourly result file
+    SCENARIO_ID_NAME: "INTEGER NOT NULL", # scenario in the result file, 0 for a single run
+    "result_key": "TEXT", # key in the result store (see backend.result_store), if stored
+    "created": "REAL",
+    **{column: "" for column in PARAMETER_COLUMNS},
+    **{column: "REAL" for column in METRIC_COLUMNS},
+}
+INSERT_BATCH = 1000 # records inserted per transaction by sweeps
+
+def _quote(column: str) -> str:
+    return '"' + column.replace('"', '""') + '"'
+
+def _exceeded(sorted_values: np.ndarray, hours: float, step: float) -> float:
+    """Value exceeded during more than hours: more than hours above x if and only if the result is above x"""
+    position = int(round(hours / step))
+    return float(sorted_values[position]) if position < len(sorted_values) else float("nan")
+
+def scenario_metrics(ending: pd.DataFrame) -> dict[str, float]:
+    """Summary metrics of an ending table (see backend.pipeline.ending_dataframe), named as METRIC_COLUMNS.
+
+    Energies are in kWh over the whole run, winter_DHW_share is the domestic hot water share of the energy of WINTER_MONTHS.
+    power_exceeded_{N}h_kW and flow_rate_exceeded_{N}h_m3_h are exceeded during more than N hours: the total power (or flow rate)
+    is above x for more than N hours if and only if the metric is above x.
+    """
+    step = step_hours(ending.index)
+    power = ending["total_thermal_energy_kWh"].to_numpy(dtype=float) / step
+    flow_rate = ending["flow_rate_m3_h"].to_numpy(dtype=float)
+    sorted_power = -np.sort(-power)
+    sorted_flow_rate = -np.sort(-flow_rate)
+    winter = np.isin(ending.index.month, WINTER_MONTHS)
+    winter_energy = ending["total_thermal_energy_kWh"].to_numpy(dtype=float)[winter].sum()
+    return {
+        "peak_power_kW": float(sorted_power[0]),
+        "max_flow_rate_m3_h": float(sorted_flow_rate[0]),
+        **{column: float(ending[column].to_numpy(dtype=float).sum()) for column in ENERGY_COLUMNS},
+        "winter_DHW_share": float(ending["DHW_thermal_energy_kWh"].to_numpy(dtype=float)[winter].sum() / winter_energy) if winter_energy else float("nan"),
+        **{f"power_exceeded_{hours}h_kW": _exceeded(sorted_power, hours, step) for hours in EXCEEDANCE_HOURS},
+        **{f"flow_rate_exceeded_{hours}h_m3_h": _exceeded(sorted_flow_rate, hours, step) for hours in EXCEEDANCE_HOURS},
+        **{f"hours_above_{threshold}kW": float((power > threshold).sum() * step) for threshold in POWER_THRESHOLDS_KW},
+    }
+
+def scenario_record(ending: pd.DataFrame, parameters: dict[str, Any], result_path: Union[str, Path], scenario_id: int = 0,
+                    result_key: Optional[str] = None) -> dict[str, Any]:
+    """Row of the scenario database: pointers to the hourly result, scenario parameters (see backend.scenario.scenario_parameters) and metrics"""
+    return {
+        "result_path": str(Path(result_path).resolve()),
+        SCENARIO_ID_NAME: int(scenario_id),
+        "result_key": result_key,
+        "created": time.time(),
+        **{column: parameters.get(column) for column in PARAMETER_COLUMNS},
+        **scenario_metrics(ending),
+    }
+
+class ScenarioDatabase:
+    def __init__(self, path: Union[str, Path]) -> None:
+        """SQLite file of scenario parameters, summary metrics and pointers to the hourly results, one row per scenario.
+        Every metric column is indexed, so that filtering or ranking tens of thousands of scenarios does not read hourly data.
+        Columns are named as PARAMETER_COLUMNS and METRIC_COLUMNS, quote the parameters in SQL ("T_departure.max_HS").
+
+        Parameters:
+            path (str | Path): Database file, created if missing. Columns added since its creation are added to it.
+        """
+        self.path = Path(path)
+        self.connection = sqlite3.connect(self.path)
+        with self.connection:
+            self.connection.execute(f"CREATE TABLE IF NOT EXISTS scenarios ({', '.join(f'{_quote(column)} {declaration}' for column, declaration in COLUMNS.items())}, "
+                                    f"UNIQUE (result_path, {SCENARIO_ID_NAME}))")
+            existing = {row[1] for row in self.connection.execute("PRAGMA table_info(scenarios)")}
+            for column, declaration in COLUMNS.items():
+                if column not in existing:
+                    self.connection.execute(f"ALTER TABLE scenarios ADD COLUMN {_quote(column)} {declaration}")
+            for column in METRIC_COLUMNS:
+                self.connection.execute(f"CREATE INDEX IF NOT EXISTS {_quote('scenarios_' + column)} ON scenarios ({_quote(column)})")
+
+    def insert(self, records: Iterable[dict[str, Any]]) -> int:
+        """Insert records (see scenario_record) in one transaction, replacing the scenarios of the same result file and id.
+
+        Returns:
+            int: Number of records inserted.
+        """
+        columns = [column for column in COLUMNS if column != "id"]
+        rows = [tuple(record.get(column) for column in columns) for record in records]
+        with self.connection:
+            self.connection.executemany(f"INSERT OR REPLACE INTO scenarios ({', '.join(map(_quote, columns))}) VALUES ({', '.join('?' * len(columns))})", rows)
+        return len(rows)
+
+    def query(self, where: str = "1", parameters: Iterable[Any] = (), order_by: Optional[str] = None, descending: bool = False,
+              limit: Optional[int] = None, columns: Optional[list[str]] = None) -> pd.DataFrame:
+        """Scenarios matching an SQL condition, e.g. query("peak_power_kW > ?", [45_000]) or
+        query("flow_rate_exceeded_200h_m3_h > ?", [500]) for a flow rate above 500 m3/h for more than 200 h.
+
+        Parameters:
+            where (str): SQL condition on the columns, with ? placeholders.
+            parameters (Iterable[Any]): Values of the placeholders.
+            order_by (str, optional): Column to sort by, e.g. "winter_DHW_share".
+            descending (bool): Sort in decreasing order.
+            limit (int, optional): Maximum number of rows.
+            columns (list[str], optional): Columns to return, all by default.
+
+        Raises:
+            ValueError: If order_by or one of columns is unknown.
+
+        Returns:
+            pd.DataFrame: One row per scenario, indexed by id.
+        """
+        unknown = (set(columns or []) | ({order_by} if order_by is not None else set())) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown scenario database columns: {', '.join(sorted(unknown))}")
+        sql = f"SELECT {', '.join(map(_quote, ['id'] + [column for column in columns if column != 'id'])) if columns else '*'} FROM scenarios WHERE {where}"
+        if order_by is not None:
+            sql += f" ORDER BY {_quote(order_by)}{' DESC' if descending else ''}"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+        return pd.read_sql_query(sql, self.connection, params=list(parameters), index_col="id")
+
+    def read_result(self, scenario: Union[pd.Series, dict[str, Any]]) -> pd.DataFrame:
+        """Hourly result of a scenario row (see query), only its row groups are read from a sweep Parquet file"""
+        path = Path(scenario["result_path"])
+        if path.suffix == ".parquet" and SCENARIO_ID_NAME in pq.read_schema(path).names:
+            return pq.read_table(path, filters=[(SCENARIO_ID_NAME, "==", int(scenario[SCENARIO_ID_NAME]))]).to_pandas()
+        if path.suffix == ".parquet":
+            return pd.read_parquet(path)
+        if path.suffix == ".feather":
+            return pd.read_feather(path)
+        return pd.read_csv(path, comment="#", index_col=0, parse_dates=True)
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM scenarios").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def __enter__(self) -> "ScenarioDatabase":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
@@ -0,0 +1,221 @@
+import base64
+import io
+import json
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+
+from heatpro.external_factors import ExternalFactors
+
+from backend.cache import LRUCache, fingerprint
+from backend.export import EXPORT_FORMATS, export_bytes
+from backend.ingestion import load_external_factors
+from backend.pipeline import PipelineGraph, build_district_heating_graph
+from backend.scenario import MONTHLY_OR_YEARLY_TABLES, TABLE_NAMES, WEEKLY_TABLES, scenario_inputs, scenario_parameters
+
+HOST = "127.0.0.1"
+PORT = 8765
+RESULT_CACHE_SIZE = 32 # exported results kept in memory
+MAX_REQUEST_BYTES = 1 << 28
+RESPONSE_FORMATS = ["parquet", "feather"] # feather is the Arrow IPC file format
+DATA_DIRECTORY = Path("data") # only directory whose files can be sent as a path, relative to the working directory
+DATETIME_TABLES = {TABLE_NAMES.get(name, name) for name in MONTHLY_OR_YEARLY_TABLES}
+
+def _decode_table(value: Any, datetime_index: bool, name: str) -> pd.DataFrame:
+    """Table sent as pandas "split" JSON ({"index", "columns", "data"}) or as a base64 file ({"content", "format": "parquet" or "csv"})"""
+    if isinstance(value, dict) and "content" in value:
+        content = io.BytesIO(base64.b64decode(value["content"]))
+        file_format = value.get("format", "parquet")
+        if file_format == "parquet":
+            return pd.read_parquet(content)
+        if file_format == "csv":
+            return pd.read_csv(content, index_col=0, parse_dates=True) if datetime_index else pd.read_csv(content)
+        raise ValueError(f"Table {name} has unknown format {file_format}, use parquet or csv")
+    if isinstance(value, dict) and {"columns", "data"} <= set(value):
+        table = pd.DataFrame(value["data"], columns=value["columns"], index=value.get("index"))
+        return table.set_axis(pd.to_datetime(table.index), axis=0) if datetime_index else table
+    raise ValueError(f"Table {name} should be split JSON with columns and data, or a base64 file with content and format")
+
+def _decode_external_factors(value: Any) -> ExternalFactors:
+    """External factors sent as the path of a file of DATA_DIRECTORY ({"path", "rows"}), a base64 file ({"content", "format"}) or split JSON.
+    Files are parsed once per content (see backend.ingestion.load_external_factors).
+
+    Raises:
+        ValueError: If the path is outside DATA_DIRECTORY, symbolic links and .. included, or the data is invalid.
+    """
+    if isinstance(value, dict) and "path" in value:
+        path = Path(value["path"]).resolve()
+        if not path.is_relative_to(DATA_DIRECTORY.resolve()):
+            raise ValueError(f"External factors path should be in {DATA_DIRECTORY}, send other files as content")
+        return load_external_factors(path, rows=value.get("rows"))[0]
+    if isinstance(value, dict) and "content" in value:
+        return load_external_factors(io.BytesIO(base64.b64decode(value["content"])), value.get("format", "parquet"), rows=value.get("rows"))[0]
+    return ExternalFactors(_decode_table(value, True, "external_factors"))
+
+def request_inputs(request: dict[str, Any]) -> dict[str, Any]:
+    """Pipeline inputs of a JSON request, made of the content of a scenario file (see backend.scenario.read_scenario)
+    where external_factors and every entry of tables hold the data instead of a file name.
+
+    Raises:
+        ValueError: If an entry is missing or invalid.
+    """
+    if "external_factors" not in request or "tables" not in request:
+        raise ValueError("Request should have external_factors and tables entries")
+    tables = {name: _decode_table(request["tables"][name], name in DATETIME_TABLES, name)
+              for name in (TABLE_NAMES.get(name, name) for name in MONTHLY_OR_YEARLY_TABLES + WEEKLY_TABLES) if name in request["tables"]}
+    return scenario_inputs(request, _decode_external_factors(request["external_factors"]), tables, "request")
+
+# Worker process state, one graph per worker so that consecutive requests only recompute the stages they change
+_worker_graph: Optional[PipelineGraph] = None
+
+def _run_export(inputs: dict[str, Any], file_format: str) -> bytes:
+    global _worker_graph
+    if _worker_graph is None:
+        _worker_graph = build_district_heating_graph()
+    results, _ = _worker_graph.run(inputs)
+    return export_bytes(results["ending"], file_format, scenario_parameters(inputs))
+
+class LoadProfileService:
+    def __init__(self, processes: Optional[int] = None, cache_size: int = RESULT_CACHE_SIZE) -> None:
+        """Pipeline runs shared by the requests of a server: at most processes runs at once in a process pool,
+        identical concurrent requests wait for the same run and results are cached by input hash.
+
+        Parameters:
+            processes (int, optional): Maximum number of concurrent pipeline runs, defaults to the number of cores.
+            cache_size (int): Number of exported results kept in memory.
+        """
+        self.processes = processes or os.cpu_count()
+        self.cache = LRUCache(maxsize=cache_size)
+        self._executor = ProcessPoolExecutor(max_workers=self.processes)
+        self._graph = build_district_heating_graph() # only used for the input keys, runs have their own graph
+        self._pending: dict[str, tuple[Future, ProcessPoolExecutor]] = {} # run of a key and the pool running it
+        self._lock = threading.RLock()
+
+    def result(self, inputs: dict[str, Any], file_format: str = "parquet") -> tuple[bytes, str, str]:
+        """Exported ending table of inputs.
+        If a worker process dies during the run (e.g. killed or out of memory), the pool is recreated and the run submitted once more.
+
+        Raises:
+            ValueError: If the format is unknown or a pipeline input is missing.
+            RuntimeError: If a worker process died during both runs.
+
+        Returns:
+            tuple[bytes, str, str]: File content, key of the inputs and format, "hit", "coalesced" or "miss".
+        """
+        if file_format not in EXPORT_FORMATS:
+            raise ValueError(f"Unknown format {file_format}, use one of {', '.join(EXPORT_FORMATS)}")
+        key = fingerprint((tuple(sorted(self._graph.input_keys(inputs).items())), file_format))
+        try:
+            return self._result(inputs, file_format, key)
+        except BrokenProcessPool:
+            pass
+        try:
+            return self._result(inputs, file_format, key)
+        except BrokenProcessPool as error:
+            raise RuntimeError("A pipeline worker process stopped twice while running the request, e.g. out of memory") from error
+
+    def _result(self, inputs: dict[str, Any], file_format: str, key: str) -> tuple[bytes, str, str]:
+        with self._lock:
+            content = self.cache.get(key)
+            if content is not None:
+                return content, key, "hit"
+            future, executor = self._pending.get(key, (None, None))
+            # a failed run may not have been removed yet
+            if future is not None and future.done() and future.exception() is not None:
+                future = None
+            status = "miss" if future is None else "coalesced"
+            if future is None:
+                executor = self._executor
+                try:
+                    future = executor.submit(_run_export, inputs, file_format)
+                except BrokenProcessPool:
+                    self._restart(executor)
+                    raise
+                self._pending[key] = (future, executor)
+                future.add_done_callback(lambda future: self._done(key, future))
+        try:
+            return future.result(), key, status
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise
+
+    def _done(self, key: str, future: Future) -> None:
+        with self._lock:
+            if not future.cancelled() and future.exception() is None:
+                self.cache.set(key, future.result())
+            if self._pending.get(key, (None,))[0] is future:
+                del self._pending[key]
+
+    def _restart(self, broken: ProcessPoolExecutor) -> None:
+        """Replace the pool if it is still the broken one, every run it had fails with BrokenProcessPool"""
+        with self._lock:
+            if self._executor is broken:
+                self._executor = ProcessPoolExecutor(max_workers=self.processes)
+                broken.shutdown(wait=False, cancel_futures=True)
+
+    def info(self) -> dict[str, Any]:
+        with self._lock:
+            return {"processes": self.processes, "running": len(self._pending), "cache": self.cache.info()._asdict()}
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(cancel_futures=True)
+
+class _Handler(BaseHTTPRequestHandler):
+    service: LoadProfileService
+
+    def _send(self, status: HTTPStatus, content: bytes, content_type: str, headers: Optional[dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(content)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    def _send_json(self, status: HTTPStatus, value: Any) -> None:
+        self._send(status, json.dumps(value).encode(), "application/json")
+
+    def do_GET(self) -> None:
+        if urlparse(self.path).path != "/health":
+            return self._send_json(HTTPStatus.NOT_FOUND, {"error": "Use GET /health or POST /run"})
+        self._send_json(HTTPStatus.OK, {"status": "ok", **self.service.info()})
+
+    def do_POST(self) -> None:
+        url = urlparse(self.path)
+        if url.path != "/run":
+            return self._send_json(HTTPStatus.NOT_FOUND, {"error": "Use GET /health or POST /run"})
+        length = int(self.headers.get("Content-Length", 0))
+        if length > MAX_REQUEST_BYTES:
+            return self._send_json(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"Request body is larger than {MAX_REQUEST_BYTES} bytes"})
+        file_format = parse_qs(url.query).get("format", ["parquet"])[0]
+        try:
+            if file_format not in RESPONSE_FORMATS:
+                raise ValueError(f"Unknown format {file_format}, use one of {', '.join(RESPONSE_FORMATS)}")
+            inputs = request_inputs(json.loads(self.rfile.read(length)))
+            content, key, status = self.service.result(inputs, file_format)
+        except (ValueError, KeyError, TypeError) as error:
+            return self._send_json(HTTPStatus.BAD_REQUEST, {"error": f"{type(error).__name__}: {error}"})
+        except Exception as error:
+            return self._send_json(HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(error).__name__}: {error}"})
+        self._send(HTTPStatus.OK, content, EXPORT_FORMATS[file_format][1], {"X-Result-Key": key, "X-Cache": status})
+
+def make_server(host: str = HOST, port: int = PORT, processes: Optional[int] = None, cache_size: int = RESULT_CACHE_SIZE) -> ThreadingHTTPServer:
+    """HTTP server running the app pipeline, serve it with serve_forever and stop it with shutdown then server.service.shutdown.
+
+    POST /run?format=parquet|feather takes a JSON request (see request_inputs) and returns the ending table of the app export,
+    with X-Result-Key (hash of the inputs) and X-Cache (hit, coalesced or miss) headers. Invalid requests get a 400 JSON error.
+    GET /health returns the number of processes, the runs in progress and the cache statistics.
+    """
+    handler = type("Handler", (_Handler,), {"service": LoadProfileService(processes, cache_size)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    server.service = handler.service
+    return server
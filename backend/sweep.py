@@ -0,0 +1,165 @@
+import itertools
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Iterator, Optional, Union
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from heatpro.external_factors import ExternalFactors, EXTERNAL_TEMPERATURE_NAME, HEATING_SEASON_NAME
+
+from backend.cache import fingerprint
+from backend.export import export_schema
+from backend.pipeline import PipelineGraph, build_district_heating_graph
+from backend.result_store import ResultStore, result_key
+from backend.scenario import apply_overrides, read_toml, scenario_parameters
+from backend.scenario_db import INSERT_BATCH, SCENARIO_ID_NAME, ScenarioDatabase, scenario_record
+
+def expand_grid(grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    """Cartesian product of parameter values, the last parameter varies fastest"""
+    return [dict(zip(grid, values)) for values in itertools.product(*grid.values())]
+
+def read_sweep(path: Union[str, Path]) -> list[dict[str, Any]]:
+    """Read the scenarios of a sweep TOML file, made of a [grid] table of parameter lists
+    and/or a list of [[scenarios]] tables. Parameters are named as in apply_overrides."""
+    sweep = read_toml(path)
+    scenarios = expand_grid(sweep["grid"]) if "grid" in sweep else []
+    return scenarios + list(sweep.get("scenarios", []))
+
+class SharedExternalFactors:
+    def __init__(self, external_factors: ExternalFactors, directory: Union[str, Path]) -> None:
+        """External factors written once as .npy files, memory-mapped by each worker instead of being copied.
+
+        Parameters:
+            external_factors (ExternalFactors): Data to share.
+            directory (str | Path): Where the .npy files are written.
+        """
+        self.directory = Path(directory)
+        data = external_factors.data
+        # nanoseconds since the epoch whatever the unit of the index, in UTC if it has a time zone
+        np.save(self.directory / "index.npy", data.index.as_unit("ns").asi8)
+        for column in data.columns:
+            np.save(self.directory / f"{column}.npy", data[column].to_numpy())
+        self.columns = list(data.columns)
+        self.index_name = data.index.name
+        self.unit = data.index.unit
+        self.tz = data.index.tz
+
+    def load(self) -> ExternalFactors:
+        index = pd.DatetimeIndex(np.load(self.directory / "index.npy", mmap_mode='r').view('M8[ns]'), name=self.index_name).as_unit(self.unit)
+        if self.tz is not None:
+            index = index.tz_localize("UTC").tz_convert(self.tz)
+        return ExternalFactors(pd.DataFrame(
+                                {column: np.load(self.directory / f"{column}.npy", mmap_mode='r') for column in self.columns},
+                                index=index,
+                                copy=False,
+                            ))
+
+# Worker process state, set once by _init_worker
+_worker_inputs: dict[str, Any] = {}
+_worker_graph: Optional[PipelineGraph] = None
+_worker_store: Optional[ResultStore] = None
+
+def _init_worker(shared_external_factors: SharedExternalFactors, base_inputs: dict[str, Any], store_directory: Optional[Path]) -> None:
+    global _worker_graph, _worker_store
+    _worker_inputs.update(base_inputs, external_factors=shared_external_factors.load())
+    # One graph per worker, consecutive scenarios only recompute the stages their parameters touch
+    _worker_graph = build_district_heating_graph()
+    # workers only write result files, the parent process registers them in the store index
+    _worker_store = None if store_directory is None else ResultStore(store_directory)
+
+def _with_scenario_id(scenario_id: int, ending: pd.DataFrame) -> pd.DataFrame:
+    return pd.concat((pd.DataFrame({SCENARIO_ID_NAME: scenario_id}, index=ending.index), ending), axis=1)
+
+def _run_scenario(scenario_id: int, overrides: dict[str, Any], key: Optional[str]) -> tuple[pd.DataFrame, Optional[dict[str, Any]]]:
+    results, _ = _worker_graph.run(apply_overrides(_worker_inputs, overrides))
+    entry = None if _worker_store is None or key is None else _worker_store.write_entry(key, results)
+    return _with_scenario_id(scenario_id, results["ending"]), entry
+
+def scenario_keys(base_inputs: dict[str, Any], scenarios: list[dict[str, Any]]) -> list[str]:
+    """Result store key of every scenario, inputs shared with the base scenario (e.g. external factors and tables) are hashed once"""
+    graph = build_district_heating_graph()
+    base_keys = graph.input_keys(base_inputs)
+    keys = []
+    for overrides in scenarios:
+        inputs = apply_overrides(base_inputs, overrides)
+        keys.append(result_key({name: key if inputs[name] is base_inputs[name] else fingerprint(inputs[name]) for name, key in base_keys.items()}))
+    return keys
+
+def iter_sweep(base_inputs: dict[str, Any], scenarios: list[dict[str, Any]], processes: Optional[int] = None,
+               store: Optional[ResultStore] = None, keys: Optional[list[str]] = None) -> Iterator[tuple[int, pd.DataFrame]]:
+    """Run scenarios over a process pool and yield (scenario id, ending dataframe) as soon as each one completes.
+    The scenario id is the position of the scenario in the list. Scenarios found in store are loaded first,
+    the others are computed and saved to it, keys are scenario_keys(base_inputs, scenarios) if already computed."""
+    processes = processes or os.cpu_count()
+    if store is None:
+        keys = [None] * len(scenarios)
+    elif keys is None:
+        keys = scenario_keys(base_inputs, scenarios)
+    missing = []
+    for scenario_id, key in enumerate(keys):
+        stored = None if key is None else store.load(key, base_inputs, ["ending"])
+        if stored is None:
+            missing.append(scenario_id)
+        else:
+            yield scenario_id, _with_scenario_id(scenario_id, stored["ending"])
+    if not missing:
+        return
+    other_inputs = {name: value for name, value in base_inputs.items() if name != "external_factors"}
+    with tempfile.TemporaryDirectory(prefix="heatpro_sweep_") as directory:
+        shared_external_factors = SharedExternalFactors(base_inputs["external_factors"], directory)
+        with ProcessPoolExecutor(max_workers=processes, initializer=_init_worker,
+                                 initargs=(shared_external_factors, other_inputs, None if store is None else store.directory)) as executor:
+            # Contiguous chunks keep neighbouring scenarios, which share most parameters, on the same worker graph
+            chunks = np.array_split(np.array(missing), min(len(missing), processes * 4))
+            futures = [executor.submit(_run_chunk, [(int(i), scenarios[i], keys[i]) for i in chunk]) for chunk in chunks if len(chunk)]
+            for future in as_completed(futures):
+                for scenario_id, ending, entry in future.result():
+                    if entry is not None:
+                        store.register(keys[scenario_id], entry)
+                    yield scenario_id, ending
+
+def _run_chunk(chunk: list[tuple[int, dict[str, Any], Optional[str]]]) -> list[tuple[int, pd.DataFrame, Optional[dict[str, Any]]]]:
+    return [(scenario_id, *_run_scenario(scenario_id, overrides, key)) for scenario_id, overrides, key in chunk]
+
+def run_sweep(base_inputs: dict[str, Any], scenarios: list[dict[str, Any]], path: Union[str, Path], processes: Optional[int] = None,
+              store: Optional[ResultStore] = None, database: Optional[ScenarioDatabase] = None) -> int:
+    """Run scenarios over a process pool and stream every result into one Parquet file,
+    one row group per scenario keyed by the scenario_id column.
+    Scenario parameters are stored as JSON in the file metadata, with the units of the columns.
+    Scenarios found in store are loaded instead of computed, computed ones are saved to it.
+    The parameters and summary metrics of every scenario are inserted in database, pointing to its row group in path.
+
+    Returns:
+        int: Number of scenarios written.
+    """
+    keys = None if store is None else scenario_keys(base_inputs, scenarios)
+    writer = None
+    written = 0
+    records = []
+    try:
+        for scenario_id, ending in iter_sweep(base_inputs, scenarios, processes, store, keys):
+            if writer is None:
+                schema = export_schema(ending)
+                schema = schema.with_metadata({**schema.metadata, b"heatpro_app.scenarios": json.dumps(dict(enumerate(scenarios))).encode()})
+                writer = pq.ParquetWriter(path, schema, compression="zstd")
+            writer.write_table(pa.Table.from_pandas(ending, schema=schema))
+            written += 1
+            if database is not None:
+                records.append(scenario_record(ending, scenario_parameters(apply_overrides(base_inputs, scenarios[scenario_id])), path, scenario_id,
+                                               None if keys is None else keys[scenario_id]))
+                if len(records) == INSERT_BATCH:
+                    database.insert(records)
+                    records = []
+    finally:
+        if writer is not None:
+            writer.close()
+        # scenarios already written stay queryable if the sweep fails
+        if records:
+            database.insert(records)
+    return written
@@ -1,3 +1,6 @@
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 
@@ -5,19 +8,33 @@ from heatpro.check import ENERGY_FEATURE_NAME
 from heatpro.district_heating_load import DistrictHeatingLoad
 from heatpro.external_factors import HEATING_SEASON_NAME, EXTERNAL_TEMPERATURE_NAME
 
-def plot_generated_load(district_heating: DistrictHeatingLoad) -> go.Figure:
+from backend.downsampling import MAX_POINTS, Window, downsample
+from backend.heating_season import add_heating_season
+from backend.duration_curve import SAMPLE_POINTS, DurationCurve
+from backend.energy_signature import fit_energy_signature
+from backend.resolution import step_hours, to_power
+
+MAX_MARKERS = 10_000 # time steps above which the demand versus temperature figure is binned
+DENSITY_BINS = 60
+
+def plot_generated_load(district_heating: DistrictHeatingLoad, window: Window = None, max_points: Optional[int] = MAX_POINTS) -> go.Figure:
+    """Plot the stacked power demand (kW) of every sector, energy per time step divided by the time step.
+    Only the window is plotted, min-max decimated to max_points buckets (see backend.downsampling.downsample)."""
     palette = dict(zip(district_heating.demands.keys(),['rgb(127,179,228,0.6)', 'rgb(254,152,152,0.6)', 'rgb(190,226,253,0.6)', 'rgb(254,212,213,0.6)']))
     names = dict(zip(district_heating.demands.keys(),['Domestic Hot Water', 'Industry', 'Heat Loss', 'Space Heating']))
+    hourly_loads = downsample(
+        to_power(pd.concat({sector: hourly_load[ENERGY_FEATURE_NAME] for sector, hourly_load in district_heating.demands.items()}, axis=1)),
+        window, max_points, stacked=True)
     fig = go.Figure(
             data=[
                 go.Scatter(
-                    x = hourly_load.index,
-                    y = hourly_load[ENERGY_FEATURE_NAME],
+                    x = hourly_loads.index,
+                    y = hourly_loads[sector],
                     name=names[sector],
                     stackgroup="positive",
                     line_width=0,
                     fillcolor=palette[sector],
-                ) for sector, hourly_load in district_heating.demands.items()],
+                ) for sector in district_heating.demands],
             layout_title_text="Hourly Heat Demand",
             layout_yaxis_title='<b>kW</b>',
             layout_legend=dict(
@@ -29,52 +46,28 @@ def plot_generated_load(district_heating: DistrictHeatingLoad) -> go.Figure:
             layout_hovermode='x unified',
         )
     
-    y_max = float('-inf')
-    for trace in fig.data:
-        if 'y' in trace:
-            y_max = max(y_max, max(trace.y))
-    changes = district_heating.external_factors.data[HEATING_SEASON_NAME].diff().astype(bool)
-    changing_date = pd.concat((changes[changes == True],changes.tail(1)))
-    for start, end in zip(changing_date[::2].index,changing_date[1::2].index):
-        fig.add_annotation(
-                text="Heating Season",
-                x=start,
-                y=y_max*1.1,
-                font = dict(size=14, color='green'),
-                showarrow=False,
-                xanchor="left",
-            )
-        fig.add_vrect(
-            x0=start, 
-            x1=end,
-            line_width=0,
-            fillcolor="rgb(108, 150, 116)",
-            opacity=0.5,
-            layer="below",
-            )
+    y_max = hourly_loads.max().max()
+    add_heating_season(fig, district_heating.external_factors, y_max*1.1, window)
+    if window is not None:
+        fig.update_xaxes(range=window)
     return fig
 
-def plot_monotone(district_heating: DistrictHeatingLoad) -> go.Figure:
-    """Plot the heat monotone corresponding to the heat demand"""
+def plot_monotone(district_heating: DistrictHeatingLoad, points: int = SAMPLE_POINTS) -> go.Figure:
+    """Plot the heat monotone corresponding to the heat demand, sampled at points durations"""
     palette = dict(zip(district_heating.demands.keys(),['rgb(127,179,228,0.6)', 'rgb(254,152,152,0.6)', 'rgb(190,226,253,0.6)', 'rgb(254,212,213,0.6)']))
     names = dict(zip(district_heating.demands.keys(),['Domestic Hot Water', 'Industry', 'Heat Loss', 'Space Heating']))
-    #sort index 
-    sorted_index=pd.concat(
-        (
-            hourly_load[ENERGY_FEATURE_NAME] for hourly_load in district_heating.demands.values()
-        ), axis=1, ignore_index=True
-    ).sum(1).sort_values(ascending=False).index
+    monotone = DurationCurve.of(district_heating).sample(points)
     # Create plot
     fig = go.Figure(
             data=[
                 go.Scatter(
-                    x = [i/len(hourly_load.index)*100 for i in range(len(hourly_load.index))],
-                    y = hourly_load[ENERGY_FEATURE_NAME].reindex(sorted_index),
+                    x = monotone.index,
+                    y = monotone[sector],
                     name=names[sector],
                     stackgroup="positive",
                     line_width=0,
                     fillcolor=palette[sector],
-                ) for sector, hourly_load in district_heating.demands.items()],
+                ) for sector in district_heating.demands],
             layout_title_text="Ordered Heat Demand",
             layout_yaxis_title='<b>kW</b>',
             layout_xaxis_title='<b>Ordered Hours (%)</b>',
@@ -87,45 +80,77 @@ def plot_monotone(district_heating: DistrictHeatingLoad) -> go.Figure:
         )
     return fig
 
-def plot_demand_vs_outside_temperature(district_heating: DistrictHeatingLoad) -> go.Figure:
-    """Plot a scatter figure of demand versus outside temperature"""
+def plot_demand_vs_outside_temperature(district_heating: DistrictHeatingLoad, mode: str = "auto", max_markers: int = MAX_MARKERS, bins: int = DENSITY_BINS) -> go.Figure:
+    """Plot demand versus outside temperature per season, with the fitted energy signature.
+
+    Parameters:
+        district_heating (DistrictHeatingLoad): Fitted district heating load.
+        mode (str): "scatter" for one marker per time step, "density" for a bins x bins histogram of hours per season,
+            "auto" for density above max_markers time steps.
+        max_markers (int): Time steps above which "auto" switches to density.
+        bins (int): Number of temperature and demand bins of the density mode.
+    """
+    if mode not in ("auto", "scatter", "density"):
+        raise ValueError(f"Unknown mode {mode}, use auto, scatter or density")
     
     # Extracting data
-    demand = pd.concat(
+    demand = to_power(pd.concat(
         (hourly_load[ENERGY_FEATURE_NAME] for hourly_load in district_heating.demands.values()), 
         axis=1, ignore_index=True
-    ).sum(1)
+    ).sum(1))
+    temperature = district_heating.external_factors.data[EXTERNAL_TEMPERATURE_NAME].to_numpy(dtype=float)
+    heating_season = district_heating.external_factors.data[HEATING_SEASON_NAME].to_numpy(dtype=bool)
+    density = mode == "density" or (mode == "auto" and len(demand) > max_markers)
+    # Heating season in green, non-heating season in blue
+    seasons = [(heating_season, "Heating Season", "rgb(108, 150, 116)", 1., "Greens"), (~heating_season, "Non-Heating Season", "rgb(13, 117, 194)", 0.5, "Blues")]
     
     fig = go.Figure()
+    if density:
+        # same bins for both seasons, empty bins are transparent
+        temperature_edges = np.histogram_bin_edges(temperature, bins)
+        demand_edges = np.histogram_bin_edges(demand.to_numpy(), bins)
+        for in_season, name, color, opacity, colorscale in seasons:
+            counts, _, _ = np.histogram2d(temperature[in_season], demand.to_numpy()[in_season], bins=(temperature_edges, demand_edges))
+            counts *= step_hours(demand.index)
+            fig.add_trace(
+                go.Heatmap(
+                    x=(temperature_edges[1:] + temperature_edges[:-1]) / 2,
+                    y=(demand_edges[1:] + demand_edges[:-1]) / 2,
+                    z=np.where(counts.T > 0, counts.T, np.nan),
+                    colorscale=colorscale,
+                    showscale=False,
+                    opacity=max(opacity, 0.7),
+                    name=name,
+                    showlegend=True,
+                    hovertemplate="%{x:.1f} °C, %{y:.0f} kW: %{z} hours",
+                )
+            )
+    else:
+        for in_season, name, color, opacity, _ in seasons:
+            fig.add_trace(
+                go.Scatter(
+                    x=temperature[in_season],
+                    y=demand[in_season],
+                    text=district_heating.external_factors.data.index[in_season],
+                    mode="markers",
+                    opacity=opacity,
+                    marker=dict(
+                        size=4,
+                        color=color,
+                    ),
+                    name=name,
+                )
+            )
     
-    # Trace for True values (e.g., during heating season)
-    fig.add_trace(
-        go.Scatter(
-            x=district_heating.external_factors.data[EXTERNAL_TEMPERATURE_NAME][district_heating.external_factors.data[HEATING_SEASON_NAME]],
-            y=demand[district_heating.external_factors.data[HEATING_SEASON_NAME]],
-            text=district_heating.external_factors.data.index,
-            mode="markers",
-            marker=dict(
-                size=4,
-                color="rgb(108, 150, 116)"  # Green color for heating season
-            ),
-            name="Heating Season"  
-        )
-    )
-    
-    # Trace for False values (e.g., outside heating season)
+    signature = fit_energy_signature(temperature, demand.to_numpy())
+    signature_temperature = np.array([temperature.min(), signature.base_temperature, temperature.max()])
     fig.add_trace(
         go.Scatter(
-            x=district_heating.external_factors.data[EXTERNAL_TEMPERATURE_NAME][~district_heating.external_factors.data[HEATING_SEASON_NAME]],
-            y=demand[~district_heating.external_factors.data[HEATING_SEASON_NAME]],
-            text=district_heating.external_factors.data.index,
-            mode="markers",
-            opacity=0.5,
-            marker=dict(
-                size=4,
-                color="rgb(13, 117, 194)"  # Blue color for not heating season
-            ),
-            name="Non-Heating Season"  
+            x=signature_temperature,
+            y=signature(signature_temperature),
+            mode="lines",
+            line=dict(color="black", dash="dash"),
+            name=f"Signature ({signature.slope:.0f} kW/°C below {signature.base_temperature:.1f} °C)",
         )
     )
     
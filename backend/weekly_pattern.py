@@ -0,0 +1,78 @@
+import numpy as np
+import pandas as pd
+
+from heatpro.check import WEIGHT_NAME_REQUIRED
+
+from backend import DAY_NUMBERS
+from backend.calendar_index import CalendarIndex
+from backend.resolution import HOURS_PER_DAY
+
+HOURS_PER_WEEK = 7 * 24
+
+def weekly_weight_array(weekly_profile: pd.DataFrame, normalize: bool = True, steps_per_hour: int = 1) -> np.ndarray:
+    """Convert a weekly profile table (columns day, hour and weight) into a 7x24 array indexed by (dayofweek, hour).
+    If normalize, weights are divided by the sum of their day so that each day sums to 1.
+    Hours missing from the table weigh 1, as in heatpro apply_weekly_hourly_pattern.
+    With steps_per_hour > 1 the array is 7x(24*steps_per_hour), see interpolate_weekly_weights."""
+    values = weekly_profile[WEIGHT_NAME_REQUIRED]
+    if normalize:
+        values = values / values.groupby(weekly_profile['day']).transform('sum')
+    weights = np.ones((7, 24))
+    weights[weekly_profile['day'].map(DAY_NUMBERS).to_numpy(dtype=int), weekly_profile['hour'].to_numpy(dtype=int)] = values.to_numpy(dtype=float)
+    if steps_per_hour == 1:
+        return weights
+    return interpolate_weekly_weights(weights, steps_per_hour, normalize)
+
+def interpolate_weekly_weights(weights: np.ndarray, steps_per_hour: int, normalize: bool = True) -> np.ndarray:
+    """Refine a 7x24 weekly pattern to 7x(24*steps_per_hour) steps.
+    Hourly weights are linearly interpolated (periodically over the week) at the middle of every step and divided
+    by steps_per_hour, so that a day keeps its hourly total. If normalize, each day sums to 1 again."""
+    hours = np.arange(HOURS_PER_WEEK) + 0.5
+    steps = (np.arange(HOURS_PER_WEEK * steps_per_hour) + 0.5) / steps_per_hour
+    fine = np.interp(steps, hours, np.asarray(weights, dtype=float).ravel(), period=HOURS_PER_WEEK).reshape(7, HOURS_PER_DAY * steps_per_hour) / steps_per_hour
+    if normalize:
+        fine /= fine.sum(axis=1, keepdims=True)
+    return fine
+
+class WeeklyPeriodicSeries:
+    def __init__(self, calendar: CalendarIndex, weights: np.ndarray) -> None:
+        """Series repeating a weekly pattern, only expanded onto the calendar index when consumed.
+
+        Parameters:
+            calendar (CalendarIndex): Calendar of the index of the series.
+            weights (np.ndarray): Weekly pattern of shape (7, calendar.steps_per_day) indexed by (dayofweek, step of the day).
+
+        Raises:
+            ValueError: If weights shape is not (7, calendar.steps_per_day).
+        """
+        if np.shape(weights) != (7, calendar.steps_per_day):
+            raise ValueError(f"weights should have shape (7, {calendar.steps_per_day}), got {np.shape(weights)}")
+        self.calendar = calendar
+        self.index = calendar.index
+        self.weights = np.asarray(weights, dtype=float)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    @property
+    def steps_per_day(self) -> int:
+        return self.weights.shape[1]
+
+    def to_numpy(self) -> np.ndarray:
+        return self.weights.ravel()[self.calendar.week_positions]
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        values = self.to_numpy()
+        return values if dtype is None else values.astype(dtype, copy=False)
+
+    def to_frame(self) -> pd.DataFrame:
+        """Materialize the series with heatpro weight format"""
+        return pd.DataFrame(
+                            {WEIGHT_NAME_REQUIRED: self.to_numpy()},
+                            index = self.index,
+                        )
+
+def apply_weekly_pattern(calendar: CalendarIndex, weekly_profile: pd.DataFrame, normalize: bool = True) -> pd.DataFrame:
+    """Vectorized equivalent of heatpro apply_weekly_hourly_pattern built from a weekly profile table.
+    Below an hour the pattern is interpolated to the time step of the calendar, a step then weighs about 1/steps_per_hour of its hour."""
+    return WeeklyPeriodicSeries(calendar, weekly_weight_array(weekly_profile, normalize, calendar.steps_per_hour)).to_frame()
@@ -0,0 +1,51 @@
+import argparse
+import json
+import sys
+from pathlib import Path
+
+from benchmarks.checks import CHECKS, run_checks
+from benchmarks.memory import memory_report
+from benchmarks.suite import FREQUENCIES, TOLERANCE, YEARS, Case, compare, environment, run_suite
+
+BASELINE = Path(__file__).parent / "baseline.json"
+
+parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Time and memory-profile every pipeline stage and plot builder on synthetic external factors")
+parser.add_argument("--years", type=int, nargs="+", default=YEARS, help="Horizons in years")
+parser.add_argument("--freq", nargs="+", default=FREQUENCIES, help="Time steps, e.g. h or 15min")
+parser.add_argument("--repeat", type=int, default=3, help="Runs per stage, the best time is kept")
+parser.add_argument("--out", type=Path, default=None, help="Write the results to this JSON file")
+parser.add_argument("--baseline", type=Path, default=BASELINE, help="Baseline JSON file to compare with")
+parser.add_argument("--save-baseline", action="store_true", help="Write the results as the new baseline instead of comparing")
+parser.add_argument("--tolerance", type=float, default=TOLERANCE, help="Relative slowdown or memory growth flagged as a regression")
+parser.add_argument("--memory-report", action="store_true", help="Compare the memory and energy totals of the default and compact modes instead of timing stages")
+parser.add_argument("--check", nargs="*", choices=list(CHECKS), default=None,
+                    help="Run correctness checks against reference implementations instead of timing stages, all by default")
+args = parser.parse_args()
+
+if args.check is not None:
+    failures = run_checks(args.check or list(CHECKS))
+    print(f"{len(failures)} failed checks")
+    for failure in failures:
+        print(f"  {failure}")
+    sys.exit(1 if failures else 0)
+
+if args.memory_report:
+    reports = {"environment": environment(), "cases": {case.name: memory_report(case) for case in (Case(years, freq) for freq in args.freq for years in args.years)}}
+    if args.out is not None:
+        args.out.write_text(json.dumps(reports, indent=2))
+    sys.exit(0)
+
+results = run_suite([Case(years, freq) for freq in args.freq for years in args.years], args.repeat)
+if args.out is not None:
+    args.out.write_text(json.dumps(results, indent=2))
+if args.save_baseline:
+    args.baseline.write_text(json.dumps(results, indent=2))
+    print(f"Baseline written to {args.baseline}")
+elif args.baseline.exists():
+    regressions = compare(results, json.loads(args.baseline.read_text()), args.tolerance)
+    print(f"{len(regressions)} regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    for regression in regressions:
+        print(f"  {regression}")
+    sys.exit(1 if regressions else 0)
+else:
+    print(f"No baseline at {args.baseline}, save one with --save-baseline")
@@ -0,0 +1,134 @@
+import dataclasses
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from heatpro.external_factors import COLD_WATER_TEMPERATURE_NAME, ExternalFactors
+
+from backend.ingestion import read_external_factors
+from backend.multi_network import run_networks
+from backend.pipeline import build_district_heating_graph, cold_water_temperature_kernel, ending_dataframe, network_temperature_kernels, run_district_heating
+from backend.pipeline.induced_factors import _calculate_induced_factors
+from backend.scenario import apply_overrides
+from backend.sweep import SharedExternalFactors
+from benchmarks.suite import clear_caches
+from benchmarks.synthetic import SOIL, T_DEPARTURE, T_RETURN, synthetic_external_factors, synthetic_inputs
+
+DEMO_EXTERNAL_FACTORS = Path(__file__).parent.parent / "data" / "external_factors.csv"
+KERNEL_TOLERANCE = 1e-5 # °C, float32 rounding of the input temperatures (the kernels compute in float64 from the float32 columns)
+KERNEL_SLICES = [slice(None), slice(3000, 12000)] # whole datasets and a slice starting and ending within a year
+MULTI_NETWORK_TOLERANCE = 1e-6 # difference of an ending column relative to its largest absolute value
+# overrides of the second network of the multi-network check, its building load is also scaled
+NETWORK_OVERRIDES = {"T_departure.max_HS": 85, "T_return.NHS": 52, "hot_water.simultaneity": 0.5, "heat_loss.share": 0.1,
+                     "heat_loss.included": True, "non_heating_temperature": 16, "delta_temperature": 5}
+
+def _max_difference(result: pd.DataFrame, reference: pd.DataFrame) -> float:
+    return float(np.abs(result.to_numpy(dtype=float) - reference.to_numpy(dtype=float)).max())
+
+def check_timestamp_offsets(log: Callable[[str], None] = print) -> list[str]:
+    """The demo external factors written with a UTC offset are read in local time and give the same pipeline result"""
+    reference, _ = read_external_factors(DEMO_EXTERNAL_FACTORS)
+    data = pd.read_csv(DEMO_EXTERNAL_FACTORS, index_col=0)
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        for name, suffix in (("iso_offset.csv", "+01:00"), ("utc.csv", "Z")):
+            path = Path(directory) / name
+            data.set_axis(pd.to_datetime(data.index).strftime("%Y-%m-%dT%H:%M:%S") + suffix, axis=0).to_csv(path)
+            external_factors, _ = read_external_factors(path)
+            if not external_factors.data.index.equals(reference.data.index):
+                failures.append(f"timestamps {suffix}: first time step {external_factors.data.index[0]} instead of {reference.data.index[0]}")
+                continue
+            clear_caches()
+            result = build_district_heating_graph().run(synthetic_inputs(external_factors))[0]["ending"]
+            clear_caches()
+            expected = build_district_heating_graph().run(synthetic_inputs(reference))[0]["ending"]
+            difference = _max_difference(result, expected)
+            log(f"timestamps {suffix}: ending max difference {difference:.1e}")
+            if difference > 0:
+                failures.append(f"timestamps {suffix}: ending differs by {difference:.1e}")
+    return failures
+
+def check_shared_external_factors(log: Callable[[str], None] = print) -> list[str]:
+    """External factors shared with sweep workers are read back with the same index, whatever its unit and time zone"""
+    external_factors = synthetic_external_factors(1)
+    failures = []
+    for unit, tz in (("ns", None), ("us", None), ("s", None), ("s", "Europe/Paris")):
+        index = external_factors.data.index.as_unit(unit)
+        data = external_factors.data.set_axis(index if tz is None else index.tz_localize("UTC").tz_convert(tz), axis=0)
+        with tempfile.TemporaryDirectory() as directory:
+            loaded = SharedExternalFactors(ExternalFactors(data), directory).load().data
+            if not loaded.index.equals(data.index) or loaded.index.tz != data.index.tz or not loaded.equals(data):
+                failures.append(f"index in {unit} (tz {tz}): first time step {loaded.index[0]} instead of {data.index[0]}")
+            else:
+                log(f"shared external factors, index in {unit} (tz {tz}): equal")
+    return failures
+
+def _kernel_datasets() -> dict[str, ExternalFactors]:
+    datasets = {"demo": read_external_factors(DEMO_EXTERNAL_FACTORS)[0], "3y-h": synthetic_external_factors(3), "1y-15min": synthetic_external_factors(1, "15min")}
+    return {f"{name}[{part.start or 0}:{part.stop or ''}]": ExternalFactors(external_factors.data.iloc[part])
+            for name, external_factors in datasets.items() for part in KERNEL_SLICES}
+
+def check_induced_kernels(log: Callable[[str], None] = print) -> list[str]:
+    """Network temperature kernels (backend.pipeline.induced_kernels) equal heatpro calculate_induced_factors within KERNEL_TOLERANCE,
+    for several scenarios computed in one call"""
+    T_departure = [T_DEPARTURE, dataclasses.replace(T_DEPARTURE, max_HS=85., ext_min=-10.)]
+    T_return = [T_RETURN, dataclasses.replace(T_RETURN, HS=45.)]
+    soil = [SOIL, dataclasses.replace(SOIL, depth=2., density=2000.)]
+    failures = []
+    for name, external_factors in _kernel_datasets().items():
+        kernels = network_temperature_kernels(external_factors, T_departure, T_return, soil)
+        kernels[COLD_WATER_TEMPERATURE_NAME] = np.repeat(cold_water_temperature_kernel(external_factors), len(T_departure), axis=1)
+        errors = {}
+        for scenario in range(len(T_departure)):
+            reference = _calculate_induced_factors(external_factors, T_departure[scenario], T_return[scenario], soil[scenario])
+            for column, values in kernels.items():
+                errors[column] = max(errors.get(column, 0.), float(np.abs(values[:, scenario] - reference[column].to_numpy(dtype=float)).max()))
+        log(f"induced kernels {name}: " + ", ".join(f"{column} {error:.1e}" for column, error in errors.items()))
+        failures += [f"{name} {column}: {error:.1e} °C above {KERNEL_TOLERANCE:.0e}" for column, error in errors.items() if not error <= KERNEL_TOLERANCE]
+    return failures
+
+def check_multi_network(log: Callable[[str], None] = print) -> list[str]:
+    """Ending tables of the batched multi-network runner (backend.multi_network) equal single network runs within MULTI_NETWORK_TOLERANCE"""
+    failures = []
+    for freq in ("h", "15min"):
+        external_factors = synthetic_external_factors(1, freq)
+        base = synthetic_inputs(external_factors)
+        variant = apply_overrides(base, NETWORK_OVERRIDES)
+        variant["monthly_building_load_df"] = base["monthly_building_load_df"] * 1.3
+        networks = {"base": base, "variant": variant}
+        result = run_networks(external_factors, base["soil"], networks)
+        for name, inputs in networks.items():
+            clear_caches()
+            expected = run_district_heating(inputs)["ending"]
+            ending = ending_dataframe(result.district_heating(name), inputs["water_heat_capacity"])
+            if list(ending.columns) != list(expected.columns) or not ending.index.equals(expected.index):
+                failures.append(f"{freq} {name}: ending columns or index differ")
+                continue
+            errors = (np.abs(ending.to_numpy(dtype=float) - expected.to_numpy(dtype=float)).max(axis=0) /
+                      np.maximum(np.abs(expected.to_numpy(dtype=float)).max(axis=0), np.finfo(float).tiny))
+            worst = int(errors.argmax())
+            log(f"multi network {freq} {name}: largest relative difference {errors[worst]:.1e} ({expected.columns[worst]})")
+            failures += [f"{freq} {name} {column}: {error:.1e} relative above {MULTI_NETWORK_TOLERANCE:.0e}"
+                         for column, error in zip(expected.columns, errors) if not error <= MULTI_NETWORK_TOLERANCE]
+    return failures
+
+# check name: function logging its measures and returning its failures
+CHECKS: dict[str, Callable[[Callable[[str], None]], list[str]]] = {
+    "timestamp_offsets": check_timestamp_offsets,
+    "shared_external_factors": check_shared_external_factors,
+    "induced_kernels": check_induced_kernels,
+    "multi_network": check_multi_network,
+}
+
+def run_checks(names: list[str], log: Callable[[str], None] = print) -> list[str]:
+    """Failures of the CHECKS of names, a check raising an error fails"""
+    failures = []
+    for name in names:
+        try:
+            failures += [f"{name}: {failure}" for failure in CHECKS[name](log)]
+        except Exception as error:
+            failures.append(f"{name}: {type(error).__name__}: {error}")
+    return failures
@@ -0,0 +1,53 @@
+import tracemalloc
+from typing import Any, Callable
+
+import numpy as np
+
+from backend.calendar_index import CalendarIndex, Groups
+from backend.compact import ENERGY_RELATIVE_BOUND, memory_usage
+from backend.pipeline import ENDING_COLUMNS, SECTOR_COLUMNS, build_district_heating_graph
+from benchmarks.suite import Case, clear_caches
+from benchmarks.synthetic import synthetic_external_factors, synthetic_inputs
+
+def _run(inputs: dict[str, Any]) -> tuple[dict[str, Any], int]:
+    """Results of a cold pipeline run and its peak memory"""
+    clear_caches()
+    tracemalloc.start()
+    try:
+        results, _ = build_district_heating_graph().run(inputs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return results, peak
+
+def _energy_error(default: dict[str, Any], compact: dict[str, Any], groups: Groups) -> float:
+    """Largest difference of a sector or total energy over a group of time steps, relative to the energy of all sectors over the group"""
+    sectors = [column for column, source in ENDING_COLUMNS.items() if source in SECTOR_COLUMNS]
+    totals = sectors + ["total_thermal_energy_kWh"]
+    reference = groups.reduce(np.abs(default["ending"][sectors].to_numpy(dtype=float)).sum(axis=1))
+    difference = np.abs(groups.reduce(compact["ending"][totals].to_numpy(dtype=float)) - groups.reduce(default["ending"][totals].to_numpy(dtype=float)))
+    return float((difference / reference[:, None]).max())
+
+def memory_report(case: Case, log: Callable[[str], None] = print) -> dict[str, Any]:
+    """Run the pipeline in default and compact modes on synthetic data of case and compare the memory held by every stage result,
+    the peak memory of the whole run and the energy totals per month, per year and over the whole run."""
+    external_factors = synthetic_external_factors(case.years, case.freq)
+    default, default_peak = _run(synthetic_inputs(external_factors))
+    compact, compact_peak = _run(synthetic_inputs(external_factors, compact=True))
+    calendar = CalendarIndex.of(external_factors)
+    report = {
+        "rows": len(external_factors.data),
+        "results": {"default": memory_usage(default), "compact": memory_usage(compact)},
+        "peak_memory": {"default": default_peak, "compact": compact_peak},
+        "energy_relative_error": {level: _energy_error(default, compact, groups)
+                                  for level, groups in (("month", calendar.months), ("year", calendar.years), ("run", Groups(np.zeros(len(calendar), dtype=int))))},
+        "energy_relative_bound": ENERGY_RELATIVE_BOUND,
+    }
+    for name, size in report["results"]["default"].items():
+        log(f"{case.name:>10} {name:<36} {size / 2**20:10.1f} MiB {report['results']['compact'][name] / 2**20:10.1f} MiB")
+    total = {mode: sum(sizes.values()) for mode, sizes in report["results"].items()}
+    log(f"{case.name:>10} {'all results':<36} {total['default'] / 2**20:10.1f} MiB {total['compact'] / 2**20:10.1f} MiB ({total['compact'] / total['default']:.0%})")
+    log(f"{case.name:>10} {'run peak':<36} {default_peak / 2**20:10.1f} MiB {compact_peak / 2**20:10.1f} MiB ({compact_peak / default_peak:.0%})")
+    log(f"{case.name:>10} energy totals relative error: " + ", ".join(f"{level} {error:.1e}" for level, error in report["energy_relative_error"].items()) +
+        f" (bound {ENERGY_RELATIVE_BOUND:.1e})")
+    return report
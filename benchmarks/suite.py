@@ -0,0 +1,117 @@
+import platform
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Callable
+
+import numpy as np
+import pandas as pd
+import heatpro
+
+from backend.external_factors import plot_external_factors, plot_induced_factors
+from backend.pipeline import DISTRICT_HEATING_STAGES, INDUCED_FACTORS_CACHE
+from backend.visualisation import plot_demand_vs_outside_temperature, plot_generated_load, plot_monotone
+import backend.duration_curve as duration_curve
+from benchmarks.synthetic import synthetic_external_factors, synthetic_inputs
+
+YEARS = [1, 5, 10, 30]
+FREQUENCIES = ["h", "15min"]
+TOLERANCE = 0.2 # relative slowdown or memory growth flagged as a regression
+ERROR_LENGTH = 120 # characters of an error message kept in the results
+SLACK = {"seconds": 0.005, "peak_memory": 2**20} # absolute differences below are timer or allocator noise
+
+@dataclass(frozen=True)
+class Case:
+    years: int
+    freq: str
+
+    @property
+    def name(self) -> str:
+        return f"{self.years}y-{self.freq}"
+
+# stage name: function of the previous results, pipeline stages are those of backend.pipeline
+# (induced_factors is calculate_induced_factors, hot_water, residential, industry and heat_loss
+# the process_*_temporal_demand functions, district_heating DistrictHeatingLoad.fit and ending ending_dataframe)
+PLOTS: dict[str, Callable[[dict[str, Any]], Any]] = {
+    "plot_generated_load": lambda values: plot_generated_load(values["district_heating"]),
+    "plot_monotone": lambda values: plot_monotone(values["district_heating"]),
+    "plot_demand_vs_outside_temperature": lambda values: plot_demand_vs_outside_temperature(values["district_heating"]),
+    "plot_external_factors": lambda values: plot_external_factors(values["district_heating"]),
+    "plot_induced_factors": lambda values: plot_induced_factors(values["district_heating"]),
+}
+
+def clear_caches() -> None:
+    """Forget cached results so that every measure runs the cold path"""
+    INDUCED_FACTORS_CACHE.clear()
+    with duration_curve._CURVES_LOCK:
+        duration_curve._CURVES.clear()
+
+def measure(func: Callable[[], Any], repeat: int) -> tuple[Any, dict[str, float]]:
+    """Best wall time over repeat runs, then the peak memory allocated by one more run under tracemalloc"""
+    seconds = []
+    for _ in range(repeat):
+        clear_caches()
+        start = time.perf_counter()
+        result = func()
+        seconds.append(time.perf_counter() - start)
+    clear_caches()
+    tracemalloc.start()
+    try:
+        func()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, {"seconds": min(seconds), "peak_memory": peak}
+
+def run_case(case: Case, repeat: int = 3, log: Callable[[str], None] = print) -> dict[str, Any]:
+    """Measure every pipeline stage and plot builder on synthetic data of case.
+    A failing stage is recorded with its error and the stages depending on it are skipped."""
+    external_factors = synthetic_external_factors(case.years, case.freq)
+    values = synthetic_inputs(external_factors)
+    stages: dict[str, Any] = {}
+    steps = [(stage.name, (lambda stage=stage: stage.func(**{name: values[name] for name in stage.inputs}))) for stage in DISTRICT_HEATING_STAGES]
+    steps += [(name, (lambda plot=plot: plot(values))) for name, plot in PLOTS.items()]
+    for name, func in steps:
+        try:
+            values[name], stages[name] = measure(func, repeat)
+        except Exception as error:
+            message = str(error).splitlines()[0] if str(error) else ""
+            stages[name] = {"error": f"{type(error).__name__}: {message[:ERROR_LENGTH]}"}
+            log(f"{case.name:>10} {name:<36} {stages[name]['error']}")
+            if name in {stage.name for stage in DISTRICT_HEATING_STAGES}:
+                break
+            continue
+        log(f"{case.name:>10} {name:<36} {stages[name]['seconds'] * 1e3:10.1f} ms {stages[name]['peak_memory'] / 2**20:10.1f} MiB")
+    return {"rows": len(external_factors.data), "stages": stages}
+
+def environment() -> dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "heatpro": getattr(heatpro, "__version__", "unknown"),
+    }
+
+def run_suite(cases: list[Case], repeat: int = 3, log: Callable[[str], None] = print) -> dict[str, Any]:
+    return {"environment": environment(), "repeat": repeat, "cases": {case.name: run_case(case, repeat, log) for case in cases}}
+
+def compare(results: dict[str, Any], baseline: dict[str, Any], tolerance: float = TOLERANCE) -> list[str]:
+    """Regressions of results against baseline: stages slower or allocating more than (1 + tolerance) times the baseline
+    (and more than SLACK), or failing while they passed. Cases and stages missing from either side are ignored."""
+    regressions = []
+    for case_name, case in results["cases"].items():
+        baseline_stages = baseline["cases"].get(case_name, {}).get("stages", {})
+        for stage_name, stage in case["stages"].items():
+            reference = baseline_stages.get(stage_name)
+            if reference is None or "error" in reference:
+                continue
+            if "error" in stage:
+                regressions.append(f"{case_name} {stage_name}: fails ({stage['error']})")
+                continue
+            for metric, unit, scale in (("seconds", "ms", 1e3), ("peak_memory", "MiB", 2**-20)):
+                if stage[metric] > reference[metric] * (1 + tolerance) and stage[metric] - reference[metric] > SLACK[metric]:
+                    regressions.append(f"{case_name} {stage_name}: {metric} {reference[metric] * scale:.1f} -> {stage[metric] * scale:.1f} {unit} "
+                                       f"(+{(stage[metric] / reference[metric] - 1) * 100:.0f} %)")
+    return regressions
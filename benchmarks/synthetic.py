@@ -0,0 +1,73 @@
+from typing import Any
+
+import numpy as np
+import pandas as pd
+
+from heatpro.external_factors import ExternalFactors, EXTERNAL_TEMPERATURE_NAME, HEATING_SEASON_NAME
+
+import backend.hot_water as hw
+from backend.calendar_index import CalendarIndex
+import backend.industry as ind
+import backend.residential as res
+from backend.scenario import WATER_HEAT_CAPACITY
+import config
+
+# Defaults of the app boards
+T_DEPARTURE = config.TemperatureDeparture(max_HS=90., max_NHS=75., min_HS=70., min_NHS=68., ext_mid=18., ext_min=-15.)
+T_RETURN = config.TemperatureReturn(HS=50., NHS=55.)
+HOT_WATER = config.HotWater(temperature=60., simultaneity=0.2, sanitary_loop_coef=0.3)
+SOIL = config.Soil(depth=1., density=3200., capacity=840., conductivity=2.42)
+
+def synthetic_external_factors(years: int, freq: str = "h", start: str = "2001-01-01", seed: int = 0) -> ExternalFactors:
+    """Reproducible external factors: yearly and daily temperature cycles plus AR(1) weather noise,
+    heating season from October 1st to May 15th. Temperatures are float32 as read by backend.ingestion.
+
+    Parameters:
+        years (int): Number of whole years, starting on January 1st.
+        freq (str): Time step, e.g. "h" or "15min".
+        start (str): First time step.
+        seed (int): Seed of the weather noise.
+    """
+    index = pd.date_range(start, pd.Timestamp(start) + pd.DateOffset(years=years), freq=freq, inclusive="left")
+    day = (index - index[0]) / pd.Timedelta(days=1)
+    hour = index.hour + index.minute / 60
+    rng = np.random.default_rng(seed)
+    # weather noise correlated over about 2 days whatever the time step
+    persistence = np.exp(-(index[1] - index[0]) / pd.Timedelta(hours=48))
+    innovations = rng.normal(0., 3. * np.sqrt(1 - persistence ** 2), len(index))
+    noise = np.empty(len(index))
+    noise[0] = innovations[0]
+    for position in range(1, len(index)):
+        noise[position] = persistence * noise[position - 1] + innovations[position]
+    temperature = 12. - 9. * np.cos(2 * np.pi * (day - 15) / 365.25) - 3. * np.cos(2 * np.pi * (hour - 4) / 24) + noise
+    heating_season = (index.month >= 10) | (index.month <= 4) | ((index.month == 5) & (index.day <= 15))
+    return ExternalFactors(pd.DataFrame({
+        EXTERNAL_TEMPERATURE_NAME: temperature.astype(np.float32),
+        HEATING_SEASON_NAME: np.asarray(heating_season, dtype=bool),
+    }, index=index))
+
+def synthetic_inputs(external_factors: ExternalFactors, compact: bool = False) -> dict[str, Any]:
+    """District heating pipeline inputs with the app default tables and configs, in compact mode if compact (see backend.compact)"""
+    calendar = CalendarIndex.of(external_factors)
+    month_index, year_index = calendar.month_index, calendar.year_index
+    monthly_hot_water_profile = hw.generate_monthly_hotwater_profile(month_index)
+    return dict(
+        external_factors=external_factors,
+        T_departure=T_DEPARTURE,
+        T_return=T_RETURN,
+        soil=SOIL,
+        delta_temperature=7.,
+        water_heat_capacity=WATER_HEAT_CAPACITY,
+        loss_percentage=0.06,
+        loss_included=False,
+        monthly_building_load_df=res.generate_default_monthly_building_load(month_index),
+        monthly_hot_water_profile=monthly_hot_water_profile / monthly_hot_water_profile.sum(),
+        weekly_hot_water_profile=hw.generate_weekly_hotwater_profile(),
+        config_hot_water=HOT_WATER,
+        non_heating_temperature=T_DEPARTURE.ext_mid,
+        weekly_residential_profile=res.generate_default_residential_profile(),
+        yearly_industry_consumption=ind.generate_default_yearly_industry_demand(year_index),
+        weekly_industry_profile=ind.generate_weekly_industry_profile(),
+        month_index=month_index,
+        compact=compact,
+    )
@@ -1,6 +1,6 @@
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class TemperatureDeparture:
     max_HS: float
     max_NHS: float
@@ -9,18 +9,18 @@ class TemperatureDeparture:
     ext_mid: float
     ext_min: float
     
-@dataclass
+@dataclass(frozen=True)
 class TemperatureReturn:
     HS: float
     NHS: float
     
-@dataclass
+@dataclass(frozen=True)
 class HotWater:
     temperature: float
     simultaneity: float
     sanitary_loop_coef: float
     
-@dataclass
+@dataclass(frozen=True)
 class Soil:
     depth: float
     density: float